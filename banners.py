@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Service banner fingerprints of the TCP findings.
+
+The fingerprints come from a data file, banners.json by default:
+- services: the service and version of a banner, e.g. OpenSSH 8.2p1, ProFTPD 1.3.5, Redis 6.0.9
+- os: the operating system guess, e.g. Ubuntu-20.04 from "OpenSSH_8.2p1 Ubuntu-4ubuntu0.5"
+The first matching rule of each list wins. A rule has at most one capture group
+per alternative, the version, and an OS may be formatted from its match,
+e.g. "{0}" for the whole match, "{1}" for its first group.
+
+Each list is compiled into one regular expression, an alternation of
+lookaheads tried in rule order, so that a banner goes through a single regex
+call instead of one per rule, although each failing alternative still scans
+the banner. The fingerprints are memoized per banner, banners being repeated
+across the hosts of a report.
+
+Usage:
+    python banners.py "SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5"
+    cat banners.txt | python banners.py
+"""
+
+import argparse
+from collections import namedtuple
+from functools import lru_cache
+import json
+import os
+import re
+import sys
+
+from config import settings
+
+# Debug
+# from pdb import set_trace as st
+
+BANNERS_FILE = getattr(settings, 'banners_file', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'banners.json'))
+CACHE_SIZE = 65536  # distinct banners memoized
+
+Fingerprint = namedtuple('Fingerprint', ['service', 'version', 'os'])
+
+
+class Matcher:
+    """
+    An ordered list of rules compiled into one regular expression.
+    """
+    def __init__(self, rules, key):
+        self.values = [rule[key] for rule in rules]
+        self.groups = []
+        alternatives = []
+        for i, rule in enumerate(rules):
+            # Check each pattern alone, for a readable error on a bad rule
+            self.groups.append(re.compile(rule['pattern'], re.IGNORECASE).groups)
+            alternatives.append(f'(?=.*?(?P<r{i}>{rule["pattern"]}))')
+        self.regex = re.compile('|'.join(alternatives) or '(?!)', re.IGNORECASE | re.DOTALL)
+
+    def match(self, text):
+        """
+        Returns the value and the groups of the first matching rule, or None.
+
+        :return: A tuple (value, whole match, groups of the rule)
+        """
+        match = self.regex.match(text)
+        if not match:
+            return None
+        # The group of the rule closes after the groups of its pattern
+        name = match.lastgroup
+        i = int(name[1:])
+        index = self.regex.groupindex[name]
+        return self.values[i], match.group(index), match.groups()[index:index + self.groups[i]]
+
+
+class Fingerprints:
+    """
+    The service and OS matchers of the fingerprint data file.
+    """
+    def __init__(self, data):
+        self.services = Matcher(data.get('services', []), 'service')
+        self.os = Matcher(data.get('os', []), 'os')
+        self.fingerprint = lru_cache(maxsize=CACHE_SIZE)(self._fingerprint)
+
+    def _fingerprint(self, banner):
+        service, version, os_guess = '', '', f'Unknown-({banner.replace(" ", "_")})'
+        match = self.services.match(banner)
+        if match:
+            service, _, groups = match
+            version = next((group for group in groups if group), '')
+        match = self.os.match(banner)
+        if match:
+            value, whole, groups = match
+            os_guess = value.format(whole, *groups)
+        return Fingerprint(service, version, os_guess)
+
+
+_FINGERPRINTS = None
+
+
+def load_fingerprints(banners_file=BANNERS_FILE):
+    """
+    Returns the fingerprints of the data file, compiled once.
+    """
+    global _FINGERPRINTS
+    if _FINGERPRINTS is None:
+        with open(banners_file, 'r', encoding='utf-8') as f:
+            _FINGERPRINTS = Fingerprints(json.load(f))
+    return _FINGERPRINTS
+
+
+def fingerprint(banner):
+    """
+    Returns the Fingerprint (service, version, os) of a banner.
+    The service and version are empty if unknown, the os is "Unknown-(<banner>)".
+    """
+    return load_fingerprints().fingerprint(banner.strip())
+
+
+def get_service(result):
+    """
+    Returns the display form of the service of a Fingerprint, e.g. "OpenSSH 8.2p1".
+    """
+    return f'{result.service} {result.version}'.strip() or '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fingerprint service banners')
+    parser.add_argument('banner', nargs='*', help='The banners, read from stdin by default')
+    args = parser.parse_args()
+
+    for banner in args.banner or (line.rstrip('\n') for line in sys.stdin):
+        result = fingerprint(banner)
+        print(f'{get_service(result)}\t{result.os}\t{banner}')
+
+
+if __name__ == '__main__':
+    main()
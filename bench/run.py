@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Offline benchmark of the wizard.sh pipeline.
+
+The stubs of bench/bin replace httpx, dnsx, nuclei, naabu, subfinder and amass
+on the PATH, and the DNS cache is seeded with their answers, so that the
+pipeline runs without any network. Each stage of wizard.sh runs in a scratch
+directory, and is reported with:
+- wall: the wall-clock time of the stage
+- stubs: the time during which at least one stub was running
+- overhead: the rest, spent in our own orchestration (temp files, subprocess
+  plumbing, enrichment, merges, diffs)
+- peak RSS: the largest resident set of the stage processes, and of the stubs
+
+Usage:
+    python bench/run.py [--domains 5] [--subdomains 200] [--rate 5000] [--findings 2] [--format csv]
+    python bench/run.py --wizard  # a single stage, the whole wizard.sh
+"""
+
+import argparse
+import gzip
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from output import add_arguments, write_rows  # noqa: E402
+
+# Debug
+# from pdb import set_trace as st
+
+PYTHON = sys.executable
+# Same stages as wizard.sh
+STAGES = [
+    ('subdomains', 'bash subdomains.sh'),
+    ('portscan', f'{PYTHON} portscan.py > naabu.latest.txt'),
+    ('nuclei', f'{PYTHON} nuclei.py'),
+    ('nuclei-naabu', f'{PYTHON} nuclei.py naabu.latest.txt'),
+    ('merge', 'bash merge_all_reports.sh'),
+    ('diff', f'{PYTHON} diff_nuclei.py --days 1'),
+    ('diff-severe', f'{PYTHON} diff_nuclei.py --severe --days 1'),
+    ('stats', f'{PYTHON} nuclei_report_stats.py report.nuclei.latest.txt'),
+]
+HEADERS = ['Stage', 'Wall (s)', 'Stubs (s)', 'Overhead (s)', 'Overhead (%)', 'Peak RSS (MB)',
+           'Stubs peak RSS (MB)', 'Exit']
+SEED_TTL = 30 * 86400  # in seconds
+
+
+def prepare_workdir(workdir, domains, stubs):
+    """
+    Copies the scripts into the scratch directory, with the sample settings,
+    the apex domains and a DNS cache seeded with the answers of the stubs.
+    """
+    for path in BENCH_DIR.parent.iterdir():
+        if path.is_file() and path.suffix in ['.py', '.sh', '.json']:
+            shutil.copy(path, workdir)
+    shutil.copy(BENCH_DIR.parent / 'settings.sample.py', Path(workdir) / 'settings.py')
+    (Path(workdir) / 'reports').mkdir(exist_ok=True)
+    (Path(workdir) / 'logs').mkdir(exist_ok=True)
+    apexes = [f'bench{i}.example.com' for i in range(domains)]
+    (Path(workdir) / 'targets.txt').write_text('\n'.join(apexes) + '\n', encoding='utf-8')
+
+    expiry = time.time() + SEED_TTL
+    entries = {}
+    for apex in apexes:
+        entries[f'{apex}|WILDCARD'] = [expiry, []]
+        # subfinder and amass together
+        for host in stubs.get_subdomains(apex, 0, stubs.SUBDOMAINS + stubs.SUBDOMAINS // 4):
+            ip = stubs.get_ip(host)
+            entries[f'{host}|A'] = [expiry, [ip] if ip else []]
+            if not ip:
+                # The verdict of the liveness filter
+                entries[f'{host}|NXDOMAIN'] = [expiry, []]
+    with gzip.open(Path(workdir) / 'dns_cache.json.gz', 'wt', encoding='utf-8') as f:
+        json.dump(entries, f)
+
+
+def get_busy_time(intervals):
+    """
+    Returns the length of the union of (start, end) intervals.
+    """
+    busy, current_start, current_end = 0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                busy += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        busy += current_end - current_start
+    return busy
+
+
+def run_stage(name, command, workdir, env):
+    """
+    Runs a stage and measures it.
+
+    :return: A row of HEADERS
+    """
+    stub_log = Path(workdir) / 'logs' / f'{name}.stubs.jsonl'
+    env = dict(env, BENCH_LOG=str(stub_log))
+    with open(Path(workdir) / 'logs' / f'{name}.log', 'w', encoding='utf-8') as log:
+        start = time.time()
+        process = subprocess.Popen(command, shell=True, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # The resource usage of the stage and of all its descendants
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.time() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    stubs = []
+    if stub_log.exists():
+        with open(stub_log, 'r', encoding='utf-8') as f:
+            stubs = [json.loads(line) for line in f if line.strip()]
+    stub_time = get_busy_time([(stub['start'], stub['end']) for stub in stubs])
+    overhead = max(wall - stub_time, 0)
+    return [name, round(wall, 2), round(stub_time, 2), round(overhead, 2),
+            round(100 * overhead / wall, 1) if wall else 0, round(usage.ru_maxrss / 1024, 1),
+            round(max((stub['maxrss'] for stub in stubs), default=0) / 1024, 1), process.returncode]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the wizard.sh pipeline, with stub scanners')
+    parser.add_argument('--domains', type=int, default=5, help='Number of apex domains in targets.txt')
+    parser.add_argument('--subdomains', type=int, default=200, help='Subdomains per apex domain')
+    parser.add_argument('--live-ratio', type=float, default=0.6, help='Share of live subdomains')
+    parser.add_argument('--findings', type=float, default=2, help='Average findings per target')
+    parser.add_argument('--ports', type=float, default=1, help='Average open ports per IP')
+    parser.add_argument('--rate', type=float, default=5000, help='Output lines per second of each stub, 0 for no limit')
+    parser.add_argument('--latency', type=float, default=0.05, help='Startup time of each stub, in seconds')
+    parser.add_argument('--wizard', action='store_true', help='Run the whole wizard.sh as a single stage')
+    parser.add_argument('--workdir', help='Scratch directory, kept after the run, a temporary one by default')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.update({
+        'BENCH_SUBDOMAINS': str(args.subdomains),
+        'BENCH_LIVE_RATIO': str(args.live_ratio),
+        'BENCH_FINDINGS': str(args.findings),
+        'BENCH_PORTS': str(args.ports),
+        'BENCH_RATE': str(args.rate),
+        'BENCH_LATENCY': str(args.latency),
+    })
+    # The stubs read their configuration at import
+    import stubs
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bench.')
+    os.makedirs(workdir, exist_ok=True)
+    prepare_workdir(workdir, args.domains, stubs)
+    env = dict(os.environ, PATH=f'{BENCH_DIR / "bin"}{os.pathsep}{os.environ.get("PATH", "")}')
+
+    try:
+        stages = [('wizard', 'bash wizard.sh')] if args.wizard else STAGES
+        rows = []
+        for name, command in stages:
+            rows.append(run_stage(name, command, workdir, env))
+            print(f'[*] {name}: {rows[-1][1]}s', file=sys.stderr)
+        total_wall = sum(row[1] for row in rows)
+        total_overhead = sum(row[3] for row in rows)
+        rows.append(['total', round(total_wall, 2), round(sum(row[2] for row in rows), 2), round(total_overhead, 2),
+                     round(100 * total_overhead / total_wall, 1) if total_wall else 0,
+                     max(row[5] for row in rows), max(row[6] for row in rows), max(row[7] for row in rows)])
+        write_rows(rows, HEADERS, args.format, args.limit, args.page)
+    finally:
+        if args.workdir:
+            print(f'[*] Logs and outputs kept in {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
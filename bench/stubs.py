@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+Stub httpx, dnsx, nuclei, naabu, subfinder and amass for the benchmark.
+
+Each stub reads the same arguments as the real tool, and emits realistic
+output at a configurable rate. Everything derives from a hash of the names,
+so that the subdomains, DNS answers, live hosts, open ports and findings
+agree between the stubs and between the runs.
+
+Configuration, through the environment:
+    BENCH_SUBDOMAINS  subdomains per apex domain (default 200)
+    BENCH_LIVE_RATIO  share of the subdomains which resolve and answer HTTP (default 0.6)
+    BENCH_IP_RATIO    unique IPs per live subdomain (default 0.25)
+    BENCH_FINDINGS    average findings per target (default 2)
+    BENCH_PORTS       average open ports per IP, besides 80 and 443 (default 1)
+    BENCH_RATE        output lines per second of each stub, 0 for no limit (default 5000)
+    BENCH_LATENCY     startup time of each stub, in seconds (default 0.05)
+    BENCH_LOG         JSONL file where each stub appends its run time and peak RSS
+"""
+
+from datetime import datetime, timezone
+from hashlib import blake2b
+import json
+import os
+import resource
+import sys
+import time
+
+SUBDOMAINS = int(os.environ.get('BENCH_SUBDOMAINS', '200'))
+LIVE_RATIO = float(os.environ.get('BENCH_LIVE_RATIO', '0.6'))
+IP_RATIO = float(os.environ.get('BENCH_IP_RATIO', '0.25'))
+FINDINGS = float(os.environ.get('BENCH_FINDINGS', '2'))
+OPEN_PORTS = float(os.environ.get('BENCH_PORTS', '1'))
+RATE = float(os.environ.get('BENCH_RATE', '5000'))
+LATENCY = float(os.environ.get('BENCH_LATENCY', '0.05'))
+
+PREFIXES = ['www', 'api', 'dev', 'staging', 'mail', 'vpn', 'admin', 'cdn', 'app', 'git']
+TECHNOLOGIES = [['Nginx'], ['Apache HTTP Server:2.4.41', 'PHP:7.4'], ['WordPress:6.1', 'PHP:8.1', 'MySQL'],
+                ['Microsoft ASP.NET', 'IIS:10.0'], ['Jenkins:2.401'], ['Grafana'], []]
+HTTP_TEMPLATES = [
+    ('tech-detect', 'info'), ('ssl-issuer', 'info'), ('http-missing-security-headers', 'info'),
+    ('waf-detect', 'info'), ('wordpress-detect', 'info'), ('git-config', 'medium'),
+    ('exposed-env', 'high'), ('CVE-2021-41773', 'critical'), ('grafana-panel', 'info'),
+    ('jenkins-login', 'info'), ('open-redirect', 'medium'), ('cors-misconfig', 'low'),
+]
+TCP_TEMPLATES = [
+    ('openssh-detect', 'info', 22, ['SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5', 'SSH-2.0-OpenSSH_7.9p1 Debian-10+deb10u2']),
+    ('mysql-detect', 'info', 3306, ['5.5.5-10.3.38-MariaDB-0+deb10u1', '8.0.33']),
+    ('redis-detect', 'info', 6379, ['redis_version:6.0.9']),
+    ('proftpd-server-detect', 'info', 21, ['220 ProFTPD 1.3.5e Server (Debian)']),
+]
+PORTS = [21, 22, 25, 3306, 5432, 6379, 8080, 8443, 9090, 27017]
+HTTP_PORTS = ['80', '443', '8080', '8443', '9090']
+
+
+def get_hash(*values):
+    """
+    Returns a stable float in [0, 1) for some values.
+    """
+    digest = blake2b('|'.join(str(value) for value in values).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64
+
+
+def get_subdomains(apex, start=0, end=None):
+    """
+    Returns the subdomains of an apex domain, from start to end.
+    """
+    end = SUBDOMAINS if end is None else end
+    return [f'{PREFIXES[i % len(PREFIXES)]}{i}.{apex}' for i in range(start, end)]
+
+
+def is_live(host):
+    return get_hash('live', host.split(':')[0]) < LIVE_RATIO
+
+
+def get_ip(host):
+    """
+    Returns the A record of a live host, shared by about 1 / IP_RATIO hosts, or None.
+    """
+    if not is_live(host):
+        return None
+    pool = max(int(SUBDOMAINS * LIVE_RATIO * IP_RATIO), 1)
+    index = int(get_hash('ip', host.split('.', 1)[-1], int(get_hash('slot', host) * pool)) * 2 ** 24)
+    return f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'
+
+
+def get_open_ports(ip):
+    return [port for port in PORTS if get_hash('port', ip, port) < OPEN_PORTS / len(PORTS)]
+
+
+class Output:
+    """
+    Writes lines to stdout and an optional output file, at most RATE lines per second.
+    """
+    def __init__(self, output_file=None, stdout=True):
+        self.file = open(output_file, 'a', encoding='utf-8') if output_file else None
+        self.stdout = stdout
+        self.lines = 0
+        self.start = time.time()
+
+    def write(self, line):
+        if self.file:
+            self.file.write(line + '\n')
+        if self.stdout:
+            sys.stdout.write(line + '\n')
+        self.lines += 1
+        if RATE:
+            ahead = self.lines / RATE - (time.time() - self.start)
+            if ahead > 0.01:
+                if self.stdout:
+                    sys.stdout.flush()
+                time.sleep(ahead)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+        sys.stdout.flush()
+
+
+def get_option(args, name, default=None):
+    """
+    Returns the value following an option, e.g. "-o out.txt".
+    """
+    for i, arg in enumerate(args[:-1]):
+        if arg == name:
+            return args[i + 1]
+    return default
+
+
+def read_inputs(args, list_option='-l'):
+    """
+    Returns the targets of the list option, of -u, or of stdin.
+    """
+    if get_option(args, '-u'):
+        return [get_option(args, '-u')]
+    list_file = get_option(args, list_option)
+    lines = open(list_file, encoding='utf-8') if list_file else sys.stdin
+    return [line.strip() for line in lines if line.strip()]
+
+
+def subfinder(args):
+    output = Output(get_option(args, '-o'))
+    for apex in read_inputs(args, '-list'):
+        for host in get_subdomains(apex):
+            output.write(host)
+    return output
+
+
+def amass(args):
+    # Passive sources overlap, with some subdomains the other tools do not know
+    output = Output(get_option(args, '-o'))
+    for apex in read_inputs(args, '-df'):
+        for host in get_subdomains(apex, SUBDOMAINS // 2, SUBDOMAINS + SUBDOMAINS // 4):
+            output.write(host)
+    return output
+
+
+def dnsx(args):
+    output = Output(get_option(args, '-o'))
+    for host in read_inputs(args):
+        ip = get_ip(host)
+        if ip:
+            output.write(f'{host} [{ip}]' if '-resp' in args else host)
+    return output
+
+
+def httpx(args):
+    output = Output(get_option(args, '-o'))
+    for target in read_inputs(args):
+        port = target.split('://')[-1].split('/')[0].partition(':')[2]
+        if not is_live(target) or (port and port not in HTTP_PORTS):
+            continue
+        url = target if '://' in target else f'https://{target}'
+        if '-json' in args:
+            result = {'url': url, 'input': target, 'status_code': 200, 'host': get_ip(target)}
+            if '-tech-detect' in args:
+                result['tech'] = TECHNOLOGIES[int(get_hash('tech', target) * len(TECHNOLOGIES))]
+            output.write(json.dumps(result))
+        else:
+            output.write(url)
+    return output
+
+
+def naabu(args):
+    output = Output(get_option(args, '-o'))
+    for ip in read_inputs(args):
+        for port in get_open_ports(ip):
+            output.write(f'{ip}:{port}')
+    return output
+
+
+def get_finding(template, severity, target, protocol, **extra):
+    finding = {
+        'template-id': template,
+        'info': {'name': template.replace('-', ' ').title(), 'severity': severity, 'tags': [protocol]},
+        'type': protocol,
+        'host': target,
+        'matched-at': target,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+    }
+    finding.update(extra)
+    return json.dumps(finding)
+
+
+def nuclei(args):
+    if '-tl' in args:
+        output = Output()
+        for template, _ in HTTP_TEMPLATES:
+            output.write(f'http/{template}.yaml')
+        return output
+    # The findings only go to the output file with -o, as with -silent -jsonl
+    output = Output(get_option(args, '-o'), stdout=not get_option(args, '-o'))
+    tcp = 'http' in (get_option(args, '-exclude-type') or '').split(',')
+    for target in read_inputs(args):
+        count = int(get_hash('count', target) * FINDINGS * 2 + 0.5)
+        for i in range(count):
+            if tcp:
+                template, severity, port, banners = TCP_TEMPLATES[int(get_hash('tcp', target, i) * len(TCP_TEMPLATES))]
+                banner = banners[int(get_hash('banner', target) * len(banners))]
+                output.write(get_finding(template, severity, target, 'tcp', ip=target, port=str(port),
+                                         **{'matched-at': f'{target}:{port}', 'extracted-results': [banner]}))
+            else:
+                template, severity = HTTP_TEMPLATES[int(get_hash('http', target, i) * len(HTTP_TEMPLATES))]
+                output.write(get_finding(template, severity, target, 'http', ip=get_ip(target.split('://')[-1]),
+                                         **{'matched-at': f'{target}/{template}'}))
+    return output
+
+
+TOOLS = {
+    'subfinder': subfinder,
+    'amass': amass,
+    'dnsx': dnsx,
+    'httpx': httpx,
+    'naabu': naabu,
+    'nuclei': nuclei,
+}
+
+
+def main(tool):
+    start = time.time()
+    args = sys.argv[1:]
+    # Self-updates
+    if '-up' in args or '-ut' in args or '-update' in args:
+        return
+    time.sleep(LATENCY)
+    output = TOOLS[tool](args)
+    output.close()
+
+    if os.environ.get('BENCH_LOG'):
+        with open(os.environ['BENCH_LOG'], 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'tool': tool, 'start': start, 'end': time.time(), 'lines': output.lines,
+                                'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}) + '\n')
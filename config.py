@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+"""
+Settings of the toolkit, loaded once per process.
+
+settings.py is read from the working directory, falling back to
+settings.sample.py. Every module imports them from here:
+    from config import settings
+"""
+
+import importlib.util
+import sys
+
+# Debug
+# from pdb import set_trace as st
+
+
+def load_settings():
+    """
+    Loads settings.py, or settings.sample.py if it doesn't exist.
+    """
+    try:
+        spec = importlib.util.spec_from_file_location('settings', 'settings.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except FileNotFoundError:
+        # stdout is the output of some commands, e.g. portscan.py
+        print('Warning: settings.py not found. Falling back to settings.sample.py !', file=sys.stderr)
+        spec = importlib.util.spec_from_file_location('settings', 'settings.sample.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+settings = load_settings()
@@ -3,139 +3,128 @@
 Nuclei Report Diff
 """
 
-import re
 import argparse
 from datetime import datetime, timedelta
 from pathlib import Path
-from tabulate import tabulate
+
+from false_positives import load_rules
+from findings import get_endpoint, get_label, get_metadata, get_severity, get_timestamp, list_reports, read_findings
+from output import add_arguments, write_rows, write_text
+from report_fingerprints import diff, record_hash, union
 
 # from pdb import set_trace as st
 
-def get_files(pattern: str) -> list:
+def select_reports(files, spec):
     """
-    Returns a list of files in the "reports" directory that match the given pattern.
-
-    :param pattern: A string representing a regex pattern
-    :return: List of matching files
+    Selects the reports matching a specification, which is either:
+    - a report file, e.g. "reports/report.nuclei.20230427-143329.jsonl[.gz]"
+    - a date or timestamp prefix, e.g. "20230427" for all the runs of that day
+    - a range of prefixes, e.g. "20230401..20230430", both ends included
     """
-    reports_dir = Path("reports")
-    files = list(reports_dir.glob('*'))
-    return [f for f in files if re.match(pattern, f.name)]
-
-def extract_most_recent(files):
+    if Path(spec).is_file():
+        return [Path(spec)]
+    if '..' in spec:
+        start, end = spec.split('..', 1)
+        return [f for f in files
+                if get_timestamp(f)[:len(start)] >= start and get_timestamp(f)[:len(end)] <= end]
+    return [f for f in files if get_timestamp(f).startswith(spec)]
+
+def extract_records(files, hashes):
     """
-    Extracts the most recent value of each line in the given list of files.
-    Returns a dictionary where the keys are the first 4 columns of each line,
-    and the values are tuples of (filename, line).
+    Extracts the most recent record of each finding whose hash is in the given set,
+    without the false positives.
+    Files must be sorted from the most recent to the oldest.
+    Yields tuples of (filename, record).
     """
-    most_recent = {}
+    rules = load_rules()
+    hashes = set(hashes)
 
     for file in files:
-        with open(file, 'r', encoding='utf-8') as f:
-            for line in f:
-                columns = line.split()[:4]
-                key = tuple(columns)
-
-                if key in most_recent:
-                    if file > most_recent[key][0]:
-                        most_recent[key] = (file, line.strip())
-                else:
-                    most_recent[key] = (file, line.strip())
-
-    return most_recent
-
-def extract_old(files, days):
+        if not hashes:
+            break
+        for record in read_findings(file):
+            value = record_hash(record)
+            if value in hashes:
+                hashes.remove(value)
+                record = rules.apply(record)
+                if record:
+                    yield file, record
+
+def print_most_recent(most_recent, severe, fmt='table', limit=0, page=1):
     """
-    Extracts the most recent value of each line in the files that are older than the specified number of days.
-    Returns a dictionary where the keys are the first 4 columns of each line,
-    and the values are tuples of (filename, line).
-    """
-    most_recent = {}
-
-    cutoff_date = datetime.now() - timedelta(days=days)
-    cutoff_date_str = cutoff_date.strftime("%Y%m%d-%H%M%S")
-
-    for file in files:
-        if file.name > f"report.nuclei.{cutoff_date_str}.txt":
-            continue
-
-        with open(file, 'r', encoding='utf-8') as f:
-            for line in f:
-                columns = line.split()[:4]
-                key = tuple(columns)
-
-                if key in most_recent:
-                    if file > most_recent[key][0]:
-                        most_recent[key] = (file, line.strip())
-                else:
-                    most_recent[key] = (file, line.strip())
-
-    return most_recent
-
-def print_most_recent(most_recent, severe):
-    """
-    Prints the most recent value of each line in the given list.
-    If severe is True, only lines with severity [high], [medium], or [low] are printed.
+    Prints the most recent record of each finding as they come.
+    If severe is True, only records with severity [high], [medium], or [low] are printed.
+    Returns the number of printed findings.
     """
     headers = ["Category", "Protocol", "Severity", "Endpoint", "Metadata"]
-    rows = []
 
-    for entry in most_recent:
-        line = entry[1]
-        if len(line.split()) < 4:
-            continue
-        if line.split()[1] == '[ssl]':
-            continue
-        if not severe or "[high]" in line or "[medium]" in line or "[low]" in line:
-            rows.append([line.split()[0], line.split()[1], line.split()[2], line.split()[3], ' '.join(line.split()[4:])])
+    def rows():
+        for entry in most_recent:
+            record = entry[1]
+            if record['type'] == 'ssl':
+                continue
+            if not severe or get_severity(record) in ['high', 'medium', 'low']:
+                yield [f'[{get_label(record)}]', f"[{record['type']}]", f'[{get_severity(record)}]',
+                       get_endpoint(record), get_metadata(record)]
 
-    print(tabulate(rows, headers=headers))
-
-def remove_old_findings(old, most_recent):
-    """
-    Removes entries in the most_recent dictionary that are older.
-    Also removes entries that have appeared before.
-    Returns a list of keys that are still in the most_recent dictionary after the removal.
-    """
-    new_most_recent = []
-
-    for key in most_recent:
-        if key not in old:
-            new_most_recent.append(most_recent[key])
-
-    return new_most_recent
+    return write_rows(rows(), headers, fmt, limit, page)
 
 if __name__ == "__main__":
     """
     Processes Nuclei reports.
 
-    This script extracts the most recent value of each line in Nuclei reports,
-    and prints the lines sorted by date and optionally filtered by severity.
+    By default, this script prints the findings that appeared during the last days,
+    optionally filtered by severity.
+    With --from, it compares two runs, dates or report sets and prints the new and
+    the resolved findings.
 
     Usage:
-        python process_nuclei.py [--severe] [--days <days>]
+        python diff_nuclei.py [--severe] [--days <days>]
+        python diff_nuclei.py [--severe] --from <spec> [--to <spec>]
+        python diff_nuclei.py [--format table|grid|csv|jsonl] [--limit <rows> [--page <page>]]
 
     Optional arguments:
         --severe    Only show lines with severity [high], [medium], or [low].
         --days      Show lines from the last <days> days. Default is 7.
+        --from      Reports to compare from: a report file, a date/timestamp prefix or a range "A..B".
+        --to        Reports to compare to, same format. Default is the most recent report.
+        --format    Output format, rows are streamed except with grid. Default is table.
+        --limit     Number of rows per page, with --page.
     """
 
-    # Regular expression pattern to extract the date from the filename
-    PATTERN = r"report\.nuclei\.(\d{8}-\d{6})\.txt"
-
     # Set up the command line arguments
     parser = argparse.ArgumentParser(description="Process Nuclei reports.")
     parser.add_argument("--severe", action="store_true",
                         help="Only show lines with severity [high], [medium], or [low].")
     parser.add_argument("--days", type=int, default=7,
                         help="Show lines from the last <days> days. Default is 7.")
+    parser.add_argument("--from", dest="from_spec",
+                        help="Reports to compare from: a report file, a date/timestamp prefix or a range \"A..B\".")
+    parser.add_argument("--to", dest="to_spec",
+                        help="Reports to compare to, same format. Default is the most recent report.")
+    add_arguments(parser)
     args = parser.parse_args()
 
-    FILES = get_files(PATTERN)
-    FILES.sort(reverse=True)
-
-    MOST_RECENT = extract_most_recent(FILES)
-    OLD = extract_old(FILES, args.days)
-    MOST_RECENT = remove_old_findings(OLD, MOST_RECENT)
-
-    print_most_recent(MOST_RECENT, args.severe)
+    FILES = list_reports("reports")
+    FILES.reverse()
+
+    if args.from_spec:
+        FROM_FILES = select_reports(FILES, args.from_spec)
+        TO_FILES = select_reports(FILES, args.to_spec) if args.to_spec else FILES[:1]
+        ADDED, REMOVED = diff(union(FROM_FILES), union(TO_FILES))
+
+        write_text("New findings:", args.format)
+        COUNT = print_most_recent(extract_records(TO_FILES, ADDED), args.severe, args.format, args.limit, args.page)
+        write_text(f"({COUNT} new findings)\n\nResolved findings:", args.format)
+        COUNT = print_most_recent(extract_records(FROM_FILES, REMOVED), args.severe, args.format, args.limit,
+                                  args.page)
+        write_text(f"({COUNT} resolved findings)", args.format)
+    else:
+        cutoff_date = datetime.now() - timedelta(days=args.days)
+        CUTOFF = cutoff_date.strftime("%Y%m%d-%H%M%S")
+        OLD_FILES = [f for f in FILES if get_timestamp(f) <= CUTOFF]
+        RECENT_FILES = [f for f in FILES if get_timestamp(f) > CUTOFF]
+
+        ADDED, _ = diff(union(OLD_FILES), union(RECENT_FILES))
+
+        print_most_recent(extract_records(RECENT_FILES, ADDED), args.severe, args.format, args.limit, args.page)
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+"""
+Coordinator/worker mode, to spread the nuclei scans across several nodes.
+
+The coordinator splits the filtered and prioritized targets into work units of
+a shared-directory queue, e.g. an NFS mount:
+    queue/job.json                  the report timestamp and the number of units
+    queue/pending/0003.1.txt        unit 3, leasable, attempt 1
+    queue/leased/0003.1.txt         unit 3, leased by a worker
+    queue/done/0003.jsonl           the findings of unit 3
+    queue/failed/0003.3.txt         unit 3, given up after its last attempt, or failed in its worker
+    queue/tmp/                      the findings of the units being published
+
+A worker leases a unit by renaming it (atomic), keeps the lease alive by
+touching it while it runs the httpx, nuclei and TCP stages of nuclei.py, then
+publishes the findings. The coordinator puts the units with an expired lease
+back in the queue, up to distributed_max_attempts, and assembles the usual
+reports/report.nuclei.<ts> report once every unit is done or failed. Failed
+targets are deferred to the next run.
+
+Usage:
+    python distributed.py coordinator [targets.latest.txt] [--domain example.com]
+    python distributed.py worker  # on each node, or several times on one machine
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+import shutil
+import socket
+import threading
+import time
+import traceback
+
+import nuclei
+from dns_cache import DnsCache
+from liveness import filter_live
+from nuclei_tuner import TCP_STATE_FILE, Tuner
+from prioritize import prioritize_targets, update_deferred
+from report_io import open_text, with_compression
+from wildcard import attribute_report, prune_targets, write_collapsed
+
+settings = nuclei.settings
+
+# Debug
+# from pdb import set_trace as st
+
+QUEUE_DIR = getattr(settings, 'distributed_queue_dir', 'queue')
+UNIT_SIZE = getattr(settings, 'distributed_unit_size', 200)
+LEASE_TTL = getattr(settings, 'distributed_lease_ttl', 900)  # in seconds
+MAX_ATTEMPTS = getattr(settings, 'distributed_max_attempts', 3)
+POLL_INTERVAL = 10  # in seconds
+
+
+def get_unit(path):
+    """
+    Returns the unit id and the attempt of a queued unit, e.g. ('0003', 1) for "pending/0003.1.txt"
+    """
+    unit, attempt = Path(path).name.split('.')[:2]
+    return unit, int(attempt)
+
+
+def is_lease_expired(path, ttl=LEASE_TTL):
+    """
+    Returns True if a leased unit has not been touched by its worker for the TTL.
+    The rename of the lease updates the ctime, the heartbeat updates both times.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return time.time() - max(stat.st_mtime, stat.st_ctime) > ttl
+
+
+def create_job(queue_dir, targets, unit_size=UNIT_SIZE, compression='', collapsed=None):
+    """
+    Splits the targets into pending units, from the most to the least urgent.
+    The hosts collapsed by the wildcard pruning are kept in the job, for the attribution of the findings.
+
+    :return: The job description
+    """
+    queue_dir = Path(queue_dir)
+    if (queue_dir / 'job.json').exists():
+        raise FileExistsError(f'A job is already queued in {queue_dir}')
+    for state in ['pending', 'leased', 'done', 'failed', 'tmp']:
+        (queue_dir / state).mkdir(parents=True, exist_ok=True)
+
+    units = [targets[i:i + unit_size] for i in range(0, len(targets), unit_size)]
+    for i, unit in enumerate(units):
+        tmp_file = queue_dir / f'.{i:04d}.1.txt'
+        tmp_file.write_text('\n'.join(unit) + '\n', encoding='utf-8')
+        os.replace(tmp_file, queue_dir / 'pending' / f'{i:04d}.1.txt')
+
+    job = {
+        'timestamp': datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'compression': compression,
+        'units': len(units),
+        'collapsed': collapsed or {},
+    }
+    tmp_file = queue_dir / '.job.json'
+    tmp_file.write_text(json.dumps(job), encoding='utf-8')
+    os.replace(tmp_file, queue_dir / 'job.json')
+    return job
+
+
+def requeue_expired(queue_dir, ttl=LEASE_TTL, max_attempts=MAX_ATTEMPTS):
+    """
+    Puts the units with an expired lease back in the queue, or in failed after the last attempt.
+    Units already done by a late worker are dropped.
+    """
+    queue_dir = Path(queue_dir)
+    for leased in sorted((queue_dir / 'leased').glob('*.txt')):
+        unit, attempt = get_unit(leased)
+        if (queue_dir / 'done' / f'{unit}.jsonl').exists():
+            leased.unlink(missing_ok=True)
+            continue
+        if not is_lease_expired(leased, ttl):
+            continue
+        if attempt >= max_attempts:
+            target = queue_dir / 'failed' / leased.name
+            print(f'Unit {unit}: lease expired, giving up after {attempt} attempts')
+        else:
+            target = queue_dir / 'pending' / f'{unit}.{attempt + 1}.txt'
+            print(f'Unit {unit}: lease expired, retrying (attempt {attempt + 1})')
+        try:
+            os.rename(leased, target)
+        except FileNotFoundError:
+            # Completed by its worker in the meantime
+            pass
+
+
+def get_progress(queue_dir):
+    """
+    Returns the number of done and failed units.
+    """
+    queue_dir = Path(queue_dir)
+    done = set(path.stem for path in (queue_dir / 'done').glob('*.jsonl'))
+    failed = set(get_unit(path)[0] for path in (queue_dir / 'failed').glob('*.txt')) - done
+    return len(done), len(failed)
+
+
+def assemble_report(queue_dir, job, targets=()):
+    """
+    Generates the report of a completed job and defers the targets of the failed units,
+    the other targets of the job being consumed from the deferred ones.
+
+    :return: The path of the report, or None if no report was generated
+    """
+    queue_dir = Path(queue_dir)
+    nuclei_output = with_compression(f'reports/report.nuclei.{job["timestamp"]}.jsonl', job['compression'])
+    text_output = with_compression(f'reports/report.nuclei.{job["timestamp"]}.txt', job['compression'])
+    done = sorted((queue_dir / 'done').glob('*.jsonl'))
+    if job['collapsed']:
+        for tmp_output in done:
+            attribute_report(tmp_output, job['collapsed'])
+    nuclei.generate_report(done, nuclei_output, text_output)
+    if job['collapsed'] and Path(nuclei_output).exists():
+        write_collapsed(nuclei_output, job['collapsed'])
+
+    deferred = []
+    for failed in sorted((queue_dir / 'failed').glob('*.txt')):
+        with open(failed, 'r', encoding='utf-8') as f:
+            deferred += [line.strip() for line in f if line.strip()]
+    deferred_file = update_deferred(targets, deferred)
+    if deferred:
+        print(f'{len(deferred)} targets of failed units deferred to the next run: {deferred_file}')
+
+    shutil.rmtree(queue_dir)
+    return nuclei_output if Path(nuclei_output).exists() else None
+
+
+def coordinator(input_file, queue_dir=QUEUE_DIR, top_domains=None, compression='', prioritize=True,
+                unit_size=UNIT_SIZE, wildcard_pruning=True, liveness_filter=True):
+    """
+    Queue the targets of the input file and assemble the report once every unit is processed.
+    """
+    if top_domains:
+        print(f'Run nuclei on specific domains: {", ".join(top_domains)}')
+        tmp_subdomains_file = f'/tmp/subdomains.{datetime.now().strftime("%Y%m%d-%H%M%S")}.txt'
+        nuclei.filter_subdomains(input_file, tmp_subdomains_file, top_domains)
+        input_file = tmp_subdomains_file
+
+    with open(input_file, 'r', encoding='utf-8') as f:
+        targets = [line.strip() for line in f if line.strip()]
+    input_targets = list(targets)
+    collapsed = {}
+    if wildcard_pruning or liveness_filter:
+        dns_cache = DnsCache()
+        if wildcard_pruning:
+            targets, collapsed = prune_targets(targets, dns_cache)
+        if liveness_filter:
+            targets, skipped = filter_live(targets, dns_cache)
+            print(f'{skipped} targets skipped, not resolving')
+        dns_cache.save()
+    if prioritize:
+        targets = prioritize_targets(targets)
+
+    job = create_job(queue_dir, targets, unit_size, compression, collapsed)
+    print(f'{len(targets)} targets queued in {job["units"]} units in {queue_dir}')
+
+    while True:
+        requeue_expired(queue_dir)
+        done, failed = get_progress(queue_dir)
+        if done + failed >= job['units']:
+            break
+        time.sleep(POLL_INTERVAL)
+    print(f'{done} units done, {failed} failed')
+    return assemble_report(queue_dir, job, input_targets)
+
+
+def lease_unit(queue_dir):
+    """
+    Leases the first pending unit.
+
+    :return: The path of the leased unit, or None if no unit is pending
+    """
+    queue_dir = Path(queue_dir)
+    for pending in sorted((queue_dir / 'pending').glob('*.txt')):
+        leased = queue_dir / 'leased' / pending.name
+        try:
+            os.rename(pending, leased)
+        except FileNotFoundError:
+            # Leased by another worker
+            continue
+        os.utime(leased)
+        return leased
+    return None
+
+
+def heartbeat(leased, stop, ttl=LEASE_TTL):
+    """
+    Keep the lease of a unit alive until stopped.
+    """
+    while not stop.wait(ttl / 3):
+        try:
+            os.utime(leased)
+        except FileNotFoundError:
+            # The lease expired and the unit was requeued
+            return
+
+
+def process_unit(queue_dir, leased, tuner=None, tcp_tuner=None):
+    """
+    Run the httpx, nuclei and TCP stages on a leased unit and publish its findings,
+    the HTTP and TCP stages being sized by their own tuner if any.
+    """
+    queue_dir = Path(queue_dir)
+    unit, attempt = get_unit(leased)
+    prefix = f'/tmp/report.nuclei.{unit}.{attempt}.{os.getpid()}'
+    tmp_outputs = [f'{prefix}.no.tcp.jsonl', f'{prefix}.tcp.jsonl']
+
+    stop = threading.Event()
+    threading.Thread(target=heartbeat, args=(leased, stop), daemon=True).start()
+    try:
+        nuclei.perform_scan(str(leased), tmp_outputs[0], tuner)
+        ip_file, ip_dict = nuclei.generate_ips(str(leased))
+        if ip_file:
+            nuclei.perform_tcp_scan(ip_file, tmp_outputs[1], tcp_tuner)
+            nuclei.add_metadata_tcp_scan(ip_dict, tmp_outputs[1])
+    finally:
+        stop.set()
+
+    # Out of done/, where the coordinator would count it before its rename
+    (queue_dir / 'tmp').mkdir(exist_ok=True)
+    tmp_done = queue_dir / 'tmp' / f'{unit}.{socket.gethostname()}.{os.getpid()}.jsonl'
+    with open_text(tmp_done, 'w') as out_file:
+        for tmp_output in tmp_outputs:
+            if Path(tmp_output).exists():
+                with open(tmp_output, 'r', encoding='utf-8') as in_file:
+                    shutil.copyfileobj(in_file, out_file)
+                Path(tmp_output).unlink()
+    os.replace(tmp_done, queue_dir / 'done' / f'{unit}.jsonl')
+    Path(leased).unlink(missing_ok=True)
+
+
+def fail_unit(queue_dir, leased):
+    """
+    Gives up a leased unit whose processing failed, its targets being deferred by the coordinator.
+    """
+    print(f'Unit {get_unit(leased)[0]}: failed, giving up')
+    try:
+        os.rename(leased, Path(queue_dir) / 'failed' / Path(leased).name)
+    except FileNotFoundError:
+        # The lease expired and the unit was requeued
+        pass
+
+
+def worker(queue_dir=QUEUE_DIR, adaptive=False, wait=False):
+    """
+    Process the units of the queue until the job is complete,
+    or forever waiting for the next job if wait is True.
+    """
+    nuclei.update_tools()
+    tuner = Tuner() if adaptive else None
+    tcp_tuner = Tuner(TCP_STATE_FILE) if adaptive else None
+    processed = 0
+    while True:
+        leased = lease_unit(queue_dir) if (Path(queue_dir) / 'job.json').exists() else None
+        if leased:
+            print(f'Processing unit {get_unit(leased)[0]}')
+            try:
+                process_unit(queue_dir, leased, tuner, tcp_tuner)
+            except Exception:
+                traceback.print_exc()
+                fail_unit(queue_dir, leased)
+                continue
+            processed += 1
+            continue
+        if not wait and not any(Path(queue_dir).glob('leased/*.txt')):
+            break
+        time.sleep(POLL_INTERVAL)
+    print(f'{processed} units processed')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spread the nuclei scans across several nodes')
+    parser.add_argument('command', choices=['coordinator', 'worker'])
+    parser.add_argument('input_file', nargs='?', default='targets.latest.txt',
+        help='The input file containing targets (coordinator)')
+    parser.add_argument('--queue', default=QUEUE_DIR, help='The shared queue directory')
+    parser.add_argument('--domain', action='append', default=[],
+        help='Scan only the subdomains of these domains, can be repeated or comma separated (coordinator)')
+    parser.add_argument('--compression', choices=['', 'gz', 'xz'],
+        default=getattr(settings, 'report_compression', ''),
+        help='Compress the report with gzip or xz (coordinator)')
+    parser.add_argument('--unit-size', type=int, default=UNIT_SIZE, help='Number of targets per unit (coordinator)')
+    parser.add_argument('--no-prioritize', action='store_true',
+        help='Queue the targets in file order (coordinator)')
+    parser.add_argument('--no-wildcard-pruning', action='store_true',
+        default=not getattr(settings, 'wildcard_pruning', True),
+        help='Queue every host of the wildcard DNS zones (coordinator)')
+    parser.add_argument('--no-liveness-filter', action='store_true',
+        default=not getattr(settings, 'liveness_filter', True),
+        help='Queue the targets which do not resolve too (coordinator)')
+    parser.add_argument('--adaptive', action='store_true',
+        help='Size the nuclei concurrency of each unit from the previous one (worker)')
+    parser.add_argument('--wait', action='store_true',
+        help='Keep waiting for the next job once the queue is empty (worker)')
+    args = parser.parse_args()
+
+    if args.command == 'coordinator':
+        if not Path(args.input_file).exists():
+            print(f'Input file "{args.input_file}" not found. Exiting.')
+            return
+        top_domains = [domain for value in args.domain for domain in value.split(',') if domain]
+        coordinator(args.input_file, args.queue, top_domains, args.compression, not args.no_prioritize,
+                    args.unit_size, not args.no_wildcard_pruning, not args.no_liveness_filter)
+    else:
+        worker(args.queue, args.adaptive, args.wait)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Persistent DNS answer cache, keyed by (name, rdtype).
+
+Positive answers are kept for their record TTL, bounded by a configurable
+floor and ceiling. Negative answers (NXDOMAIN, NoAnswer) are kept for a short
+time. The cache is stored as gzipped JSON and shared by every run.
+
+A cache may be shared by several threads, e.g. the resolver pools and the
+scan worker of monitor.py: its updates and saves are serialized by a lock.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+import dns.resolver
+import dns.reversename
+
+from config import settings
+
+# Debug
+# from pdb import set_trace as st
+
+CACHE_FILE = getattr(settings, 'dns_cache_file', 'dns_cache.json.gz')
+MIN_TTL = getattr(settings, 'dns_cache_min_ttl', 300)  # in seconds
+MAX_TTL = getattr(settings, 'dns_cache_max_ttl', 86400)  # in seconds
+NEGATIVE_TTL = getattr(settings, 'dns_cache_negative_ttl', 600)  # in seconds
+
+
+class DnsCache:
+    """
+    On-disk cache of DNS answers.
+
+    In cache-only mode, misses are answered as empty without any network query.
+    """
+    def __init__(self, cache_file=CACHE_FILE, cache_only=False,
+                 min_ttl=MIN_TTL, max_ttl=MAX_TTL, negative_ttl=NEGATIVE_TTL):
+        self.cache_file = cache_file
+        self.cache_only = cache_only
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.resolver = dns.resolver.Resolver()
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        Load the cache file, dropping expired entries.
+        """
+        try:
+            with gzip.open(self.cache_file, 'rt', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        self.entries = {key: entry for key, entry in entries.items() if entry[0] > now}
+
+    def save(self):
+        """
+        Atomically write the cache file, if anything changed.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_file = f'{self.cache_file}.{os.getpid()}'
+            with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_file, self.cache_file)
+            self.dirty = False
+
+    def get(self, name, rdtype):
+        """
+        Returns the cached answers for (name, rdtype), or None if missing or expired.
+        """
+        entry = self.entries.get(f'{name}|{rdtype}')
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    def put(self, name, rdtype, answers, ttl):
+        """
+        Store answers for (name, rdtype) during ttl seconds.
+        """
+        with self.lock:
+            self.entries[f'{name}|{rdtype}'] = [time.time() + ttl, answers]
+            self.dirty = True
+
+    def resolve(self, name, rdtype):
+        """
+        Resolve a record through the cache.
+
+        Args:
+            name (str): The name to resolve, or an IP address for PTR.
+            rdtype (str): The record type, e.g. 'A', 'CNAME' or 'PTR'.
+
+        Returns:
+            list: The answers as strings. Empty if the name does not resolve.
+        """
+        answers = self.get(name, rdtype)
+        if answers is not None:
+            return answers
+        if self.cache_only:
+            return []
+
+        try:
+            qname = dns.reversename.from_address(name) if rdtype == 'PTR' else name
+            answer = self.resolver.resolve(qname, rdtype)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            self.put(name, rdtype, [], self.negative_ttl)
+            return []
+        except Exception:
+            # Timeouts and server failures are not cached
+            return []
+
+        return self.store(name, rdtype, answer)
+
+    def store(self, name, rdtype, answer):
+        """
+        Store a dnspython answer for its record TTL, bounded by the floor and ceiling.
+
+        Returns:
+            list: The answers as strings.
+        """
+        answers = [str(rdata) for rdata in answer]
+        ttl = min(max(answer.rrset.ttl, self.min_ttl), self.max_ttl)
+        self.put(name, rdtype, answers, ttl)
+        return answers
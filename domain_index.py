@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Reversed-label index of a target file, e.g. "com.example.www" for "www.example.com".
+
+Hosts under an apex domain are contiguous in the sorted index, so selecting
+all the hosts of N apex domains is N binary searches. The index is built once
+and persisted next to the target file ("targets.latest.txt.idx"), then rebuilt
+only when the target file changes.
+
+Usage:
+    python domain_index.py [-f targets.latest.txt] --domain example.com --domain example.org [--min-depth 3]
+"""
+
+import argparse
+from bisect import bisect_left
+import gzip
+import os
+
+# Debug
+# from pdb import set_trace as st
+
+INDEX_SUFFIX = '.idx'
+
+
+def reverse_labels(host):
+    """
+    Returns a host with its labels reversed, e.g. "com.example.www" for "www.example.com".
+    """
+    return '.'.join(reversed(host.lower().rstrip('.').split('.')))
+
+
+def build_index(input_file):
+    """
+    Builds the sorted index of a target file.
+    Targets with a port ("host:port") are indexed under their host.
+
+    :param input_file: The target file, one host per line
+    :return: A sorted list of "reversed_host" or "reversed_host\ttarget" entries
+    """
+    entries = set()
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            target = line.strip()
+            if not target:
+                continue
+            host = target.split(':')[0]
+            key = reverse_labels(host)
+            entries.add(key if host == target else f'{key}\t{target}')
+    return sorted(entries)
+
+
+def load_index(input_file):
+    """
+    Loads the persisted index of a target file, building it if missing or stale.
+
+    :param input_file: The target file
+    :return: The sorted list of entries
+    """
+    index_file = input_file + INDEX_SUFFIX
+    stat = os.stat(input_file)
+    header = f'# {stat.st_size} {stat.st_mtime_ns}'
+    try:
+        with gzip.open(index_file, 'rt', encoding='utf-8') as f:
+            if f.readline().rstrip('\n') == header:
+                return f.read().splitlines()
+    except OSError:
+        pass
+
+    entries = build_index(input_file)
+    tmp_file = f'{index_file}.{os.getpid()}'
+    with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+        f.write(header + '\n')
+        f.write('\n'.join(entries))
+    os.replace(tmp_file, index_file)
+    return entries
+
+
+def get_target(entry):
+    """
+    Returns the target of an index entry.
+    """
+    key, _, target = entry.partition('\t')
+    return target or reverse_labels(key)
+
+
+def select_hosts(entries, apexes=None, min_depth=0):
+    """
+    Selects the targets under any of the apex domains, with at least min_depth labels.
+
+    :param entries: The sorted index
+    :param apexes: A list of apex domains, every target if empty
+    :param min_depth: The minimum number of labels, e.g. 3 for "www.example.com"
+    :return: A list of targets
+    """
+    if not apexes:
+        return [get_target(entry) for entry in entries if entry.partition('\t')[0].count('.') + 1 >= min_depth]
+
+    # Skip apexes already covered by a parent apex, e.g. "dev.example.com" with "example.com"
+    apex_keys = []
+    for apex_key in sorted(set(reverse_labels(apex) for apex in apexes)):
+        if not apex_keys or not apex_key.startswith(apex_keys[-1] + '.'):
+            apex_keys.append(apex_key)
+
+    targets = []
+    for apex_key in apex_keys:
+        start = bisect_left(entries, apex_key)
+        # '/' sorts right after '.', so every "apex_key.*" entry is below this bound
+        end = bisect_left(entries, apex_key + '/', lo=start)
+        for entry in entries[start:end]:
+            key = entry.partition('\t')[0]
+            # e.g. "com.example-shop" is also sorted between "com.example" and "com.example/"
+            if key != apex_key and not key.startswith(apex_key + '.'):
+                continue
+            if key.count('.') + 1 >= min_depth:
+                targets.append(get_target(entry))
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Select targets under apex domains')
+    parser.add_argument('-f', '--file', default='targets.latest.txt', help='The target file')
+    parser.add_argument('--domain', action='append', default=[],
+        help='An apex domain, can be repeated or comma separated')
+    parser.add_argument('--min-depth', type=int, default=0,
+        help='Minimum number of labels, e.g. 3 for "www.example.com"')
+    args = parser.parse_args()
+
+    apexes = [apex for value in args.domain for apex in value.split(',') if apex]
+    for target in select_hosts(load_index(args.file), apexes, args.min_depth):
+        print(target)
+
+
+if __name__ == '__main__':
+    main()
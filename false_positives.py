@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+"""
+False-positive rules engine, applied by every report reader.
+
+Rules come from the settings:
+- false_positive: exact findings, as report lines. Only their identity, the
+  first 4 columns, is kept as a 64-bit hash, so trailing metadata, newline or
+  later changes of the extracted results do not matter.
+- ignored_templates: template-id prefixes to ignore, e.g. "waf-detect"
+- false_positive_rules: template-id and host-glob rules, either suppressing
+  the findings or overriding their severity, e.g.
+    {'template': 'git-config', 'host': '*.sandbox.example.com'}
+    {'template': '*', 'host': 'honeypot.example.com'}
+    {'template': 'openssh-detect', 'host': '*', 'severity': 'low'}
+
+The rules are compiled once into a set of hashes, a prefix trie of templates
+and, per template, a reversed-label trie of hosts, so that the cost per
+finding does not depend on the number of rules.
+
+Usage:
+    cat report.txt | python false_positives.py filter
+"""
+
+import argparse
+import fnmatch
+import re
+import sys
+
+from config import settings
+from findings import LINE_PATTERN, get_asset, get_severity, parse_line
+from report_fingerprints import finding_hash, record_hash
+
+# Debug
+# from pdb import set_trace as st
+
+SUPPRESS = 'suppress'
+ANY = '*'
+# Key of the action in a trie node, it cannot be a host label nor a character of a template-id
+END = None
+
+
+class PrefixTrie:
+    """
+    Character trie answering "does the value start with any of the prefixes".
+    """
+    def __init__(self, prefixes=()):
+        self.root = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[END] = True
+
+    def match(self, value):
+        node = self.root
+        if END in node:
+            return True
+        for char in value:
+            node = node.get(char)
+            if node is None:
+                return False
+            if END in node:
+                return True
+        return False
+
+
+class HostTrie:
+    """
+    Reversed-label trie of host globs: "www.example.com", "*.example.com" or "*".
+    Other globs, e.g. "dev-*.example.com", are compiled into a single regex.
+    """
+    def __init__(self):
+        self.root = {}
+        self.globs = []
+        self.regex = None
+
+    def add(self, pattern, action):
+        labels = pattern.lower().rstrip('.').split('.')
+        if ANY in labels[1:] or any(char in label for label in labels for char in '*?[' if label != ANY):
+            self.globs.append((pattern.lower(), action))
+            self.regex = re.compile('|'.join(f'(?P<g{i}>{fnmatch.translate(glob)})'
+                                             for i, (glob, _) in enumerate(self.globs)))
+            return
+        node = self.root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        node[END] = action
+
+    def match(self, host):
+        """
+        Returns the action of the most specific pattern matching the host, or None.
+        """
+        action = None
+        node = self.root
+        for label in reversed(host.lower().rstrip('.').split('.')):
+            # "*" matches one or more labels
+            if ANY in node:
+                action = node[ANY].get(END, action)
+            node = node.get(label)
+            if node is None:
+                break
+        else:
+            action = node.get(END, action)
+        if action is None and self.regex:
+            match = self.regex.match(host.lower())
+            if match:
+                action = self.globs[int(match.lastgroup[1:])][1]
+        return action
+
+
+class Rules:
+    """
+    Compiled false-positive rules.
+    """
+    def __init__(self, false_positive=(), ignored_templates=(), rules=()):
+        self.hashes = set(filter(None, (finding_hash(line) for line in false_positive)))
+        self.ignored_templates = PrefixTrie(ignored_templates)
+        self.hosts = {}
+        for rule in rules:
+            trie = self.hosts.setdefault(rule.get('template', ANY), HostTrie())
+            trie.add(rule.get('host', ANY), rule.get('severity', SUPPRESS))
+
+    def get_action(self, record):
+        """
+        Returns the action of the host rules on a record: SUPPRESS, a severity, or None.
+        TCP findings on an IP also match the rules of its subdomains.
+        """
+        tries = [trie for trie in (self.hosts.get(record['template-id']), self.hosts.get(ANY)) if trie]
+        if not tries:
+            return None
+        hosts = [get_asset(record)] + record.get('subdomains', [])
+        for trie in tries:
+            for host in hosts:
+                action = trie.match(host)
+                if action:
+                    return action
+        return None
+
+    def apply(self, record):
+        """
+        Returns the record, with its severity overridden if a rule says so, or None if it is a false positive.
+        """
+        if self.ignored_templates.match(record['template-id']):
+            return None
+        if self.hashes and record_hash(record) in self.hashes:
+            return None
+        action = self.get_action(record)
+        if action == SUPPRESS:
+            return None
+        if action:
+            record.setdefault('info', {})['severity'] = action
+        return record
+
+    def filter(self, records):
+        """
+        Yields the records which are not false positives.
+        """
+        for record in records:
+            record = self.apply(record)
+            if record:
+                yield record
+
+
+_RULES = None
+
+
+def load_rules():
+    """
+    Returns the rules of the settings, compiled once.
+    """
+    global _RULES
+    if _RULES is None:
+        _RULES = Rules(getattr(settings, 'false_positive', []),
+                       getattr(settings, 'ignored_templates', []),
+                       getattr(settings, 'false_positive_rules', []))
+    return _RULES
+
+
+def filter_lines(lines):
+    """
+    Yields the text report lines which are not false positives, without newline.
+    Lines are kept as is, parsing a line back into a record being lossy,
+    only the severity of the overridden findings is rewritten.
+    """
+    rules = load_rules()
+    for line in lines:
+        line = line.rstrip('\n')
+        record = parse_line(line)
+        if not record:
+            yield line
+            continue
+        severity = get_severity(record)
+        record = rules.apply(record)
+        if not record:
+            continue
+        if get_severity(record) == severity:
+            yield line
+        else:
+            match = LINE_PATTERN.search(line)
+            yield line[:match.start(3)] + get_severity(record) + line[match.end(3):]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the false-positive rules of the settings')
+    parser.add_argument('command', choices=['filter'],
+        help='filter: read text report lines on stdin, print the remaining ones')
+    parser.parse_args()
+
+    for line in filter_lines(sys.stdin):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+Structured nuclei findings.
+
+Reports are stored as nuclei JSONL records ("report.nuclei.<ts>.jsonl"),
+TCP findings carrying the subdomains of their IP in a "subdomains" field.
+The text report ("report.nuclei.<ts>.txt") is a view derived from these
+records for humans and shell tools.
+
+Legacy text reports are parsed into the same records, so every reader
+can consume both.
+"""
+
+import json
+import re
+from pathlib import Path
+
+from report_io import open_text, strip_compression
+
+# Debug
+# from pdb import set_trace as st
+
+LINE_PATTERN = re.compile(r'\[([^\]]+)\] \[([^\]]+)\] \[([^\]]+)\] (.*)')
+# e.g. "report.nuclei.20230427-143329.jsonl.gz"
+REPORT_PATTERN = re.compile(r'report\.nuclei\.(\d{8}-\d{6})\.(txt|jsonl)(\.gz|\.xz)?$')
+
+
+def is_jsonl(path):
+    """
+    Returns True if the report is a JSONL report, compressed or not.
+    """
+    return strip_compression(Path(path).name).endswith('.jsonl')
+
+
+def parse_line(line):
+    """
+    Parses a line of a text report into a record.
+
+    :param line: A line from a nuclei text report
+    :return: A record, or None if the line is not a finding
+    """
+    match = LINE_PATTERN.search(line.strip())
+    if not match:
+        return None
+    label, protocol, severity, rest = match.groups()
+    template_id, _, matcher_name = label.partition(':')
+    endpoint, _, extra = rest.partition(' ')
+
+    subdomains = []
+    if 'subdomains:' in extra:
+        extra, _, subdomains = extra.rpartition('subdomains:')
+        subdomains = [subdomain for subdomain in subdomains.split(',') if subdomain]
+
+    extracted_results = []
+    extra = extra.strip()
+    if extra.startswith('[') and extra.endswith(']'):
+        try:
+            extracted_results = [str(value) for value in json.loads(extra)]
+        except (ValueError, TypeError):
+            extracted_results = extra[1:-1].split(',')
+    elif extra:
+        extracted_results = [extra]
+
+    record = {
+        'template-id': template_id,
+        'info': {'severity': severity},
+        'type': protocol,
+        'host': endpoint,
+        'matched-at': endpoint,
+    }
+    if matcher_name:
+        record['matcher-name'] = matcher_name
+    if extracted_results:
+        record['extracted-results'] = extracted_results
+        # Legacy extras which are not JSON, e.g. [a,b], are displayed as they were
+        if get_extra(record) != extra:
+            record['text-extra'] = extra
+    if subdomains:
+        record['subdomains'] = subdomains
+    return record
+
+
+def read_findings(path):
+    """
+    Streams the records of a report, JSONL or text, compressed or not.
+
+    :param path: Path of the report
+    :return: A generator of records
+    """
+    with open_text(path) as f:
+        if is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for line in f:
+                record = parse_line(line)
+                if record:
+                    yield record
+
+
+def get_label(record):
+    """
+    Returns the "template-id[:matcher-name]" label of a record, e.g. "wordpress-detect:version_by_js"
+    """
+    if record.get('matcher-name'):
+        return f"{record['template-id']}:{record['matcher-name']}"
+    return record['template-id']
+
+
+def get_severity(record):
+    """
+    Returns the severity of a record, e.g. "high"
+    """
+    return record.get('info', {}).get('severity', 'unknown')
+
+
+def get_endpoint(record):
+    """
+    Returns where a record matched, e.g. "https://www.example.com/.git/config"
+    """
+    return record.get('matched-at') or record.get('host', '')
+
+
+def get_asset(record):
+    """
+    Returns the host or IP of a record, without scheme, path nor port.
+    """
+    endpoint = get_endpoint(record)
+    if endpoint.startswith('http:') or endpoint.startswith('https:'):
+        endpoint = endpoint.split('/')[2]
+    return endpoint.split(':')[0].split(' ')[0]
+
+
+def get_extra(record):
+    """
+    Returns the extracted results of a record as displayed in the text report, e.g. '["5.8"]'
+    """
+    if 'text-extra' in record:
+        return record['text-extra']
+    extracted_results = record.get('extracted-results')
+    if not extracted_results:
+        return ''
+    return json.dumps(extracted_results, ensure_ascii=False, separators=(',', ':'))
+
+
+def get_metadata(record):
+    """
+    Returns what follows the endpoint in the text report line of a record,
+    e.g. '["SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5"] subdomains:www.example.com'
+    """
+    metadata = [get_extra(record)]
+    if record.get('subdomains'):
+        metadata.append('subdomains:' + ','.join(record['subdomains']))
+    return ' '.join(value for value in metadata if value)
+
+
+def format_line(record):
+    """
+    Returns the text report line of a record, without newline.
+    """
+    line = f"[{get_label(record)}] [{record['type']}] [{get_severity(record)}] {get_endpoint(record)}"
+    metadata = get_metadata(record)
+    if metadata:
+        line += f' {metadata}'
+    return line
+
+
+def write_text_view(records, text_output):
+    """
+    Writes the text report derived from records.
+
+    :param records: An iterable of records
+    :param text_output: Path of the text report, compressed if it ends with .gz or .xz
+    """
+    with open_text(text_output, 'w') as f:
+        for record in records:
+            f.write(format_line(record) + '\n')
+
+
+def list_reports(directory='reports'):
+    """
+    Returns the reports of a directory, one per timestamp, from the oldest to the most recent.
+    When a run has both a JSONL report and its text view, the JSONL report is returned.
+
+    :param directory: The reports directory
+    :return: List of paths
+    """
+    reports = {}
+    for path in Path(directory).glob('report.nuclei.*'):
+        match = REPORT_PATTERN.match(path.name)
+        if not match:
+            continue
+        timestamp = match.group(1)
+        if timestamp not in reports or is_jsonl(path):
+            reports[timestamp] = path
+    return [reports[timestamp] for timestamp in sorted(reports)]
+
+
+def get_timestamp(path):
+    """
+    Returns the timestamp of a report, e.g. "20230427-143329".
+    """
+    return REPORT_PATTERN.match(Path(path).name).group(1)
@@ -1,113 +1,242 @@
 #!/usr/bin/env python
 """
 This script uses the grayhatwarfare.com API
-to fetch and display bucket information based on a keyword,
+to fetch and display bucket information based on one or more keywords,
 optimizing subsequent searches for the same keyword by
-loading results from a temporary file instead of making repeated API requests.
+loading results from a compressed cache instead of making repeated API requests.
 """
 
 import argparse
-import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+import gzip
 import json
 import os
-import pickle
 import re
-import requests
 import sys
+import threading
+import time
+import requests
 
 # Custom imports
-try:
-    spec = importlib.util.spec_from_file_location("settings", "settings.py")
-    settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(settings)
-except FileNotFoundError:
-    # If settings.py doesn't exist, import settings.py.sample
-    print("Warning: settings.py not found. Falling back to settings.sample.py !")
-    spec = importlib.util.spec_from_file_location("settings", "settings.sample.py")
-    settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(settings)
+from config import settings
 
 # Debug
-from pdb import set_trace as st
+# from pdb import set_trace as st
+
+API_URL = "https://buckets.grayhatwarfare.com/api/v2/files"
+PAGE_SIZE = 1000
+CACHE_DIR = "/tmp"
+CACHE_TTL = getattr(settings, 'graywarefare_cache_ttl', 86400)  # in seconds
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = getattr(settings, 'graywarefare_rate_limit', 2)
+
+# Second level labels that are not a brand, e.g. "co" in "example.co.uk"
+GENERIC_SLD = frozenset(['ac', 'co', 'com', 'edu', 'gov', 'net', 'org'])
+
+
+class RateLimiter:
+    """
+    Thread safe limiter spacing out calls to at most `rate` per second.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_call = 0.0
+
+    def wait(self):
+        """
+        Block until the next call is allowed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+RATE_LIMITER = RateLimiter(REQUESTS_PER_SECOND)
+
+
+def get_cache_file(keyword):
+    """
+    Returns the path of the compressed cache file for a keyword.
+    """
+    safe_keyword = re.sub(r'[^A-Za-z0-9_.-]', '_', keyword)
+    return os.path.join(CACHE_DIR, f"{safe_keyword}_tmp_file.json.gz")
+
+
+def load_cache(keyword, ttl=CACHE_TTL):
+    """
+    Function to load a cached result if it is younger than the TTL.
+
+    Args:
+        keyword: The keyword of the cached search.
+        ttl: The maximum age of the cache, in seconds.
+
+    Returns:
+        The cached result, or None if missing or expired.
+    """
+    cache_file = get_cache_file(keyword)
+    try:
+        if time.time() - os.path.getmtime(cache_file) > ttl:
+            return None
+        with gzip.open(cache_file, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cache(keyword, result):
+    """
+    Function to store a result in the compressed cache.
+    """
+    cache_file = get_cache_file(keyword)
+    tmp_file = f"{cache_file}.{os.getpid()}"
+    with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+        json.dump(result, f)
+    os.replace(tmp_file, cache_file)
+
 
-def get_buckets_info(keyword):
+def fetch_page(session, keyword, start):
+    """
+    Function to get a single page of results from the API.
+
+    Args:
+        session: The requests session to use.
+        keyword: The keyword to search in the API.
+        start: The offset of the first result of the page.
+
+    Returns:
+        The decoded JSON page.
+    """
+    headers = {
+        'Authorization': f'Bearer {settings.graywarefare_api_key}'
+    }
+    params = {
+        'keywords': keyword,
+        'start': start,
+        'limit': PAGE_SIZE,
+    }
+    RATE_LIMITER.wait()
+    response = session.get(API_URL, headers=headers, params=params)
+
+    if response.status_code != 200:
+        print(response.text)
+        sys.exit(1)
+    return json.loads(response.text)
+
+
+def get_buckets_info(keyword, ttl=CACHE_TTL):
     """
     Function to get bucket information based on a given keyword.
 
-    It makes a GET request to the API endpoint and retrieves the
-    result. If a temporary file with the result for the same keyword
-    exists, it loads the result from the file instead of making
-    another API request.
+    It fetches the first page from the API endpoint, then all the
+    remaining pages concurrently. If a cached result for the same
+    keyword exists and is younger than the TTL, it loads the result
+    from the cache instead of making other API requests.
 
     Args:
         keyword: The keyword to search in the API.
+        ttl: The maximum age of the cache, in seconds.
 
     Returns:
-        The result from the API request or from the temporary file.
-    """
-    tmp_file = f"/tmp/{keyword}_tmp_file.pkl"
-    if os.path.exists(tmp_file):
-        with open(tmp_file, 'rb') as f:
-            result = pickle.load(f)
-    else:
-        url = "https://buckets.grayhatwarfare.com/api/v2/files"
-        headers = {
-            'Authorization': f'Bearer {settings.graywarefare_api_key}'
-        }
-        params = {
-            'keywords': keyword,
-        }
-        response = requests.get(url, headers=headers, params=params)
-
-        if response.status_code != 200:
-            print(response.text)
-            sys.exit(1)
-        result = json.loads(response.text)
-        with open(tmp_file, 'wb') as f:
-            pickle.dump(result, f)
+        The merged result of all pages, or the cached result.
+    """
+    result = load_cache(keyword, ttl)
+    if result is not None:
+        return result
+
+    with requests.Session() as session:
+        result = fetch_page(session, keyword, 0)
+        total = int(result['meta']['results'])
+        offsets = range(PAGE_SIZE, total, PAGE_SIZE)
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            pages = executor.map(lambda start: fetch_page(session, keyword, start), offsets)
+            for page in pages:
+                result['files'].extend(page['files'])
+
+    save_cache(keyword, result)
     return result
 
 
-def parse_buckets_info(result):
+def parse_buckets_info(results):
     """
-    Function to parse the result and extract the bucket names and other stats.
+    Function to parse the results and extract the bucket names and other stats.
+
+    Buckets are deduplicated across keywords in a single pass, keeping the
+    first file seen as example URL.
 
     Args:
-        result: The result to parse.
+        results: A dict of keyword to result to parse.
 
     Returns:
         The extracted bucket names and other stats.
     """
-    files = result['files']
-    unique_buckets = list(set([file['bucket'] for file in files]))
-    bucket_info = []
-    for bucket in unique_buckets:
-        for file in files:
-            if file['bucket'] == bucket:
-                bucket_info.append([bucket, file['url']])
-                break
-
-    other_stats = {
-        'total_results': result['meta']['results'],
-        'total_files_in_index': result['meta']['notice'].split(' ')[9],
-    }
+    buckets = {}
+    for keyword, result in results.items():
+        for file in result['files']:
+            if file['bucket'] not in buckets:
+                buckets[file['bucket']] = [file['bucket'], file['url'], keyword]
+    bucket_info = list(buckets.values())
+
+    other_stats = {}
+    for keyword, result in results.items():
+        other_stats[keyword] = {
+            'total_results': result['meta']['results'],
+            'total_files_in_index': result['meta']['notice'].split(' ')[9],
+        }
     return bucket_info, other_stats
 
 
+def keywords_from_targets(targets_file):
+    """
+    Derive search keywords from a list of domains, e.g. "example" for
+    "www.example.co.uk".
+
+    Args:
+        targets_file: The file containing domains, one per line.
+
+    Returns:
+        A sorted list of unique keywords.
+    """
+    keywords = set()
+    with open(targets_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            labels = line.strip().lower().split('.')
+            if len(labels) < 2:
+                continue
+            labels = labels[:-1]
+            if len(labels) > 1 and labels[-1] in GENERIC_SLD:
+                labels = labels[:-1]
+            keywords.add(labels[-1])
+    return sorted(keywords)
+
+
 def main():
     parser = argparse.ArgumentParser(description='Get bucket info')
-    parser.add_argument('keyword', type=str, help='Keyword to search')
+    parser.add_argument('keywords', type=str, nargs='*', help='Keywords to search')
+    parser.add_argument('-f', '--file', help='Derive keywords from a file of domains, e.g. targets.txt')
+    parser.add_argument('--ttl', type=int, default=CACHE_TTL, help='Cache TTL in seconds')
     args = parser.parse_args()
 
-    result = get_buckets_info(args.keyword)
-    bucket_info, other_stats = parse_buckets_info(result)
+    keywords = list(args.keywords)
+    if args.file:
+        keywords += [keyword for keyword in keywords_from_targets(args.file) if keyword not in keywords]
+    if not keywords:
+        parser.error('at least one keyword or --file is required')
+
+    results = {keyword: get_buckets_info(keyword, args.ttl) for keyword in keywords}
+    bucket_info, other_stats = parse_buckets_info(results)
+
+    # Highlight keywords in red (case insensitive)
+    keyword_pattern = re.compile('(' + '|'.join(re.escape(keyword) for keyword in keywords) + ')', flags=re.IGNORECASE)
 
     print("Bucket Name\t\t\tExample URL")
     for info in bucket_info:
         # Highlight bucket name in green
         bucket_name = f"\033[92m{info[0]}\033[0m"
-        # Highlight keyword in red (case insensitive)
-        example_url = re.sub(f'({args.keyword})', f'\033[91m\\1\033[0m', info[1], flags=re.IGNORECASE)
+        example_url = keyword_pattern.sub('\033[91m\\1\033[0m', info[1])
         print(f"{bucket_name}\t\t{example_url}")
 
     print(f'Other Stats: {other_stats}')
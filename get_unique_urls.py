@@ -2,16 +2,30 @@
 """
 This script retrieves unique URLs for a given subdomain from web.archive.org,
 ignoring files with specified extensions.
+
+URLs are canonicalized (lowercase scheme and host, default port removed,
+sorted query keys, no fragment, optionally no query values) and deduplicated
+against a hashed index, so that urls.txt keeps a single variant per endpoint.
 """
 
 import argparse
+from hashlib import blake2b
+from itertools import chain
 import json
+import os
 import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from requests import RequestException, Session
 
+from output import sorted_rows
+
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # in seconds
 SESSION = Session()
+IGNORED_EXTENSIONS = frozenset([
+    'css', 'eot', 'gif', 'jpg', 'js', 'png', 'svg', 'ttf', 'webp', 'woff', 'woff2',
+])
+DEFAULT_PORTS = {'http': 80, 'https': 443}
 
 def get_unique_urls(subdomain: str) -> list:
     """
@@ -44,6 +58,68 @@ def get_unique_urls(subdomain: str) -> list:
                 print(f"Failed to retrieve unique URLs for subdomain: {subdomain}")
                 return []
 
+def is_ignored(url: str) -> bool:
+    """
+    Returns True if the URL is a static file with an ignored extension.
+    """
+    return url.split('?')[0].split('.')[-1].lower() in IGNORED_EXTENSIONS
+
+def canonicalize_url(url: str, drop_values: bool = False) -> str:
+    """
+    Returns the canonical form of a URL, e.g. "http://example.com/a?b=2&c=1"
+    for "HTTP://Example.COM:80/a?c=1&b=2#top".
+
+    :param url: The URL to canonicalize
+    :param drop_values: If True, only keep the query keys, e.g. "http://example.com/a?b=&c="
+    :return: The canonical URL, or the URL itself if it cannot be parsed
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        netloc = (parts.hostname or '').rstrip('.')
+        if ':' in netloc:
+            # IPv6
+            netloc = f'[{netloc}]'
+        if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+            netloc += f':{parts.port}'
+    except ValueError:
+        return url.strip()
+    if parts.username:
+        netloc = parts.netloc.rpartition('@')[0] + '@' + netloc
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if drop_values:
+        query = [(key, '') for key in dict.fromkeys(key for key, _ in query)]
+    return urlunsplit((scheme, netloc, parts.path or '/', urlencode(sorted(query)), ''))
+
+class UrlIndex:
+    """
+    Hashed index of the URLs already seen, 64-bit integers instead of full strings.
+    """
+    def __init__(self):
+        self.hashes = set()
+
+    def add(self, url: str) -> bool:
+        """
+        Adds a URL to the index, returns False if it was already there.
+        """
+        value = int.from_bytes(blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+        if value in self.hashes:
+            return False
+        self.hashes.add(value)
+        return True
+
+def read_corpus(corpus_file: str):
+    """
+    Yields the URLs of the corpus file, if it exists.
+    """
+    try:
+        with open(corpus_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+    except FileNotFoundError:
+        pass  # File doesn't exist yet, continue
+
 def main():
     """
     Parse command line arguments, retrieve unique URLs for each line in a file and print the filtered output.
@@ -53,6 +129,9 @@ def main():
     group.add_argument('-d', '--domain', help='The domain to retrieve URLs for')
     group.add_argument('-f', '--file', help='The file containing subdomains to retrieve URLs for, one per line')
     parser.add_argument('--all', action='store_true', help='Ignore extension filtering and display all URLs')
+    parser.add_argument('--drop-values', action='store_true',
+        help='Only keep the query keys, so that URLs differing by their parameter values are merged')
+    parser.add_argument('-o', '--output', default='urls.txt', help='The URL corpus file, updated in place')
 
     args = parser.parse_args()
 
@@ -62,44 +141,24 @@ def main():
         with open(args.file, 'r', encoding='utf-8') as f:
             subdomains = f.read().splitlines()
 
-    all_urls = set()  # Use a set to ensure uniqueness
-
-    for subdomain in subdomains:
-        unique_urls = get_unique_urls(subdomain)
-
-        for url in unique_urls:
-            if not args.all:
-                extension = url.split('?')[0].split('.')[-1]
-                if extension in [
-                    'css',
-                    'eot',
-                    'gif',
-                    'jpg',
-                    'js',
-                    'png',
-                    'svg',
-                    'ttf',
-                    'webp',
-                    'woff',
-                    'woff2',
-                ]:
-                    continue
-            all_urls.add(url)
-
-    # Read the existing URLs from 'urls.txt' and add to the set
-    try:
-        with open('urls.txt', 'r', encoding='utf-8') as f:
-            existing_urls = f.read().splitlines()
-            all_urls.update(existing_urls)
-    except FileNotFoundError:
-        pass  # File doesn't exist yet, continue
-
-    sorted_urls = sorted(all_urls)  # Sort the unique URLs
-
-    # Write the unique URLs to 'urls.txt'
-    with open('urls.txt', 'w', encoding='utf-8') as f:
-        for url in sorted_urls:
+    def new_urls():
+        for subdomain in subdomains:
+            for url in get_unique_urls(subdomain):
+                if args.all or not is_ignored(url):
+                    yield url
+
+    # The existing corpus is canonicalized too, so that older raw variants collapse
+    index = UrlIndex()
+    unique_urls = (url for url in (canonicalize_url(url, args.drop_values)
+                                   for url in chain(read_corpus(args.output), new_urls()))
+                   if index.add(url))
+
+    # Sort the unique URLs with a bounded memory, then write them to the corpus
+    tmp_file = f'{args.output}.{os.getpid()}'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        for url in sorted_rows(unique_urls):
             f.write(url + '\n')
+    os.replace(tmp_file, args.output)
 
 if __name__ == '__main__':
     main()
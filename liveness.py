@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+DNS liveness pre-filter of the scan targets.
+
+targets.latest.txt only grows, and keeps historical subdomains which no longer
+resolve, on which httpx would only burn its timeouts. The targets are resolved
+in bulk, through the DNS cache, and only those which resolve go downstream.
+
+Only NXDOMAIN drops a target: names without A record, timeouts and server
+failures are kept for httpx to decide. NXDOMAIN verdicts are cached for the
+re-check interval, so that dead names are not queried again on every run,
+while those which come back are picked up within the interval.
+
+Usage:
+    python liveness.py [targets.latest.txt] [-o targets.live.txt] [--cache-only]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import ipaddress
+import dns.resolver
+
+from config import settings
+from dns_cache import DnsCache
+
+# Debug
+# from pdb import set_trace as st
+
+RECHECK_INTERVAL = getattr(settings, 'liveness_recheck_interval', 3 * 86400)  # in seconds
+RESOLVE_WORKERS = getattr(settings, 'liveness_workers', 100)
+
+
+def get_host(target):
+    """
+    Returns the hostname of a target, e.g. "www.example.com" for "https://www.example.com:8443/path",
+    "2001:db8::1" for "https://[2001:db8::1]:8443/path"
+    """
+    netloc = target.split('://')[-1].split('/')[0]
+    if netloc.startswith('['):
+        return netloc[1:].split(']')[0].lower()
+    if is_ip(netloc):
+        # A bare IPv6 address
+        return netloc.lower()
+    return netloc.rsplit(':', 1)[0].lower()
+
+
+def is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def is_live(host, cache):
+    """
+    Returns False if the host is known not to exist, from the cache or a fresh A query.
+    """
+    if is_ip(host) or cache.get(host, 'A'):
+        return True
+    if cache.get(host, 'NXDOMAIN') is not None:
+        return False
+    if cache.cache_only:
+        return True
+
+    try:
+        answer = cache.resolver.resolve(host, 'A')
+    except dns.resolver.NXDOMAIN:
+        cache.put(host, 'NXDOMAIN', [], RECHECK_INTERVAL)
+        return False
+    except Exception:
+        # No A record, timeouts and server failures: httpx decides
+        return True
+    cache.store(host, 'A', answer)
+    return True
+
+
+def filter_live(targets, cache):
+    """
+    Drops the targets whose hostname does not exist.
+
+    :param targets: List of targets, hostnames, host:port or URLs
+    :param cache: The DNS cache
+    :return: A tuple (live targets, number of skipped targets)
+    """
+    hosts = list(dict.fromkeys(get_host(target) for target in targets))
+    with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as executor:
+        verdicts = dict(zip(hosts, executor.map(lambda host: is_live(host, cache), hosts)))
+    live = [target for target in targets if verdicts[get_host(target)]]
+    return live, len(targets) - len(live)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drop the scan targets which do not resolve')
+    parser.add_argument('input_file', nargs='?', default='targets.latest.txt',
+        help='The input file containing targets')
+    parser.add_argument('-o', '--output', help='The live target file, stdout by default')
+    parser.add_argument('--cache-only', action='store_true', help='Only use cached DNS answers, no network query')
+    args = parser.parse_args()
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        targets = [line.strip() for line in f if line.strip()]
+
+    cache = DnsCache(cache_only=args.cache_only)
+    try:
+        live, skipped = filter_live(targets, cache)
+    finally:
+        cache.save()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(live) + '\n')
+        print(f'{skipped} targets skipped, not resolving, {len(live)} targets left in {args.output}')
+    else:
+        print('\n'.join(live))
+
+
+if __name__ == '__main__':
+    main()
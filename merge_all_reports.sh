@@ -2,10 +2,20 @@
 
 merged_output="report.nuclei.latest.txt"
 
-# "ls -r" keeps the latest event first
-ls -r reports/report.nuclei.2* | xargs cat | awk -F' ' '!seen[$1, $2, $3, $4]++' | sort -u > "$merged_output"
+# Stream a report, decompressing it on the fly when it is .gz or .xz
+read_report() {
+    case "$1" in
+        *.gz) gzip -dc "$1" ;;
+        *.xz) xz -dc "$1" ;;
+        *) cat "$1" ;;
+    esac
+}
 
-cat "$merged_output" | grep -v 'dmarc-detect\|caa-fingerprint\|mx-fingerprint\|switch-protocol\|options-method\|tech-detect\|cname-service\|mismatched-ssl-certificate\|ssl-dns-names\|ssl-issuer\|txt-fingerprint\|cname-fingerprint\|nameserver-fingerprint\|apple-app-site-association\|waf-detect\|secui-waf-detect\|dns-waf-detect\|http-missing-security-headers\|weak-cipher-suites\|mx-service-detector' > /tmp/merged
+# "ls -r" keeps the latest event first, the reports of running scans are still .partial
+ls -r reports/report.nuclei.2*.txt* | grep -v '\.partial$' | while read -r report; do read_report "$report"; done | awk -F' ' '!seen[$1, $2, $3, $4]++' | sort -u > "$merged_output"
+
+# Drop the ignored templates and the false positives of the settings
+python3 false_positives.py filter < "$merged_output" > /tmp/merged
 
 mv /tmp/merged "$merged_output"
 
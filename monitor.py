@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""
+Long-running monitoring daemon.
+
+It keeps the DNS cache, the nuclei template index and the known targets in
+memory, shared with every scan it runs, runs the subdomain discovery on its own schedule, and queues newly
+discovered subdomains for an immediate targeted nuclei scan. The weekly full
+scan still runs on targets.latest.txt.
+
+A failed scan is logged and counted, and the daemon goes on with the next batch.
+
+A local status endpoint exposes the queue depth, the throughput and the failures:
+    curl -s http://localhost:9093/metrics
+"""
+
+import argparse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+
+import nuclei
+from dns_cache import DnsCache
+from template_index import load_index as load_template_index
+
+settings = nuclei.settings
+
+# Debug
+# from pdb import set_trace as st
+
+TARGETS_FILE = 'targets.latest.txt'
+FULL_SCAN = 'FULL_SCAN'
+PORT = getattr(settings, 'monitor_port', 9093)
+DISCOVERY_INTERVAL = getattr(settings, 'monitor_discovery_interval', 86400)  # in seconds
+FULL_SCAN_INTERVAL = getattr(settings, 'monitor_full_scan_interval', 604800)  # in seconds
+BATCH_SIZE = getattr(settings, 'monitor_batch_size', 100)
+
+
+class Monitor:
+    """
+    Warm state shared by the scheduler, the scan worker and the status endpoint.
+    """
+    def __init__(self, targets_file=TARGETS_FILE, compression=''):
+        self.targets_file = targets_file
+        self.compression = compression
+        self.dns_cache = DnsCache()
+        self.templates = []
+        self.known_targets = self.read_targets()
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.metrics = {
+            'discoveries': 0,
+            'new_targets': 0,
+            'targeted_scans': 0,
+            'full_scans': 0,
+            'scanned_targets': 0,
+            'scan_seconds': 0.0,
+            'failed_scans': 0,
+            'last_discovery': None,
+            'last_report': None,
+            'last_error': None,
+        }
+
+    def read_targets(self):
+        """
+        Returns the set of targets of the target file.
+        """
+        try:
+            with open(self.targets_file, 'r', encoding='utf-8') as f:
+                return set(line.strip() for line in f if line.strip())
+        except FileNotFoundError:
+            return set()
+
+    def refresh_tools(self):
+        """
+        Update the tools and reload the template index in memory, for the technology targeting of the scans.
+        """
+        nuclei.update_tools()
+        self.templates = load_template_index()
+
+    def discover(self):
+        """
+        Run the subdomain discovery and queue the new targets.
+        """
+        print('Running the subdomain discovery...')
+        subprocess.run(['bash', 'subdomains.sh'], stdout=subprocess.DEVNULL)
+        targets = self.read_targets()
+        new_targets = sorted(targets - self.known_targets)
+        self.known_targets = targets
+        # Warm the DNS cache for the new targets, ahead of the scan
+        for target in new_targets:
+            self.dns_cache.resolve(target.split(':')[0], 'A')
+        self.dns_cache.save()
+        for target in new_targets:
+            self.queue.put(target)
+        with self.lock:
+            self.metrics['discoveries'] += 1
+            self.metrics['new_targets'] += len(new_targets)
+            self.metrics['last_discovery'] = datetime.now().isoformat(timespec='seconds')
+        print(f'{len(new_targets)} new targets queued for scan')
+
+    def scan(self, targets):
+        """
+        Run the nuclei stages on a list of targets, with the warm DNS cache and template index.
+        """
+        start = time.time()
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as temp:
+            temp.write('\n'.join(targets))
+        try:
+            report = nuclei.run_scan(temp.name, self.compression, dns_cache=self.dns_cache,
+                                     templates=self.templates or None)
+        finally:
+            Path(temp.name).unlink(missing_ok=True)
+        with self.lock:
+            self.metrics['scanned_targets'] += len(targets)
+            self.metrics['scan_seconds'] += time.time() - start
+            if report:
+                self.metrics['last_report'] = str(report)
+
+    def run_job(self, metric, targets):
+        """
+        Scan some targets and count the scan under metric, or log and count the failure.
+        """
+        try:
+            self.scan(targets)
+        except Exception as e:
+            traceback.print_exc()
+            with self.lock:
+                self.metrics['failed_scans'] += 1
+                self.metrics['last_error'] = f'{datetime.now().isoformat(timespec="seconds")} {e!r}'
+            return
+        with self.lock:
+            self.metrics[metric] += 1
+
+    def worker(self):
+        """
+        Scan the queued targets by batches, and the full target list on FULL_SCAN.
+        """
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            full_scan = FULL_SCAN in batch
+            targets = [target for target in batch if target != FULL_SCAN]
+            try:
+                if targets:
+                    print(f'Targeted scan of {len(targets)} new targets')
+                    self.run_job('targeted_scans', targets)
+                if full_scan:
+                    print('Weekly full scan')
+                    self.run_job('full_scans', sorted(self.read_targets()))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def status(self):
+        """
+        Returns the status and metrics of the daemon.
+        """
+        with self.lock:
+            metrics = dict(self.metrics)
+        uptime = time.time() - self.started_at
+        metrics.update({
+            'uptime': int(uptime),
+            'queue_depth': self.queue.qsize(),
+            'known_targets': len(self.known_targets),
+            'templates': len(self.templates),
+            'targets_per_hour': round(metrics['scanned_targets'] * 3600 / metrics['scan_seconds'], 1)
+                if metrics['scan_seconds'] else 0,
+        })
+        return metrics
+
+
+def make_handler(monitor):
+    """
+    Returns the request handler class of the status endpoint.
+    """
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ['/', '/status', '/metrics']:
+                self.send_error(404)
+                return
+            body = json.dumps(monitor.status()).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep the daemon logs for the scans
+            pass
+
+    return StatusHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitoring daemon: discovery, targeted and weekly scans')
+    parser.add_argument('--targets', default=TARGETS_FILE, help='The consolidated target file')
+    parser.add_argument('--port', type=int, default=PORT, help='Port of the local status endpoint')
+    parser.add_argument('--full-scan-now', action='store_true', help='Start with a full scan')
+    parser.add_argument('--compression', choices=['', 'gz', 'xz'],
+        default=getattr(settings, 'report_compression', ''),
+        help='Compress the reports with gzip or xz')
+    args = parser.parse_args()
+
+    monitor = Monitor(args.targets, args.compression)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(monitor))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    threading.Thread(target=monitor.worker, daemon=True).start()
+    print(f'Status endpoint on http://127.0.0.1:{args.port}/metrics')
+
+    next_discovery = time.time()
+    next_full_scan = time.time() if args.full_scan_now else time.time() + FULL_SCAN_INTERVAL
+    try:
+        while True:
+            now = time.time()
+            if now >= next_discovery:
+                monitor.refresh_tools()
+                monitor.discover()
+                next_discovery = now + DISCOVERY_INTERVAL
+            if now >= next_full_scan:
+                monitor.queue.put(FULL_SCAN)
+                next_full_scan = now + FULL_SCAN_INTERVAL
+            time.sleep(max(1, min(next_discovery, next_full_scan) - time.time()))
+    except KeyboardInterrupt:
+        print('Stopping the monitor.')
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,30 +2,40 @@
 """
 A script to perform a scan using httpx and nuclei, with options to exclude
 certain templates and specify an input file containing targets.
+Findings are stored as nuclei JSONL records, along with a text view.
 """
 
 import argparse
+import json
 import subprocess
 from datetime import datetime
 from pathlib import Path
-import importlib.util
 import tempfile
 import re
-
-try:
-    spec = importlib.util.spec_from_file_location('settings', 'settings.py')
-    settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(settings)
-except FileNotFoundError:
-    # If settings.py doesn't exist, import settings.py.sample
-    print('Warning: settings.py not found. Falling back to settings.sample.py !')
-    spec = importlib.util.spec_from_file_location('settings', 'settings.sample.py')
-    settings = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(settings)
+import shutil
+import threading
+import time
+
+from config import settings
+from dns_cache import DnsCache
+from domain_index import load_index, select_hosts
+from findings import get_asset, read_findings, write_text_view
+from liveness import filter_live
+from nuclei_tuner import TCP_STATE_FILE, Tuner
+from prioritize import prioritize_targets, update_deferred
+from report_fingerprints import write_fingerprints
+from report_io import open_text, with_compression
+from report_writer import ReportWriter
+from template_index import group_hosts, load_index as load_template_index, parse_httpx
+from trends import update_trends
+from wildcard import attribute_finding, prune_targets, write_collapsed
 
 # Debug
 # from pdb import set_trace as st
 
+TECH_TARGETING = getattr(settings, 'nuclei_tech_targeting', False)
+LIVENESS_FILTER = getattr(settings, 'liveness_filter', True)
+
 def update_tools():
     """Update dnsx, httpx and nuclei tools"""
     print('Updating dnsx, httpx and nuclei')
@@ -35,8 +45,43 @@ def update_tools():
     subprocess.run(['nuclei', '-silent', '-ut'], stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
 
 
-def perform_scan(input_file, nuclei_no_tcp_tmp_output):
-    """Perform the scan using httpx and nuclei"""
+def get_rate_arguments(tuner, default):
+    """Returns the nuclei concurrency arguments, sized by the tuner if any"""
+    if tuner:
+        return tuner.get_arguments()
+    return default
+
+
+def run_nuclei(nuclei_process, tuner, on_finding=None):
+    """
+    Wait for nuclei, following its metrics to size the next run if tuned,
+    and passing each of its output lines to on_finding if streamed
+    """
+    watcher = None
+    if tuner:
+        watcher = threading.Thread(target=tuner.watch, args=(lambda: nuclei_process.poll() is None,), daemon=True)
+        watcher.start()
+    if on_finding:
+        for line in nuclei_process.stdout:
+            on_finding(line)
+    nuclei_process.communicate()
+    if watcher:
+        watcher.join()
+        tuner.adjust()
+
+
+def get_stdout(on_finding):
+    """Returns the stdout of a nuclei process, piped when its findings are streamed"""
+    return subprocess.PIPE if on_finding else None
+
+
+def perform_scan(input_file, nuclei_no_tcp_tmp_output, tuner=None, tech_targeting=TECH_TARGETING, on_finding=None,
+                 templates=None):
+    """
+    Perform the scan using httpx and nuclei, the findings going to nuclei_no_tcp_tmp_output if any,
+    and to on_finding as they are produced if any.
+    The technology targeting uses the given template index, or loads it.
+    """
     print(f'Launching httpx and nuclei to perform the scan...')
     try:
         with open(input_file, encoding='utf-8') as targets:
@@ -45,22 +90,66 @@ def perform_scan(input_file, nuclei_no_tcp_tmp_output):
                     if True not in [ target.strip().startswith(b) or '/'+b in target.strip() for b in settings.nuclei_target_blacklist ]:
                         temp.write(target)
                 temp.flush()
+        if tech_targeting:
+            perform_targeted_scan(temp.name, nuclei_no_tcp_tmp_output, tuner, on_finding, templates)
+            return
         with open(temp.name, 'r', encoding='utf-8') as temp_in:
             httpx_process = subprocess.Popen(
                 ['httpx', '-silent'],
                 stdin=temp_in,
                 stdout=subprocess.PIPE)
-            nuclei_process = subprocess.Popen(
-                ['nuclei', '-silent', '-et', ','.join(settings.nuclei_exclude_templates),
-                    '-exclude-type', 'tcp',
-                    '-o', nuclei_no_tcp_tmp_output, '-page-timeout', '3',
-                    '-timeout', '3', '-concurrency', '50',
-                    '-bulk-size', '50', '-rate-limit', '500'], stdin=httpx_process.stdout)
-            nuclei_process.communicate()
+            nuclei_process = subprocess.Popen(get_nuclei_command(nuclei_no_tcp_tmp_output, tuner),
+                stdin=httpx_process.stdout, stdout=get_stdout(on_finding), stderr=subprocess.DEVNULL if tuner else None,
+                text=True)
+            run_nuclei(nuclei_process, tuner, on_finding)
     except (subprocess.CalledProcessError, KeyboardInterrupt):
         print('Nuclei process interrupted. Continuing...')
 
 
+def get_nuclei_command(nuclei_no_tcp_tmp_output, tuner=None):
+    """Returns the nuclei command of the HTTP stage, writing to an output file if any"""
+    return ['nuclei', '-silent', '-jsonl', '-omit-raw', '-et', ','.join(settings.nuclei_exclude_templates),
+        '-exclude-type', 'tcp',
+        '-page-timeout', '3',
+        '-timeout', '3'] + get_rate_arguments(tuner, ['-concurrency', '50',
+        '-bulk-size', '50', '-rate-limit', '500']) + (['-o', nuclei_no_tcp_tmp_output] if nuclei_no_tcp_tmp_output else [])
+
+
+def run_templates(urls, templates, output, tuner=None, on_finding=None):
+    """Run nuclei with some templates on some URLs, appending the findings to the output file if any"""
+    part_output = f'{output}.part' if output else None
+    url_file, template_file = write_targets(urls), write_targets(templates)
+    try:
+        nuclei_process = subprocess.Popen(
+            get_nuclei_command(part_output, tuner) + ['-l', url_file, '-t', template_file],
+            stdout=get_stdout(on_finding), stderr=subprocess.DEVNULL if tuner else None, text=True)
+        run_nuclei(nuclei_process, tuner, on_finding)
+        if part_output and Path(part_output).exists():
+            with open(part_output, 'r', encoding='utf-8') as f, open(output, 'a', encoding='utf-8') as out:
+                shutil.copyfileobj(f, out)
+    finally:
+        for path in [part_output, url_file, template_file]:
+            if path:
+                Path(path).unlink(missing_ok=True)
+
+
+def perform_targeted_scan(input_file, nuclei_no_tcp_tmp_output, tuner=None, on_finding=None, templates=None):
+    """
+    Run nuclei once with the generic templates on every live host, then once per group of hosts
+    sharing the same detected technologies, with the templates of these technologies only
+    """
+    httpx_process = subprocess.run(['httpx', '-silent', '-json', '-tech-detect', '-l', input_file],
+        stdout=subprocess.PIPE, text=True)
+    hosts = parse_httpx(httpx_process.stdout.splitlines())
+    generic, groups = group_hosts(hosts, templates or load_template_index())
+    print(f'{len(hosts)} live hosts, {len(groups)} technology groups')
+
+    if hosts and generic:
+        run_templates(list(hosts), generic, nuclei_no_tcp_tmp_output, tuner, on_finding)
+    for templates, urls in groups:
+        run_templates(urls, templates, nuclei_no_tcp_tmp_output, tuner, on_finding)
+
+
 def is_valid_ipv4(ip):
     # Regular expression for validating an IPv4 address
     pattern = r'^((25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)(/([0-9]|[1-2][0-9]|3[0-2]))?$'
@@ -97,90 +186,183 @@ def generate_ips(input_file):
         return temp_file.name, ip_to_domains
     except (subprocess.CalledProcessError, KeyboardInterrupt):
         print('Nuclei process interrupted. Continuing...')
-        return None
+        return None, {}
 
 
-def perform_tcp_scan(ip_file, nuclei_tcp_tmp_output):
-    """Perform a TCP scan using nuclei"""
+def perform_tcp_scan(ip_file, nuclei_tcp_tmp_output, tuner=None, on_finding=None):
+    """Perform a TCP scan using nuclei, streaming the findings to on_finding if any"""
     print(f'Launching nuclei to perform the TCP scan...')
     try:
         nuclei_process = subprocess.Popen(
-            ['nuclei', '-silent', '-l', ip_file,
+            ['nuclei', '-silent', '-jsonl', '-omit-raw', '-l', ip_file,
                 '-et', ','.join(settings.nuclei_exclude_templates),
                 '-exclude-type', 'http,ssl,websocket,javascript,headless',
-                '-o', nuclei_tcp_tmp_output, '-page-timeout', '3',
-                '-timeout', '3', '-concurrency', '50',
-                '-bulk-size', '50', '-rate-limit', '500'])
-        nuclei_process.communicate()
+                '-page-timeout', '3',
+                '-timeout', '3'] + get_rate_arguments(tuner, ['-concurrency', '50',
+                '-bulk-size', '50', '-rate-limit', '500']) + (['-o', nuclei_tcp_tmp_output] if nuclei_tcp_tmp_output else []),
+            stdout=get_stdout(on_finding), stderr=subprocess.DEVNULL if tuner else None, text=True)
+        run_nuclei(nuclei_process, tuner, on_finding)
     except (subprocess.CalledProcessError, KeyboardInterrupt):
         print('Nuclei process interrupted. Continuing...')
 
 
-def add_metadata_tcp_scan(ip_to_domains, nuclei_tcp_tmp_output):
-    # Read the file and split it into lines
-    with open(nuclei_tcp_tmp_output, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
+def add_subdomains(record, ip_to_domains):
+    """Add the subdomains of its IP to a TCP finding"""
+    ip = get_asset(record)
+    if ip in ip_to_domains:
+        record['subdomains'] = ip_to_domains[ip]
+    return record
 
-    # Create a new list to store modified lines
-    new_lines = []
 
-    # Loop over each line
-    for line in lines:
-        # Remove newline character
-        line = line.strip()
+def add_metadata_tcp_scan(ip_to_domains, nuclei_tcp_tmp_output):
+    """Add the subdomains of their IP to the TCP findings"""
+    if not Path(nuclei_tcp_tmp_output).exists():
+        return
+    records = list(read_findings(nuclei_tcp_tmp_output))
 
-        # Check if line contains any IP from ip_to_domains keys
-        for ip in ip_to_domains.keys():
-            if f' {ip}:' in line:
-                # If it does, append the associated value from the dict to the line
-                line += ' subdomains:' + ','.join(ip_to_domains[ip])
+    with open(nuclei_tcp_tmp_output, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(add_subdomains(record, ip_to_domains)) + '\n')
 
-        # Add the (possibly modified) line to the new_lines list
-        new_lines.append(line)
 
-    # Write the new lines back to the file
-    with open(nuclei_tcp_tmp_output, 'w', encoding='utf-8') as file:
-        for line in new_lines:
-            file.write(line + '\n')  # Add newline character back in
-
-
-def generate_report(nuclei_no_tcp_tmp_output, nuclei_tcp_tmp_output, nuclei_output):
-    """Generate the final report"""
-    if Path(nuclei_no_tcp_tmp_output).exists() and Path(nuclei_tcp_tmp_output).exists():
-        with open(nuclei_no_tcp_tmp_output, 'r', encoding='utf-8') as f1, open(nuclei_tcp_tmp_output, 'r', encoding='utf-8') as f2, open(nuclei_output, 'w', encoding='utf-8') as out_file:
-            out_file.write(f1.read() + f2.read())
-        Path(nuclei_no_tcp_tmp_output).unlink()
-        Path(nuclei_tcp_tmp_output).unlink()
-        print(f'The nuclei report has been generated in the file {nuclei_output}')
-    elif Path(nuclei_no_tcp_tmp_output).exists():
-        Path(nuclei_no_tcp_tmp_output).rename(nuclei_output)
-        print(f'The nuclei report has been generated in the file {nuclei_output}')
-    elif Path(nuclei_tcp_tmp_output).exists():
-        Path(nuclei_tcp_tmp_output).rename(nuclei_output)
-        print(f'The nuclei report has been generated in the file {nuclei_output}')
-    else:
+def generate_report(nuclei_tmp_outputs, nuclei_output, text_output):
+    """
+    Generate the final JSONL report and its text view,
+    compressed if their names end with .gz or .xz
+    """
+    tmp_outputs = [Path(tmp_output) for tmp_output in nuclei_tmp_outputs if Path(tmp_output).exists()]
+    if not tmp_outputs:
         print('Nuclei process did not generate a report.')
+        return
+    with open_text(nuclei_output, 'w') as out_file:
+        for tmp_output in tmp_outputs:
+            with open(tmp_output, 'r', encoding='utf-8') as in_file:
+                shutil.copyfileobj(in_file, out_file)
+            tmp_output.unlink()
+    write_text_view(read_findings(nuclei_output), text_output)
+    finalize_report(nuclei_output, text_output)
 
 
-def filter_subdomains(input_file: str, output_file: str, top_domain: str):
+def finalize_report(nuclei_output, text_output):
+    """Index a complete report: fingerprints and trend rollups"""
+    print(f'The nuclei report has been generated in the files {nuclei_output} and {text_output}')
+    write_fingerprints(nuclei_output)
+    update_trends(nuclei_output)
+
+
+def filter_subdomains(input_file: str, output_file: str, top_domains: list):
     """
     Filter the input file to include only subdomains
-    of the top_domain and write them to the output file.
+    of the top_domains and write them to the output file.
     """
-    with open(input_file, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-
-    subdomains = []
-    for line in lines:
-        domain = line.strip()
-        if domain == top_domain or domain.endswith(f'.{top_domain}'):
-            subdomains.append(domain)
+    subdomains = select_hosts(load_index(input_file), top_domains)
 
     with open(output_file, 'w', encoding='utf-8') as file:
         file.write('\n'.join(subdomains))
 
 
-def main(input_file: str, top_domain: str):
+def write_targets(targets):
+    """Write a list of targets to a temporary file and return its name"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as temp_file:
+        temp_file.write('\n'.join(targets) + '\n')
+    return temp_file.name
+
+
+def run_scan(input_file: str, compression: str = '', time_budget: int = 0, prioritize: bool = True, adaptive: bool = False,
+             wildcard_pruning: bool = True, tech_targeting: bool = TECH_TARGETING, liveness_filter: bool = LIVENESS_FILTER,
+             dns_cache: DnsCache = None, templates: list = None):
+    """
+    Run the httpx, nuclei and TCP stages on the given input file, and store the output in a report file.
+    Hosts of wildcard DNS zones are collapsed into one representative, whose findings are attributed back to them.
+    With the liveness filter, the targets which do not resolve are skipped.
+    Targets are scanned from the most to the least urgent. With a time budget, in minutes,
+    no more batch is scheduled once it is exhausted, and the remaining targets are deferred to the next run.
+    When adaptive, the nuclei concurrency of each batch is sized from the metrics of the previous one.
+    With technology targeting, the generic templates run once on every host, and each group of hosts
+    only gets the specific templates of its technologies.
+    Findings are streamed into the report as they are produced, with a sidecar of running counts.
+    A long-running caller may share its DNS cache and template index, loaded otherwise.
+    Returns the path of the report, or None if no report was generated.
+    """
+    start = time.time()
+    timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    nuclei_output = with_compression(f'reports/report.nuclei.{timestamp}.jsonl', compression)
+    text_output = with_compression(f'reports/report.nuclei.{timestamp}.txt', compression)
+
+    with open(input_file, 'r', encoding='utf-8') as file:
+        targets = [line.strip() for line in file if line.strip()]
+    input_targets = list(targets)
+    collapsed = {}
+    skipped = 0
+    if wildcard_pruning or liveness_filter:
+        dns_cache = dns_cache or DnsCache()
+        if wildcard_pruning:
+            targets, collapsed = prune_targets(targets, dns_cache)
+            if collapsed:
+                print(f'{sum(len(hosts) for hosts in collapsed.values())} hosts of wildcard zones collapsed '
+                      f'into {len(collapsed)} representatives')
+        if liveness_filter:
+            targets, skipped = filter_live(targets, dns_cache)
+            print(f'{skipped} targets skipped, not resolving')
+        dns_cache.save()
+    if prioritize:
+        targets = prioritize_targets(targets)
+
+    def is_budget_exhausted():
+        return time_budget and time.time() - start >= time_budget * 60
+
+    # The HTTP batches and the TCP scan are sized separately
+    tuner = Tuner() if adaptive else None
+    tcp_tuner = Tuner(TCP_STATE_FILE) if adaptive else None
+
+    # Without time budget nor tuning, all the targets go through a single httpx and nuclei run
+    batch_size = getattr(settings, 'scan_batch_size', 200) if time_budget or adaptive else max(len(targets), 1)
+    scanned = []
+    deferred = []
+    writer = ReportWriter(nuclei_output, text_output, {'skipped': skipped, 'deferred': 0})
+    try:
+        def write_finding(line, enrich=None):
+            writer.write_line(line, lambda record: attribute_finding(enrich(record) if enrich else record, collapsed))
+
+        for i in range(0, len(targets), batch_size):
+            if is_budget_exhausted():
+                deferred = targets[i:]
+                break
+            batch = targets[i:i + batch_size]
+            perform_scan(write_targets(batch), None, tuner, tech_targeting, write_finding, templates)
+            scanned += batch
+
+        if scanned and not is_budget_exhausted():
+            ip_file, ip_dict = generate_ips(write_targets(scanned))
+
+            if ip_file:
+                perform_tcp_scan(ip_file, None, tcp_tuner,
+                                 lambda line: write_finding(line, lambda record: add_subdomains(record, ip_dict)))
+        elif scanned:
+            print('Time budget exhausted, skipping the TCP scan.')
+        # A partial run, its report missing the findings of the deferred targets
+        writer.extra['deferred'] = len(deferred)
+    except BaseException:
+        # Not a report of a finished run
+        writer.abort()
+        raise
+    has_findings = writer.close()
+
+    if has_findings:
+        finalize_report(nuclei_output, text_output)
+    else:
+        print('Nuclei process did not generate a report.')
+    if collapsed and Path(nuclei_output).exists():
+        write_collapsed(nuclei_output, collapsed)
+    deferred_file = update_deferred(input_targets, deferred)
+    if deferred:
+        print(f'Time budget exhausted, {len(deferred)} targets deferred to the next run: {deferred_file}')
+    return nuclei_output if Path(nuclei_output).exists() else None
+
+
+def main(input_file: str, top_domains: list, compression: str = '', time_budget: int = 0, prioritize: bool = True,
+         adaptive: bool = False, wildcard_pruning: bool = True, tech_targeting: bool = TECH_TARGETING,
+         liveness_filter: bool = LIVENESS_FILTER):
     """
     Run httpx and nuclei with the given input file, and store the output in a report file.
     """
@@ -189,27 +371,17 @@ def main(input_file: str, top_domain: str):
         return
 
     timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-    nuclei_output = f'reports/report.nuclei.{timestamp}.txt'
-    tmp_nuclei_no_tcp_output = '/tmp/report.nuclei.no.tcp.txt'
-    tmp_nuclei_tcp_output = '/tmp/report.nuclei.tcp.txt'
     tmp_subdomains_file = f'/tmp/subdomains.{timestamp}.txt'
 
     update_tools()
 
-    if top_domain:
-        print(f'Run nuclei on a specific domain: {top_domain}')
-        filter_subdomains(input_file, tmp_subdomains_file, top_domain)
+    if top_domains:
+        print(f'Run nuclei on specific domains: {", ".join(top_domains)}')
+        filter_subdomains(input_file, tmp_subdomains_file, top_domains)
         input_file = tmp_subdomains_file
 
-    perform_scan(input_file, tmp_nuclei_no_tcp_output)
-
-    ip_file, ip_dict = generate_ips(input_file)
-
-    if ip_file:
-        perform_tcp_scan(ip_file, tmp_nuclei_tcp_output)
-        add_metadata_tcp_scan(ip_dict, tmp_nuclei_tcp_output)
-
-    generate_report(tmp_nuclei_no_tcp_output, tmp_nuclei_tcp_output, nuclei_output)
+    run_scan(input_file, compression, time_budget, prioritize, adaptive, wildcard_pruning, tech_targeting,
+             liveness_filter)
 
 
 if __name__ == "__main__":
@@ -217,8 +389,27 @@ if __name__ == "__main__":
     parser.add_argument('input_file',
         nargs='?', default='targets.latest.txt',
         help='The input file containing targets')
-    parser.add_argument('--domain',  default='',
-        help='The domain to scan')
+    parser.add_argument('--domain', action='append', default=[],
+        help='The domain to scan, can be repeated or comma separated')
+    parser.add_argument('--compression', choices=['', 'gz', 'xz'],
+        default=getattr(settings, 'report_compression', ''),
+        help='Compress the report with gzip or xz')
+    parser.add_argument('--time-budget', type=int, default=0,
+        help='Stop scheduling scans after this number of minutes, and defer the remaining targets')
+    parser.add_argument('--no-prioritize', action='store_true',
+        help='Scan the targets in file order')
+    parser.add_argument('--adaptive', action='store_true',
+        default=getattr(settings, 'nuclei_adaptive', False),
+        help='Size the nuclei concurrency and rate limit of each batch from the metrics of the previous one')
+    parser.add_argument('--no-wildcard-pruning', action='store_true',
+        default=not getattr(settings, 'wildcard_pruning', True),
+        help='Scan every host of the wildcard DNS zones')
+    parser.add_argument('--no-liveness-filter', action='store_true', default=not LIVENESS_FILTER,
+        help='Pass the targets which do not resolve to httpx too')
+    parser.add_argument('--tech-targeting', action='store_true', default=TECH_TARGETING,
+        help='Run nuclei once per group of hosts with the same httpx technologies, with the matching templates only')
     args = parser.parse_args()
 
-    main(args.input_file, args.domain)
+    top_domains = [domain for value in args.domain for domain in value.split(',') if domain]
+    main(args.input_file, top_domains, args.compression, args.time_budget, not args.no_prioritize, args.adaptive,
+         not args.no_wildcard_pruning, args.tech_targeting, not args.no_liveness_filter)
@@ -2,17 +2,19 @@
 
 TARGETS_FILE="targets.latest.txt"
 SOCKS_PROXY="socks5://127.0.0.1:9050"
-DOMAIN_FILTER=""
+DOMAIN_FILTER=()
 INFO_ONLY=false
 XML=false
 NO_COLOR=false
+# Adaptive concurrency, see nuclei_tuner.py
+TUNER=(python3 nuclei_tuner.py --state nuclei_tuner.sh.json --initial 10,10,100 --port 9092)
 
 # Function to parse arguments
 parse_arguments() {
     while [[ $# -gt 0 ]]; do
         case $1 in
             --domain)
-                DOMAIN_FILTER="$2"
+                DOMAIN_FILTER+=(--domain "$2")
                 shift 2
                 ;;
             --info-only)
@@ -71,10 +73,10 @@ run_severity_scans() {
         exit 1
     fi
 
-    # If a domain filter is specified, filter targets
-    if [ -n "$DOMAIN_FILTER" ]; then
-        echo "[*] Filtering targets for domain: $DOMAIN_FILTER"
-        grep "\.${DOMAIN_FILTER}$" "$TARGETS_FILE" > filtered_targets.txt
+    # If domain filters are specified, filter targets through the reversed-label index
+    if [ ${#DOMAIN_FILTER[@]} -gt 0 ]; then
+        echo "[*] Filtering targets for domains: ${DOMAIN_FILTER[*]}"
+        python3 domain_index.py -f "$TARGETS_FILE" "${DOMAIN_FILTER[@]}" > filtered_targets.txt
         FINAL_TARGETS="filtered_targets.txt"
     else
         FINAL_TARGETS="$TARGETS_FILE"
@@ -100,7 +102,10 @@ run_severity_scans() {
                 continue
             fi
             echo "    [+] Found $template_count templates for severity: $severity and protocol: $proto"
-            CMD=(nuclei -l "$FINAL_TARGETS" -type "$proto" -severity "$severity" -page-timeout 3 -timeout 3 -concurrency 10 -bulk-size 10 -rate-limit 100 -silent -stats -mp 9092)
+            CMD=(nuclei -l "$FINAL_TARGETS" -type "$proto" -severity "$severity" -page-timeout 3 -timeout 3 -silent)
+            # -concurrency, -bulk-size, -rate-limit sized from the metrics of the previous bucket, and -stats -mp 9092
+            read -r -a TUNED_ARGS <<< "$("${TUNER[@]}" params)"
+            CMD+=("${TUNED_ARGS[@]}")
 
             if [ "$USE_PROXY" = true ]; then
                 CMD+=(-p "$SOCKS_PROXY")
@@ -114,7 +119,10 @@ run_severity_scans() {
                 CMD+=(-p "$SOCKS_PROXY")
             fi
 
-            "${CMD[@]}" 2>/dev/null
+            "${CMD[@]}" 2>/dev/null &
+            NUCLEI_PID=$!
+            "${TUNER[@]}" watch --pid "$NUCLEI_PID" >&2
+            wait "$NUCLEI_PID"
         done
     done
 }
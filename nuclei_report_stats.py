@@ -2,13 +2,15 @@
 """
 Nuclei Report Stats
 """
-import sys
+import argparse
 import re
-from pathlib import Path
 from collections import defaultdict
-from tabulate import tabulate
 
-from settings import products, false_positive, nuclei_target_blacklist
+from banners import fingerprint, get_service
+from config import settings
+from false_positives import load_rules
+from findings import format_line, get_asset, get_endpoint, get_label, get_metadata, get_severity, read_findings
+from output import add_arguments, sorted_rows, write_rows, write_text
 
 # Debug
 # from pdb import set_trace as st
@@ -20,59 +22,11 @@ def classify_subdomains(subdomain):
     :param subdomain: a string representing the subdomain to classify
     :return: the product name if a match is found, otherwise None
     """
-    for product, pattern in products.items():
+    for product, pattern in settings.products.items():
         if re.match(pattern, subdomain):
             return product
     return None
 
-def detect_os_from_banner(line):
-    """
-    Returns an OS guess from openssh banner
-    """
-    os_guess = ''
-    match = re.search(r'(OpenSSH.*) subdomains:', line)
-    if not match:
-        os_guess = f'Unknown-({line.replace(" ", "_")})'
-    else:
-        # -12 to remove " subdomains:"
-        version = match.group(0)[:-12]
-
-        if re.search(r'(Debian-[0-9]+)', version):
-            os_guess = re.search(r'(Debian-[0-9]+)', version).group(0)
-        elif re.search('OpenSSH_7.2p2 Ubuntu-4', version):
-            os_guess = 'Ubuntu-16.04'
-        elif re.search('OpenSSH_7.6p1 Ubuntu-4', version):
-            os_guess = 'Ubuntu-18.04'
-        elif re.search('OpenSSH_8.2p1 Ubuntu-4', version):
-            os_guess = 'Ubuntu-20.04'
-        elif re.search('OpenSSH_8.9p1 Ubuntu-3', version):
-            os_guess = 'Ubuntu-21.04'
-        elif re.search('Ubuntu', version):
-            os_guess = 'Ubuntu-x.x'
-        else:
-            os_guess = f'Unknown-({version.replace(" ", "_")})'
-
-    return os_guess
-
-def process_nuclei_report_line(line):
-    """
-    Process a line from the nuclei report file and extract relevant information.
-
-    :param line: a string representing a line from the nuclei report file
-    :return: a tuple containing:
-             - a boolean indicating if the line was successfully processed
-             - the category, cat2, severity, and subproduct extracted from the line
-    """
-    # Match and extract required information from each line
-    match = re.search(r'\[([^\]]+)\] \[([^\]]+)\] \[([^\]]+)\] (.*)', line)
-    if not match:
-        return False, None, None, None, None
-    category, cat2, severity, subproduct = match.groups()
-    if subproduct.startswith('http:') or subproduct.startswith('https:'):
-        subproduct = subproduct.split('/')[2]
-    subproduct = subproduct.split(':')[0].split(' ')[0]
-    return True, category, cat2, severity, subproduct
-
 def get_nuclei_line_severity(line):
     """
     Get the severity of a line from the nuclei report file.
@@ -85,19 +39,17 @@ def get_nuclei_line_severity(line):
     _, _, severity, _ = match.groups()
     return severity
 
-def wp_extractor(product_dict, line, category):
+def wp_extractor(product_dict, record, category):
+    extracted_results = record.get('extracted-results', [])
     if category == 'wordpress-detect':
-        match = re.search(r".+ (.+)$", line)
-        if match:
-            product_dict['url'] = match.group(1)
+        product_dict['url'] = get_endpoint(record)
     elif category.startswith('wordpress-detect:'):
-        match = re.search(r".+ (.+) \[(.+)\]$", line)
-        if match:
-            product_dict['version'] = match.group(2)
+        if extracted_results:
+            product_dict['version'] = extracted_results[0]
             if product_dict['url'] == '-':
-                product_dict['url'] = match.group(1)
+                product_dict['url'] = get_endpoint(record)
     elif category == 'metatag-cms':
-        match = re.search(r'.* \[.*WordPress ([0-9\.]+).*\]', line)
+        match = re.search(r'WordPress ([0-9\.]+)', ' '.join(extracted_results))
         if match:
             product_dict['version'] = match.group(1)
 
@@ -106,9 +58,12 @@ def main():
     Main function to read the nuclei report file, extract statistics and
     display the results.
     """
-    report_file = 'report.nuclei.latest.txt'
-    if len(sys.argv) == 2:
-        report_file = sys.argv[1]
+    parser = argparse.ArgumentParser(description='Display statistics of a nuclei report')
+    parser.add_argument('report_file', nargs='?', default='report.nuclei.latest.txt',
+        help='The nuclei report, JSONL or text, compressed or not')
+    add_arguments(parser)
+    args = parser.parse_args()
+    report_file = args.report_file
 
     # Initialize the dictionaries for storing statistics
     stats = defaultdict(lambda: defaultdict(int))
@@ -118,86 +73,80 @@ def main():
     db_list = defaultdict(lambda: set())
     remote_list = defaultdict(lambda: set())
 
-    report_path = Path(report_file)
-    # Read the report file
-    with report_path.open('r', encoding='utf-8') as file:
-        for line in file:
-            if line in false_positive:
-                continue
-            # Match and extract required information from each line
-            is_valid, category, protocol, severity, subproduct = process_nuclei_report_line(line)
-            if not is_valid:
-                continue
-            if True in [ subproduct.startswith(b) or '/'+b in subproduct for b in nuclei_target_blacklist ]:
-                continue
-            # Update global statistics
-            stats[severity][category] += 1
-            # Extract the product name and update product statistics
-            product = classify_subdomains(subproduct)
-            if protocol == 'tcp':
-                product = classify_subdomains(line.split()[-1])
-            product_stats[product][severity][category] += 1
-            if severity not in ['info'] and protocol != 'ssl':
-                product_lines[product].add(line)
-            # Ignore TCP when not IP address
-            if protocol == 'tcp' and not re.search(r'^[0-9\.]*$',subproduct):
-                continue
-            # Create a list of Wordpress
-            if category.startswith('wordpress-detect') or category == 'metatag-cms':
-                wp_extractor(wp_list[subproduct], line, category)
-            # Create a list of DB
-            if category in ['mysql-detect', 'pgsql-detect', 'redis-detect', 'mongodb-detect', 'cql-detect', 'cql-detect',
+    # Read the report records, JSONL or text, compressed or not, without the false positives
+    for record in load_rules().filter(read_findings(report_file)):
+        line = format_line(record)
+        category = get_label(record)
+        protocol = record['type']
+        severity = get_severity(record)
+        subproduct = get_asset(record)
+        subdomains = record.get('subdomains', [])
+        # The first subdomain of the IP, or the endpoint
+        domain = subdomains[0] if subdomains else get_endpoint(record)
+        if True in [ subproduct.startswith(b) or '/'+b in subproduct for b in settings.nuclei_target_blacklist ]:
+            continue
+        # Update global statistics
+        stats[severity][category] += 1
+        # Extract the product name and update product statistics
+        product = classify_subdomains(subproduct)
+        if protocol == 'tcp':
+            product = classify_subdomains(','.join(subdomains) or get_metadata(record))
+        product_stats[product][severity][category] += 1
+        if severity not in ['info'] and protocol != 'ssl':
+            product_lines[product].add(line)
+        # Ignore TCP when not IP address
+        if protocol == 'tcp' and not re.search(r'^[0-9\.]*$',subproduct):
+            continue
+        # Create a list of Wordpress
+        if category.startswith('wordpress-detect') or category == 'metatag-cms':
+            wp_extractor(wp_list[subproduct], record, category)
+        # Create a list of DB
+        if category in ['mysql-detect', 'pgsql-detect', 'redis-detect', 'mongodb-detect', 'cql-detect', 'cql-detect',
 'proftpd-server-detect', 'rabbitmq-detect', 's3-detect', 'smb-detect', 'samba-detect', 'microsoft-ftp-service', 'mikrotik-ftp-server-detect', 'xlight-ftp-service-detect']:
-                db_list[category].add(f'{subproduct} {line.split()[-1]}')
-            # Add panel in the list of DB
-            if category.endswith('-panel') or category.endswith('-manager'):
-                db_list[category].add(f'{subproduct} {line.split()[3]}')
-            # Create a list of Remote conn
-            if category in ['rdp-detect', 'openssh-detect', 'sshd-dropbear-detect', 'telnet-detect']:
-                remote_list[category].add(f'{subproduct} {line.split()[-1]} {detect_os_from_banner(line)}')
+            result = fingerprint(' '.join(record.get('extracted-results', [])))
+            db_list[category].add((subproduct, domain, get_service(result), result.os))
+        # Add panel in the list of DB
+        if category.endswith('-panel') or category.endswith('-manager'):
+            db_list[category].add((subproduct, get_endpoint(record), '-', ''))
+        # Create a list of Remote conn
+        if category in ['rdp-detect', 'openssh-detect', 'sshd-dropbear-detect', 'telnet-detect']:
+            result = fingerprint(' '.join(record.get('extracted-results', [])))
+            remote_list[category].add((subproduct, domain, get_service(result), result.os))
 
 
     # Display global statistics
-    print("Global statistics:")
+    write_text("Global statistics:", args.format)
     for severity in ['critical', 'high', 'medium', 'low', 'info']:
-        print(f"{severity.capitalize()} : {sum(stats[severity].values())}")
+        write_text(f"{severity.capitalize()} : {sum(stats[severity].values())}", args.format)
 
     # Display product-wise statistics
-    print("\nStatistics per product:")
+    write_text("\nStatistics per product:", args.format)
     for product, product_stat in product_stats.items():
-        print(f"\n## Product: {product}")
+        write_text(f"\n## Product: {product}", args.format)
         for severity in ['critical', 'high', 'medium', 'low', 'info']:
-            print(f"  {severity.capitalize()} : {sum(product_stat[severity].values())}")
+            write_text(f"  {severity.capitalize()} : {sum(product_stat[severity].values())}", args.format)
             for line in product_lines[product]:
                 if get_nuclei_line_severity(line) == severity:
-                    print(f'  {line}')
+                    write_text(f'  {line}', args.format)
 
     # Display a list of WordPress
-    print("\nList of Wordpress:")
-    table_data = []
+    write_text("\nList of Wordpress:", args.format)
 
-    for wp_name in wp_list:
-        product = classify_subdomains(wp_name)
-        row = [wp_name, wp_list[wp_name]['version'], wp_list[wp_name]['url'], product]
-        table_data.append(row)
+    def wp_rows():
+        for wp_name in wp_list:
+            product = classify_subdomains(wp_name)
+            yield [wp_name, wp_list[wp_name]['version'], wp_list[wp_name]['url'], product]
 
-    sorted_table_data = sorted(table_data, key=lambda row: (row[3], row[0]))
-
-    print(tabulate(sorted_table_data, headers=["WordPress Site", "Version", "URL", "Product"], tablefmt="grid"))
+    write_rows(sorted_rows(wp_rows(), key=lambda row: (row[3], row[0])),
+               ["WordPress Site", "Version", "URL", "Product"], args.format, args.limit, args.page)
 
     # Display a list of dbs
-    print("\nList of dbs:")
+    write_text("\nList of dbs:", args.format)
 
-    for db_engine in db_list:
-        print(f'## List of {db_engine}')
-        table_data = []
+    def db_rows(db_engine):
         unique_ips = set()
 
-        for db_name in db_list[db_engine]:
-            ipv4, domain = db_name.split(' ')
-            if 'subdomains:' in domain:
-                domain = domain.split(':')[1].split(',')[0]
-
+        for ipv4, domain, service, os in db_list[db_engine]:
             # If the current IP is not unique, skip this entry
             if ipv4 in unique_ips and db_engine != 's3-detect':
                 continue
@@ -210,34 +159,31 @@ def main():
 
             # Add a row to the table data
             if db_engine == 's3-detect' or db_engine.endswith('-panel') or db_engine.endswith('-manager'):
-                row = [domain, product]
+                yield [domain, product]
             else:
-                row = [ipv4, domain, product]
-            table_data.append(row)
+                yield [ipv4, domain, product, service, os]
+
+    for db_engine in db_list:
+        write_text(f'## List of {db_engine}', args.format)
 
         if db_engine == 's3-detect' or db_engine.endswith('-panel') or db_engine.endswith('-manager'):
             # Sort the table data first by the product name and then by IP
-            sorted_table_data = sorted(table_data, key=lambda row: (row[1], row[0]))
+            rows = sorted_rows(db_rows(db_engine), key=lambda row: (row[1], row[0]))
             headers = ["URL", "Product"]
         else:
             # Sort the table data first by the product name and then by IP
-            sorted_table_data = sorted(table_data, key=lambda row: (row[2], row[0]))
-            headers = ["IP", "Domain", "Product"]
+            rows = sorted_rows(db_rows(db_engine), key=lambda row: (row[2], row[0]))
+            headers = ["IP", "Domain", "Product", "Service", "OS"]
 
-        print(tabulate(sorted_table_data, headers=headers, tablefmt="grid"))
+        write_rows(rows, headers, args.format, args.limit, args.page)
 
     # Display a list of remote connections
-    print("\nList of remote conn:")
-    for conn_engine in remote_list:
-        print(f'## List of {conn_engine}')
-        table_data = []
-        unique_ips = set()
+    write_text("\nList of remote conn:", args.format)
 
-        for conn in remote_list[conn_engine]:
-            ipv4, domain, os = conn.split(' ')
-            if 'subdomains:' in domain:
-                domain = domain.split(':')[1].split(',')[0]
+    def remote_rows(conn_engine):
+        unique_ips = set()
 
+        for ipv4, domain, service, os in remote_list[conn_engine]:
             # If the current IP is not unique, skip this entry
             if ipv4 in unique_ips:
                 continue
@@ -248,15 +194,17 @@ def main():
             product = classify_subdomains(domain)
 
             # Add a row to the table data
-            row = [ipv4, domain, product, os]
-            table_data.append(row)
+            yield [ipv4, domain, product, service, os]
+
+    for conn_engine in remote_list:
+        write_text(f'## List of {conn_engine}', args.format)
 
         # Sort the table data first by the product name and then by IP
-        sorted_table_data = sorted(table_data, key=lambda row: (row[2], row[0]))
+        rows = sorted_rows(remote_rows(conn_engine), key=lambda row: (row[2], row[0]))
 
-        headers = ["IP", "Domain", "Product", "OS"]
+        headers = ["IP", "Domain", "Product", "Service", "OS"]
 
-        print(tabulate(sorted_table_data, headers=headers, tablefmt="grid"))
+        write_rows(rows, headers, args.format, args.limit, args.page)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+"""
+Adaptive concurrency and rate-limit controller for nuclei runs.
+
+While nuclei runs with "-stats -mp <port>", its metrics endpoint is polled to
+follow the requests and errors (timeouts included). Once the shard or bucket
+is done, the parameters of the next one are sized with an AIMD policy:
+additive increase while the error rate stays low, multiplicative decrease
+otherwise, within the bounds of settings.nuclei_tuner_bounds.
+
+Each stage is sized on its own, e.g. the HTTP batches and the TCP scan of
+nuclei.py, their loads being unrelated: a stage keeps its own state file.
+The parameters are kept in a state file, so that shell loops can use it:
+    CMD+=($(python3 nuclei_tuner.py params))
+    nuclei ... -stats -mp 9092 & python3 nuclei_tuner.py watch --pid $!
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import time
+
+from config import settings
+
+# Debug
+# from pdb import set_trace as st
+
+STATE_FILE = 'nuclei_tuner.json'
+TCP_STATE_FILE = 'nuclei_tuner.tcp.json'
+METRICS_PORT = 9092
+POLL_INTERVAL = 5  # in seconds
+DEFAULT_PARAMETERS = {'concurrency': 50, 'bulk_size': 50, 'rate_limit': 500}
+BOUNDS = getattr(settings, 'nuclei_tuner_bounds', {
+    'concurrency': (10, 100),
+    'bulk_size': (10, 100),
+    'rate_limit': (100, 1500),
+})
+INCREASE = getattr(settings, 'nuclei_tuner_increase', {'concurrency': 5, 'bulk_size': 5, 'rate_limit': 50})
+DECREASE_FACTOR = getattr(settings, 'nuclei_tuner_decrease_factor', 0.5)
+MAX_ERROR_RATE = getattr(settings, 'nuclei_tuner_max_error_rate', 0.05)
+
+
+def read_metrics(port=METRICS_PORT):
+    """
+    Reads the nuclei metrics endpoint.
+
+    :param port: The nuclei metrics port (-mp)
+    :return: A dict with the requests, errors and rps counters, or None if unreachable or malformed
+    """
+    # Only the watch command needs it, keep it out of the startup of nuclei.py
+    import urllib.request
+
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=2) as response:
+            metrics = json.loads(response.read())
+        # nuclei exposes its counters as strings
+        return {key: int(float(metrics.get(key) or 0)) for key in ['requests', 'errors', 'rps']}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class Tuner:
+    """
+    AIMD controller of the nuclei -concurrency, -bulk-size and -rate-limit parameters.
+    """
+    def __init__(self, state_file=STATE_FILE, initial=None, port=METRICS_PORT):
+        self.state_file = state_file
+        self.port = port
+        self.parameters = dict(initial or DEFAULT_PARAMETERS)
+        self.samples = []
+        self.load()
+
+    def load(self):
+        """
+        Load the parameters sized by a previous run.
+        """
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.parameters.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        """
+        Atomically store the parameters for the next run.
+        """
+        tmp_file = f'{self.state_file}.{os.getpid()}'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.parameters, f)
+        os.replace(tmp_file, self.state_file)
+
+    def get_arguments(self):
+        """
+        Returns the nuclei arguments of the current parameters, metrics endpoint included.
+        """
+        return ['-concurrency', str(self.parameters['concurrency']),
+                '-bulk-size', str(self.parameters['bulk_size']),
+                '-rate-limit', str(self.parameters['rate_limit']),
+                '-stats', '-mp', str(self.port)]
+
+    def watch(self, is_running):
+        """
+        Poll the metrics endpoint until the scan is over.
+
+        :param is_running: A function returning False once the scan is over
+        """
+        self.samples = []
+        while is_running():
+            metrics = read_metrics(self.port)
+            if metrics:
+                self.samples.append(metrics)
+            time.sleep(POLL_INTERVAL)
+
+    def adjust(self):
+        """
+        Size the parameters of the next shard from the metrics of the last one.
+
+        :return: The new parameters
+        """
+        if not self.samples:
+            self.log('no metrics collected, keeping the parameters')
+            return self.parameters
+        last = self.samples[-1]
+        error_rate = last['errors'] / last['requests'] if last['requests'] else 0
+        max_rps = max(sample['rps'] for sample in self.samples)
+
+        if error_rate > MAX_ERROR_RATE:
+            decision = 'decrease'
+            for key, (low, _) in BOUNDS.items():
+                self.parameters[key] = max(low, int(self.parameters[key] * DECREASE_FACTOR))
+        else:
+            decision = 'increase'
+            for key, (_, high) in BOUNDS.items():
+                self.parameters[key] = min(high, self.parameters[key] + INCREASE[key])
+
+        self.log(f'{decision}: requests={last["requests"]} errors={last["errors"]} '
+                 f'error_rate={error_rate:.3f} max_rps={max_rps} -> {self.parameters}')
+        self.save()
+        return self.parameters
+
+    @staticmethod
+    def log(message):
+        """
+        Log a decision of the controller.
+        """
+        print(f'[{datetime.now().isoformat(timespec="seconds")}] nuclei_tuner: {message}')
+
+
+def is_pid_running(pid):
+    """
+    Returns True if the process is still running.
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Adaptive nuclei concurrency and rate-limit controller')
+    parser.add_argument('command', choices=['params', 'watch'],
+        help='params: print the nuclei arguments, watch: follow a nuclei process and size the next run')
+    parser.add_argument('--state', default=STATE_FILE, help='The state file')
+    parser.add_argument('--initial', help='Initial "concurrency,bulk_size,rate_limit", e.g. "10,10,100"')
+    parser.add_argument('--port', type=int, default=METRICS_PORT, help='The nuclei metrics port')
+    parser.add_argument('--pid', type=int, help='The nuclei process to watch')
+    args = parser.parse_args()
+
+    initial = None
+    if args.initial:
+        initial = dict(zip(['concurrency', 'bulk_size', 'rate_limit'], map(int, args.initial.split(','))))
+    tuner = Tuner(args.state, initial, args.port)
+
+    if args.command == 'params':
+        print(' '.join(tuner.get_arguments()))
+    elif args.pid:
+        tuner.watch(lambda: is_pid_running(args.pid))
+        tuner.adjust()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Streaming output layer of the table-like outputs.
+
+Rows are rendered as they come, so that large outputs can be piped into other
+tools immediately:
+- table: fixed-width columns, sized from the first rows
+- csv, jsonl: one line per row
+- grid: the tabulate grid, which needs every row before the first line
+
+Sorting goes through sorted_rows(), an external merge sort with a bounded
+number of rows in memory, and --limit/--page only render a page of rows.
+"""
+
+import csv
+from contextlib import ExitStack
+import heapq
+from itertools import islice
+import json
+import sys
+import tempfile
+
+# Debug
+# from pdb import set_trace as st
+
+FORMATS = ['table', 'grid', 'csv', 'jsonl']
+CHUNK_SIZE = 50000  # rows sorted in memory
+WIDTH_SAMPLE = 200  # rows used to size the table columns
+
+
+def add_arguments(parser, default='table'):
+    """
+    Adds the --format, --limit and --page options to an argument parser.
+    """
+    parser.add_argument('--format', choices=FORMATS, default=default,
+        help=f'Output format, default is {default}')
+    parser.add_argument('--limit', type=int, default=0, help='Number of rows per page, all rows by default')
+    parser.add_argument('--page', type=int, default=1, help='Page to display, with --limit')
+
+
+def sorted_rows(rows, key=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields the rows sorted by key, keeping at most chunk_size rows in memory.
+    Sorted chunks are spilled to temporary files, then merged.
+    Rows must be JSON serializable, spilled rows come back as lists.
+    """
+    chunk = []
+    with ExitStack() as stack:
+        spills = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                spill = stack.enter_context(tempfile.TemporaryFile(mode='w+', encoding='utf-8'))
+                spill.writelines(json.dumps(item) + '\n' for item in sorted(chunk, key=key))
+                spill.seek(0)
+                spills.append(json.loads(line) for line in spill)
+                chunk = []
+        chunk.sort(key=key)
+        if not spills:
+            yield from chunk
+            return
+        # Same types as the spilled rows, for the comparisons of the merge
+        yield from heapq.merge(*spills, json.loads(json.dumps(chunk)), key=key)
+
+
+def paginate(rows, limit=0, page=1):
+    """
+    Returns an iterator on the rows of a page, or on all rows without limit.
+    """
+    if not limit:
+        return iter(rows)
+    start = (max(page, 1) - 1) * limit
+    return islice(rows, start, start + limit)
+
+
+def render_table(rows, headers, out):
+    """
+    Renders fixed-width columns, sized from the first rows. Longer cells are not truncated.
+    """
+    rows = iter(rows)
+    sample = [[str(cell) for cell in row] for row in islice(rows, WIDTH_SAMPLE)]
+    widths = [max([len(header)] + [len(row[i]) for row in sample]) for i, header in enumerate(headers)]
+
+    def write(cells):
+        out.write('  '.join(cell.ljust(width) for cell, width in zip(cells, widths)).rstrip() + '\n')
+
+    write(headers)
+    write(['-' * width for width in widths])
+    for row in sample:
+        write(row)
+    for row in rows:
+        write([str(cell) for cell in row])
+
+
+def render_grid(rows, headers, out):
+    """
+    Renders the tabulate grid.
+    """
+    from tabulate import tabulate
+
+    out.write(tabulate(list(rows), headers=headers, tablefmt='grid') + '\n')
+
+
+def render_csv(rows, headers, out):
+    writer = csv.writer(out)
+    writer.writerow(headers)
+    writer.writerows(rows)
+
+
+def render_jsonl(rows, headers, out):
+    for row in rows:
+        out.write(json.dumps(dict(zip(headers, row)), ensure_ascii=False) + '\n')
+
+
+RENDERERS = {
+    'table': render_table,
+    'grid': render_grid,
+    'csv': render_csv,
+    'jsonl': render_jsonl,
+}
+
+
+def write_rows(rows, headers, fmt='table', limit=0, page=1, out=None):
+    """
+    Renders a page of rows in the given format.
+
+    :param rows: An iterable of rows
+    :param headers: The column names, also the keys of the JSONL objects
+    :param fmt: One of FORMATS
+    :param limit: Number of rows per page, 0 for all rows
+    :param page: The page to render, starting at 1
+    :param out: The output stream, stdout by default
+    :return: The number of rendered rows
+    """
+    count = 0
+
+    def counted(page_rows):
+        nonlocal count
+        for row in page_rows:
+            count += 1
+            yield row
+
+    RENDERERS[fmt](counted(paginate(rows, limit, page)), headers, out or sys.stdout)
+    return count
+
+
+def write_text(text, fmt='table'):
+    """
+    Writes a line of text around the rows, e.g. a heading, on stderr for the
+    machine-readable formats, so that stdout only holds rows.
+    """
+    print(text, file=sys.stderr if fmt in ['csv', 'jsonl'] else sys.stdout)
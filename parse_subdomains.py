@@ -6,15 +6,16 @@ It then prints the information in either a table, CSV format, or a visual graph.
 """
 
 import argparse
-import sys
-import csv
-from tabulate import tabulate
-from ipwhois import IPWhois
-from graphviz import Graph
-import dns.resolver
+from collections import defaultdict
+
+from dns_cache import DnsCache
+from output import add_arguments, sorted_rows, write_rows
 
 # from pdb import set_trace as st
 
+# Above this number of subdomains, a graph node only displays a count
+GRAPH_CLUSTER_LIMIT = 20
+
 def get_aws_zone(ptr):
     """
     Get the AWS zone from the PTR value.
@@ -30,105 +31,206 @@ def get_aws_zone(ptr):
     return ptr.split('.')[-5]
 
 
-def resolve_ip(domain):
+def lookup_rdap(ipv4, cache):
+    """
+    Get the RDAP ASN description of an IP, and whether it belongs to AMAZON-4 (Cloudfront).
+
+    RDAP answers rarely change, they are cached as long as the cache ceiling allows.
+
+    Args:
+        ipv4 (str): The IP to look up.
+        cache (DnsCache): The persistent cache.
+
+    Returns:
+        list: [asn_description, is_cloudfront], or None if not found.
+    """
+    answers = cache.get(ipv4, 'RDAP')
+    if answers is not None:
+        return answers or None
+    if cache.cache_only:
+        return None
+
+    # Heavy dependencies are imported when used, i.e. not with the cache only
+    from ipwhois import IPWhois
+
+    try:
+        rdap = IPWhois(ipv4).lookup_rdap()
+        answers = [rdap['asn_description'], 'AMAZON-4' in rdap['objects']]
+    except Exception:
+        return None
+    cache.put(ipv4, 'RDAP', answers, cache.max_ttl)
+    return answers
+
+
+def resolve_ip(domain, cache):
     """
     Resolve the IP, CNAME, and IP Provider for a given domain.
 
     Args:
         domain (str): The domain to resolve.
+        cache (DnsCache): The persistent DNS answer cache.
 
     Returns:
         tuple: A tuple containing the IP, CNAME, and IP Provider. Empty strings if not found.
     """
-    resolver = dns.resolver.Resolver()
     ipv4 = ''
     cname = ''
     ptr = ''
     provider = ''
 
-    try:
-        ipv4 = str(resolver.resolve(domain, 'A')[0])
-    except Exception:
-        pass
+    answers = cache.resolve(domain, 'A')
+    if answers:
+        ipv4 = answers[0]
 
-    try:
-        reverse_name = dns.reversename.from_address(ipv4)
-        ptr = str(resolver.resolve(reverse_name, 'PTR')[0])
-    except Exception:
-        pass
+    if ipv4:
+        answers = cache.resolve(ipv4, 'PTR')
+        if answers:
+            ptr = answers[0]
 
-    try:
-        cname = str(resolver.resolve(domain, 'CNAME')[0])
-    except Exception:
-        pass
+    answers = cache.resolve(domain, 'CNAME')
+    if answers:
+        # Absolute names, e.g. "www.example.com."
+        cname = answers[0].rstrip('.')
 
-    try:
-        rdap = IPWhois(ipv4).lookup_rdap()
-        provider = rdap['asn_description']
+    rdap = lookup_rdap(ipv4, cache) if ipv4 else None
+    if rdap and rdap[0]:
+        provider, is_cloudfront = rdap
 
-        if 'AMAZON' in provider and 'AMAZON-4' in rdap['objects']:
+        if 'AMAZON' in provider and is_cloudfront:
             provider = 'AMAZON - Cloudfront'
         elif 'AMAZON' in provider:
             provider = f'AMAZON - {get_aws_zone(ptr)}'
             if provider == 'AMAZON - AMAZON':
-                cname = ptr
+                cname = ptr.rstrip('.')
                 provider = 'AMAZON'
-    except Exception:
-        pass
 
     return ipv4, cname, provider
 
 
-def print_table(rows):
+def follow_cname(subdomain, cname, hosts):
     """
-    Print the table format of the output.
+    Follow the CNAME chain of a subdomain through the resolved hosts of the inventory.
 
     Args:
-        rows (list): The rows to print.
+        subdomain (str): The first host of the chain.
+        cname (dict): subdomain -> CNAME.
+        hosts (dict): The resolved hosts of the inventory.
+
+    Returns:
+        str: The last host of the inventory in the chain, or the subdomain itself
+             if its CNAME leaves the inventory or the chain loops.
     """
-    # Sort the rows by the "IP Provider" field
-    rows = sorted(rows, key=lambda row: str(row[3]))
+    seen = {subdomain}
+    host = subdomain
+    while cname.get(host) in hosts:
+        host = cname[host]
+        if host in seen:
+            return subdomain
+        seen.add(host)
+    return host
 
-    headers = ['Subdomain', 'CNAME', 'IP', 'IP Provider']
-    print(tabulate(rows, headers=headers, tablefmt='grid'))
 
+def build_host_graph(subdomains, cache):
+    """
+    Resolve the subdomains and index their relationships.
+
+    A subdomain whose CNAME chain leads to another subdomain of the inventory,
+    e.g. www -> app -> lb, is collapsed into the last one and only kept in the
+    `aliases` index. CNAME loops are not collapsed.
 
-def print_csv(rows):
+    Args:
+        subdomains (list): The subdomains to resolve.
+        cache (DnsCache): The persistent DNS answer cache.
+
+    Returns:
+        dict: The host graph, containing:
+              - rows: the [Subdomain, CNAME, IP, IP Provider, Aliases] rows to display
+              - cname: subdomain -> CNAME
+              - aliases: subdomain -> collapsed subdomains
+              - ip_hosts: IP -> subdomains
+              - provider_ips: IP Provider -> IPs
+    """
+    graph = {
+        'rows': [],
+        'cname': {},
+        'aliases': defaultdict(list),
+        'ip_hosts': defaultdict(list),
+        'provider_ips': defaultdict(set),
+    }
+
+    resolved = {}
+    for subdomain in subdomains:
+        ipv4, cname, provider = resolve_ip(subdomain, cache)
+        if not ipv4 or ipv4 == '127.0.0.1' or ipv4.startswith('::'):
+            continue
+        resolved[subdomain] = ipv4, cname, provider
+        if cname:
+            graph['cname'][subdomain] = cname
+
+    collapsed = set()
+    for subdomain in resolved:
+        target = follow_cname(subdomain, graph['cname'], resolved)
+        if target != subdomain:
+            graph['aliases'][target].append(subdomain)
+            collapsed.add(subdomain)
+
+    for subdomain, (ipv4, cname, provider) in resolved.items():
+        if subdomain in collapsed:
+            continue
+        graph['rows'].append([subdomain, cname, ipv4, provider, ', '.join(graph['aliases'].get(subdomain, []))])
+        graph['ip_hosts'][ipv4].append(subdomain)
+        graph['provider_ips'][provider].add(ipv4)
+
+    return graph
+
+
+def print_rows(rows, fmt='table', limit=0, page=1):
     """
-    Print the CSV format of the output.
+    Print the rows, sorted by IP Provider, in the given output format.
 
     Args:
         rows (list): The rows to print.
+        fmt (str): The output format, see output.FORMATS.
+        limit (int): Number of rows per page, 0 for all rows.
+        page (int): The page to print.
     """
-    headers = ['Subdomain', 'CNAME', 'IP', 'IP Provider']
-    csv_writer = csv.writer(sys.stdout)
-    csv_writer.writerow(headers)
-    csv_writer.writerows(rows)
+    headers = ['Subdomain', 'CNAME', 'IP', 'IP Provider', 'Aliases']
+    write_rows(sorted_rows(rows, key=lambda row: str(row[3])), headers, fmt, limit, page)
 
 
-def create_graph(rows):
+def create_graph(graph):
     """
     Create a visual graph with bubbles representing providers and subdomains.
 
+    Providers hosting more than GRAPH_CLUSTER_LIMIT subdomains are aggregated
+    into a count node, so that large inventories stay renderable. The aliases
+    of a subdomain are displayed along with it.
+
     Args:
-        rows (list): The rows to create the graph from.
+        graph (dict): The host graph, see build_host_graph().
     """
-    graph = Graph('Providers', format='png')
+    from graphviz import Graph
+
+    dot = Graph('Providers', format='png')
 
     # Create nodes
-    providers = set(row[3] for row in rows)
-    for provider in providers:
-        subdomains = [row[0] for row in rows if row[3] == provider]
-        bubble_label = provider + '\n' + '\n'.join(subdomains)
-        graph.node(provider, label=bubble_label, shape='square')
+    for provider, ips in graph['provider_ips'].items():
+        subdomains = [subdomain for ip in sorted(ips) for subdomain in graph['ip_hosts'][ip]]
+        aliases = sum(len(graph['aliases'].get(subdomain, [])) for subdomain in subdomains)
+        if len(subdomains) > GRAPH_CLUSTER_LIMIT:
+            bubble_label = f'{provider}\n{len(subdomains)} subdomains and {aliases} aliases on {len(ips)} IPs'
+        else:
+            bubble_label = provider + '\n' + '\n'.join(
+                ' <- '.join([subdomain] + graph['aliases'].get(subdomain, [])) for subdomain in subdomains)
+        dot.node(provider, label=bubble_label, shape='square')
 
     # Connect nodes that start with 'AMAZON'
-    amazon_providers = [provider for provider in providers if provider.startswith('AMAZON')]
+    amazon_providers = [provider for provider in graph['provider_ips'] if provider.startswith('AMAZON')]
     for i in range(len(amazon_providers) - 1):
         # You might want to replace this with your own logic to determine the connections
-        graph.edge(amazon_providers[i], amazon_providers[i + 1])
+        dot.edge(amazon_providers[i], amazon_providers[i + 1])
 
-    graph.render('graph', view=True)
+    dot.render('graph', view=True)
 
 
 def main():
@@ -137,8 +239,10 @@ def main():
     """
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--file', default='targets.latest.txt', help='Input file name')
-    parser.add_argument('--csv', action='store_true', help='Output in CSV format')
+    parser.add_argument('--csv', action='store_true', help='Output in CSV format, same as --format csv')
     parser.add_argument('--graph', action='store_true', help='Create a visual graph')
+    parser.add_argument('--cache-only', action='store_true', help='Only use cached DNS answers, no network query')
+    add_arguments(parser)
     args = parser.parse_args()
 
     try:
@@ -148,20 +252,16 @@ def main():
         print(f"Error: Failed to open file '{args.file}'")
         return
 
-    rows = []
-    for subdomain in subdomains:
-        ipv4, cname, provider = resolve_ip(subdomain)
-        if ipv4 and ipv4 != '127.0.0.1' and not ipv4.startswith('::'):
-            if cname and cname != subdomain and cname in subdomains:
-                continue
-            rows.append([subdomain, cname, ipv4, provider])
+    cache = DnsCache(cache_only=args.cache_only)
+    try:
+        graph = build_host_graph(subdomains, cache)
+    finally:
+        cache.save()
 
     if args.graph:
-        create_graph(rows)
-    elif args.csv:
-        print_csv(rows)
+        create_graph(graph)
     else:
-        print_table(rows)
+        print_rows(graph['rows'], 'csv' if args.csv else args.format, args.limit, args.page)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+IP-deduplicated port scanning stage.
+
+Hosts are resolved, each unique IP is scanned once with naabu, and the open
+ports are mapped back onto every hostname pointing at that IP, in the
+"host:port" format of naabu.sh. Open/closed results are cached per IP, so
+that daily runs only probe the stale IPs again. If naabu fails, the cache is
+left untouched, and only the cached results are printed.
+
+Usage:
+    python portscan.py [targets.latest.txt] > naabu.latest.txt
+"""
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import ipaddress
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import settings
+from dns_cache import DnsCache
+
+# Debug
+# from pdb import set_trace as st
+
+# Same port list as naabu.sh
+PORTS = '21,22,25,53,8080,135,136,137,138,139,143,445,993,995,1723,3306,3389,6379,27017,5900,8443,5901,88,161,389,689,500,1812,1813,3000,4000,5000,5060,1433,1434,5432,9933,8110,8014,8107,8034,9999,15672,7777,8762,8088,19091,9091,19090,943,4532,9093,19093,9090,4531,5055,4530,4520,1194'
+CACHE_FILE = getattr(settings, 'portscan_cache_file', 'portscan_cache.json.gz')
+CACHE_TTL = getattr(settings, 'portscan_cache_ttl', 86400)  # in seconds
+RESOLVE_WORKERS = 50
+
+
+def is_ip(target):
+    """
+    Returns True if the target is an IP address.
+    """
+    try:
+        ipaddress.ip_address(target)
+    except ValueError:
+        return False
+    return True
+
+
+def map_ips(hosts, dns_cache):
+    """
+    Resolves the hosts and groups them by IP.
+
+    :param hosts: List of hostnames or IPs
+    :param dns_cache: The persistent DNS answer cache
+    :return: A dict of IP -> hosts
+    """
+    ip_to_hosts = defaultdict(list)
+    names = [host for host in hosts if not is_ip(host)]
+    with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as executor:
+        for host, ips in zip(names, executor.map(lambda name: dns_cache.resolve(name, 'A'), names)):
+            for ip in ips:
+                ip_to_hosts[ip].append(host)
+    for host in hosts:
+        if is_ip(host):
+            ip_to_hosts[host].append(host)
+    return ip_to_hosts
+
+
+def load_cache(cache_file=CACHE_FILE):
+    """
+    Loads the per IP cache: IP -> {'checked': timestamp, 'ports': scanned ports, 'open': open ports}
+    """
+    try:
+        with gzip.open(cache_file, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, cache_file=CACHE_FILE):
+    """
+    Atomically stores the per IP cache.
+    """
+    tmp_file = f'{cache_file}.{os.getpid()}'
+    with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
+
+
+def update_naabu():
+    """
+    Update naabu, as naabu.sh does.
+    """
+    print('[*] Updating naabu...', file=sys.stderr)
+    try:
+        subprocess.run(['naabu', '-up'], stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    except OSError:
+        # Reported by the scan
+        pass
+
+
+def scan_ips(ips, ports=PORTS):
+    """
+    Scans the IPs with naabu.
+
+    :param ips: List of IPs
+    :param ports: Comma separated list of ports
+    :return: A dict of IP -> open ports
+    :raise OSError, subprocess.CalledProcessError: If naabu is missing or fails
+    """
+    open_ports = defaultdict(list)
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as temp_file:
+        temp_file.write('\n'.join(ips) + '\n')
+    try:
+        output = subprocess.run(['naabu', '-silent', '-l', temp_file.name, '-p', ports],
+            capture_output=True, text=True, check=True).stdout
+    finally:
+        os.unlink(temp_file.name)
+    for line in output.splitlines():
+        ip, _, port = line.strip().rpartition(':')
+        if port.isdigit():
+            open_ports[ip].append(int(port))
+    return open_ports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan the ports of each unique IP once, reported per host')
+    parser.add_argument('input_file', nargs='?', default='targets.latest.txt',
+        help='The input file containing hosts')
+    parser.add_argument('--ttl', type=int, default=CACHE_TTL, help='Cache TTL of an IP, in seconds')
+    parser.add_argument('--no-update', action='store_true', help='Do not update naabu first')
+    args = parser.parse_args()
+
+    if not args.no_update:
+        update_naabu()
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        hosts = sorted(set(line.strip().split(':')[0] for line in f if line.strip()))
+
+    dns_cache = DnsCache()
+    ip_to_hosts = map_ips(hosts, dns_cache)
+    dns_cache.save()
+
+    cache = load_cache()
+    now = time.time()
+    stale_ips = [ip for ip in ip_to_hosts
+                 if ip not in cache or cache[ip]['ports'] != PORTS or now - cache[ip]['checked'] > args.ttl]
+    print(f'[*] {len(hosts)} hosts on {len(ip_to_hosts)} unique IPs, {len(stale_ips)} to scan', file=sys.stderr)
+
+    failed = False
+    if stale_ips:
+        try:
+            open_ports = scan_ips(stale_ips)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # Caching the stale IPs as closed would hide their open ports for the whole TTL
+            print(f'[!] naabu failed, the cache is left untouched: {e}', file=sys.stderr)
+            failed = True
+        else:
+            for ip in stale_ips:
+                cache[ip] = {'checked': now, 'ports': PORTS, 'open': sorted(open_ports.get(ip, []))}
+            save_cache(cache)
+
+    for ip in sorted(ip_to_hosts):
+        for port in cache.get(ip, {}).get('open', []):
+            for host in ip_to_hosts[ip]:
+                print(f'{host}:{port}')
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""
+Risk-based ordering of scan targets.
+
+Targets are ranked, from the first to the last scanned:
+1. targets deferred by the previous runs, when they ran out of time
+2. hosts with prior high or critical findings in the recent reports
+3. newly seen subdomains, absent from the older target snapshots
+4. hosts of the critical products (settings.critical_products)
+then in file order.
+
+Usage:
+    python prioritize.py [targets.latest.txt]
+
+The deferred targets are kept in a single list, reports/deferred.nuclei.txt:
+each run removes the targets it went through, and adds those it deferred,
+whether or not it generated a report.
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import os
+from pathlib import Path
+import re
+
+from config import settings
+from findings import get_asset, get_severity, list_reports, read_findings
+from report_io import open_text
+
+# Debug
+# from pdb import set_trace as st
+
+HISTORY_REPORTS = getattr(settings, 'prioritize_history_reports', 10)
+NEW_TARGET_DAYS = getattr(settings, 'prioritize_new_target_days', 7)
+SNAPSHOT_DIRECTORIES = ['targets.subfinder', 'targets.amass', 'targets.bbot']
+SNAPSHOT_PATTERN = r'targets\.\w+\.(\d{8}-\d{6})\.txt(\.gz|\.xz)?$'
+DEFERRED_FILE = 'deferred.nuclei.txt'
+
+# Score of each criterion, so that a higher criterion always wins
+DEFERRED = 8
+SEVERE_HISTORY = 4
+NEWLY_SEEN = 2
+CRITICAL_PRODUCT = 1
+
+
+def get_host(target):
+    """
+    Returns the host of a target, without scheme, path nor port.
+    """
+    if '://' in target:
+        target = target.split('/')[2]
+    return target.split(':')[0].lower()
+
+
+def get_deferred_file(reports_dir='reports'):
+    """
+    Returns the path of the deferred targets, e.g. "reports/deferred.nuclei.txt"
+    """
+    return Path(reports_dir) / DEFERRED_FILE
+
+
+def read_deferred(reports_dir='reports'):
+    """
+    Returns the list of the deferred targets, in deferral order.
+    """
+    try:
+        with open(get_deferred_file(reports_dir), 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def get_deferred_targets(reports_dir='reports'):
+    """
+    Returns the targets deferred by the previous runs, not scanned since.
+    """
+    return set(read_deferred(reports_dir))
+
+
+def get_severe_hosts(reports_dir='reports', history=HISTORY_REPORTS):
+    """
+    Returns the hosts with high or critical findings in the most recent reports.
+    """
+    hosts = set()
+    for report in list_reports(reports_dir)[-history:]:
+        for record in read_findings(report):
+            if get_severity(record) not in ['critical', 'high']:
+                continue
+            hosts.add(get_asset(record).lower())
+            hosts.update(subdomain.lower() for subdomain in record.get('subdomains', []))
+    return hosts
+
+
+def get_known_hosts(days=NEW_TARGET_DAYS):
+    """
+    Returns the hosts already present in the target snapshots older than the given number of days.
+    """
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d-%H%M%S')
+    hosts = set()
+    for directory in SNAPSHOT_DIRECTORIES:
+        for snapshot in Path(directory).glob('targets.*'):
+            match = re.match(SNAPSHOT_PATTERN, snapshot.name)
+            if not match or match.group(1) > cutoff:
+                continue
+            with open_text(snapshot) as f:
+                hosts.update(line.strip().lower() for line in f)
+    return hosts
+
+
+def get_critical_patterns():
+    """
+    Returns the compiled regex patterns of the critical products.
+    """
+    return [re.compile(settings.products[product])
+            for product in getattr(settings, 'critical_products', [])
+            if product in settings.products]
+
+
+def prioritize_targets(targets, reports_dir='reports'):
+    """
+    Sorts targets from the most to the least urgent to scan.
+
+    :param targets: List of targets, in file order
+    :param reports_dir: The reports directory
+    :return: The sorted list of targets
+    """
+    deferred = get_deferred_targets(reports_dir)
+    severe_hosts = get_severe_hosts(reports_dir)
+    known_hosts = get_known_hosts()
+    critical_patterns = get_critical_patterns()
+
+    def score(target):
+        host = get_host(target)
+        value = 0
+        if target in deferred:
+            value += DEFERRED
+        if host in severe_hosts:
+            value += SEVERE_HISTORY
+        # Without any old snapshot, every target would be new
+        if known_hosts and host not in known_hosts:
+            value += NEWLY_SEEN
+        if any(pattern.match(host) for pattern in critical_patterns):
+            value += CRITICAL_PRODUCT
+        return value
+
+    # sorted() is stable, file order is kept for equal scores
+    return sorted(targets, key=score, reverse=True)
+
+
+def update_deferred(targets, deferred, reports_dir='reports'):
+    """
+    Updates the deferred targets after a run: the targets of the run are consumed, as scanned
+    or dropped before the scan, and those it deferred are added. The file is removed once empty.
+
+    :param targets: The targets of the run, the deferred ones included
+    :param deferred: The targets deferred by the run
+    :return: The path of the deferred file
+    """
+    consumed = set(targets)
+    remaining = [target for target in read_deferred(reports_dir) if target not in consumed]
+    remaining = list(dict.fromkeys(remaining + list(deferred)))
+    deferred_file = get_deferred_file(reports_dir)
+    if not remaining:
+        deferred_file.unlink(missing_ok=True)
+        return deferred_file
+    tmp_file = f'{deferred_file}.{os.getpid()}'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(remaining) + '\n')
+    os.replace(tmp_file, deferred_file)
+    return deferred_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print targets from the most to the least urgent to scan')
+    parser.add_argument('input_file', nargs='?', default='targets.latest.txt',
+        help='The input file containing targets')
+    args = parser.parse_args()
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        targets = [line.strip() for line in f if line.strip()]
+    for target in prioritize_targets(targets):
+        print(target)
+
+
+if __name__ == '__main__':
+    main()
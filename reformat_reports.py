@@ -8,7 +8,9 @@ from pathlib import Path
 import csv
 import hashlib
 import io
-import re
+
+from false_positives import load_rules
+from findings import get_endpoint, get_label, get_metadata, get_severity, list_reports, read_findings
 
 # from pdb import set_trace as st
 
@@ -16,7 +18,7 @@ def extract_timestamp(filename: str) -> datetime:
     """
     Extract the timestamp from the filename and convert it to a datetime object.
 
-    :param filename: Filename in format "report.nuclei.20230427-143329.txt"
+    :param filename: Filename in format "report.nuclei.20230427-143329.jsonl[.gz|.xz]"
     :return: datetime object representing the timestamp
     """
     timestamp_str = filename.split('.')[2]
@@ -30,36 +32,12 @@ def process_file(filepath: Path) -> list:
     :return: List of rows for CSV output
     """
 
-    ignored_values = [
-        'dmarc-detect', 'caa-fingerprint', 'mx-fingerprint', 'switch-protocol', 'options-method',
-        'tech-detect', 'cname-service', 'mismatched-ssl-certificate', 'ssl-dns-names',
-        'ssl-issuer', 'txt-fingerprint', 'cname-fingerprint', 'nameserver-fingerprint',
-        'apple-app-site-association', 'waf-detect', 'secui-waf-detect', 'dns-waf-detect',
-        'http-missing-security-headers', 'weak-cipher-suites', 'mx-service-detector'
-    ]
-
-    with open(filepath, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-
     rows = []
     timestamp = extract_timestamp(filepath.name)
-    pattern = r'\[([^\]]+)\] \[([^\]]+)\] \[([^\]]+)\] (.*)'
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        match = re.search(pattern, line)
-        if not match:
-            continue
-
-        parts = list(match.groups())
-        parts.append(' '.join(parts[3].split()[1:]))
-        parts[3] = parts[3].split()[0]
 
-        if any(parts[0].startswith(ignored_value) for ignored_value in ignored_values):
-            continue
+    # Ignored templates and false positives are filtered out
+    for record in load_rules().filter(read_findings(filepath)):
+        parts = [get_label(record), record['type'], get_severity(record), get_endpoint(record), get_metadata(record)]
 
         hash_input = ''.join(parts[:4])
         hash_output = hashlib.md5(hash_input.encode()).hexdigest()
@@ -70,7 +48,7 @@ def process_file(filepath: Path) -> list:
     return rows
 
 def main():
-    report_files = list(Path('reports/').glob('report.nuclei.2*.txt'))
+    report_files = list_reports('reports')
 
     csv_rows = {}
     header = ['Timestamp', 'Type', 'Protocol', 'Severity', 'Asset', 'Extra', 'Hash']
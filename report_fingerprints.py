@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Compact per-report fingerprints.
+
+A fingerprint file holds the sorted, unique 64-bit hashes of the findings of a
+report, a finding being identified by the first 4 columns of its text line
+(template, protocol, severity, endpoint). Comparing two reports or two sets of
+reports is then a linear merge of sorted arrays.
+"""
+
+from array import array
+from hashlib import blake2b
+from heapq import merge
+from pathlib import Path
+
+from findings import format_line, read_findings
+from report_io import strip_compression
+
+# Debug
+# from pdb import set_trace as st
+
+FINGERPRINT_SUFFIX = '.fp'
+
+
+def finding_hash(line):
+    """
+    Returns the 64-bit hash of the identity of a report line, or None if the
+    line is not a finding.
+
+    :param line: A line from a nuclei report
+    :return: An integer, or None
+    """
+    columns = line.split()[:4]
+    if len(columns) < 4:
+        return None
+    digest = blake2b('\t'.join(columns).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def record_hash(record):
+    """
+    Returns the 64-bit hash of the identity of a record, the same as its text report line.
+
+    :param record: A finding record
+    :return: An integer
+    """
+    return finding_hash(format_line(record))
+
+
+def fingerprint_path(report):
+    """
+    Returns the path of the fingerprint file of a report,
+    e.g. "reports/report.nuclei.20230427-143329.fp" for "reports/report.nuclei.20230427-143329.jsonl.gz"
+    """
+    report = Path(report)
+    return report.with_name(strip_compression(report.name).rsplit('.', 1)[0] + FINGERPRINT_SUFFIX)
+
+
+def write_fingerprints(report):
+    """
+    Computes and stores the fingerprint file of a report.
+
+    :param report: Path of the report
+    :return: The sorted array of hashes
+    """
+    hashes = set(record_hash(record) for record in read_findings(report))
+    fingerprints = array('Q', sorted(hashes))
+
+    tmp_path = fingerprint_path(report).with_suffix('.fp.tmp')
+    with open(tmp_path, 'wb') as f:
+        fingerprints.tofile(f)
+    tmp_path.replace(fingerprint_path(report))
+    return fingerprints
+
+
+def load_fingerprints(report):
+    """
+    Returns the sorted array of hashes of a report, computing the fingerprint
+    file on first read or when the report is newer than it.
+
+    :param report: Path of the report
+    :return: The sorted array of hashes
+    """
+    fp_path = fingerprint_path(report)
+    if not fp_path.exists() or fp_path.stat().st_mtime < Path(report).stat().st_mtime:
+        return write_fingerprints(report)
+
+    fingerprints = array('Q')
+    with open(fp_path, 'rb') as f:
+        fingerprints.frombytes(f.read())
+    return fingerprints
+
+
+def union(reports):
+    """
+    Returns the sorted array of hashes present in any of the reports.
+
+    :param reports: List of report paths
+    :return: The sorted array of hashes
+    """
+    fingerprints = array('Q')
+    last = None
+    for value in merge(*[load_fingerprints(report) for report in reports]):
+        if value != last:
+            fingerprints.append(value)
+            last = value
+    return fingerprints
+
+
+def diff(old, new):
+    """
+    Linear merge of two sorted arrays of hashes.
+
+    :param old: Sorted array of hashes before
+    :param new: Sorted array of hashes after
+    :return: A tuple (added, removed) of lists of hashes
+    """
+    added = []
+    removed = []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(old[i])
+            i += 1
+        else:
+            added.append(new[j])
+            j += 1
+    removed.extend(old[i:])
+    added.extend(new[j:])
+    return added, removed
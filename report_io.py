@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Transparent compressed storage for reports and target snapshots.
+
+Files ending with ".gz" or ".xz" are read and written with streaming
+(de)compression, other files as plain text. The "migrate" command compresses
+existing plain text files in place.
+
+Usage:
+    python report_io.py migrate [--compression gz|xz] [directory ...]
+"""
+
+import argparse
+import gzip
+import lzma
+import os
+import re
+import shutil
+from pathlib import Path
+
+# Debug
+# from pdb import set_trace as st
+
+COMPRESSION_SUFFIXES = {
+    'gz': '.gz',
+    'xz': '.xz',
+}
+
+# Files eligible to the migration, e.g. "report.nuclei.20230427-143329.jsonl"
+MIGRATE_PATTERN = r'(report\.nuclei|targets\.subfinder|targets\.amass|targets\.bbot)\.\d{8}-\d{6}\.(txt|jsonl)$'
+MIGRATE_DIRECTORIES = ['reports', 'targets.subfinder', 'targets.amass', 'targets.bbot']
+
+
+def open_text(path, mode='r'):
+    """
+    Opens a text file, compressed or not depending on its suffix.
+
+    :param path: Path of the file
+    :param mode: 'r', 'w' or 'a'
+    :return: A text file object
+    """
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    if path.endswith('.xz'):
+        return lzma.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def strip_compression(name):
+    """
+    Returns a file name without its compression suffix,
+    e.g. "report.nuclei.20230427-143329.txt" for "report.nuclei.20230427-143329.txt.gz"
+    """
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def with_compression(path, compression):
+    """
+    Returns the path of a file once compressed with the given compression ('', 'gz' or 'xz').
+    """
+    if not compression:
+        return str(path)
+    return str(path) + COMPRESSION_SUFFIXES[compression]
+
+
+def compress_file(path, compression):
+    """
+    Compresses a plain text file, keeping its modification time, then removes it.
+
+    :param path: Path of the plain text file
+    :param compression: 'gz' or 'xz'
+    :return: The path of the compressed file
+    """
+    output = with_compression(path, compression)
+    tmp_output = f'{output}.tmp'
+    with open(path, 'rb') as f_in:
+        if compression == 'gz':
+            f_out = gzip.open(tmp_output, 'wb')
+        else:
+            f_out = lzma.open(tmp_output, 'wb')
+        with f_out:
+            shutil.copyfileobj(f_in, f_out)
+    stat = os.stat(path)
+    os.utime(tmp_output, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp_output, output)
+    os.unlink(path)
+    return output
+
+
+def migrate(directories, compression):
+    """
+    Compresses the plain text reports and target snapshots of the given directories.
+    """
+    for directory in directories:
+        for path in sorted(Path(directory).glob('*')):
+            if not re.match(MIGRATE_PATTERN, path.name):
+                continue
+            print(f'{path} -> {compress_file(path, compression)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compressed report storage')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help='Compress existing reports and target snapshots')
+    migrate_parser.add_argument('directories', nargs='*', default=MIGRATE_DIRECTORIES,
+        help='Directories to migrate')
+    migrate_parser.add_argument('--compression', choices=sorted(COMPRESSION_SUFFIXES), default='gz',
+        help='Compression to use')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate(args.directories, args.compression)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Live report writer of a scan.
+
+Findings are written to the JSONL report and its text view as nuclei produces
+them, so that a long scan can be followed and partially consumed from
+reports/ before it ends. While the scan runs, both are written under a
+".partial" name, e.g. reports/report.nuclei.20230427-143329.jsonl.partial,
+renamed to the report name once the scan is over, and kept as is if the scan
+crashes: list_reports(), the diffs, the trends and merge_all_reports.sh never
+take an unfinished or crashed run for the latest one.
+
+A gzip report is flushed as it goes, and can be read mid-scan with
+"gzip -dc" (which warns about the unexpected end of file). An xz stream only
+ends its blocks when closed, so an xz report is streamed as plain text, and
+compressed once the scan is over.
+
+Running counts per severity and protocol are kept in a sidecar file next to
+the report, replaced atomically, e.g. reports/counts.nuclei.20230427-143329.json:
+
+    {"timestamp": "20230427-143329", "updated": "...", "finished": false,
+     "total": 42, "severity": {"info": 40, "high": 2}, "protocol": {"http": 41, "tcp": 1},
+     "skipped": 7, "deferred": 0}
+
+The run statistics, e.g. "skipped" for the targets dropped before the scan and
+"deferred" for those left to the next run by the time budget, are added as is.
+
+Usage:
+    python report_writer.py reports/report.nuclei.20230427-143329.jsonl[.partial]
+"""
+
+import argparse
+from collections import Counter
+from datetime import datetime
+import gzip
+import json
+import os
+from pathlib import Path
+import time
+
+from findings import format_line, get_severity, get_timestamp
+from report_io import compress_file, strip_compression
+
+# Debug
+# from pdb import set_trace as st
+
+COUNTS_INTERVAL = 1  # in seconds, between two updates of the counts
+PARTIAL_SUFFIX = '.partial'
+
+
+def get_partial_file(output):
+    """
+    Returns the path of a report while it is being written,
+    e.g. "reports/report.nuclei.20230427-143329.jsonl.gz.partial", or
+    "reports/report.nuclei.20230427-143329.jsonl.partial" for an xz report, streamed as plain text.
+    """
+    output = str(output)
+    if output.endswith('.xz'):
+        output = strip_compression(output)
+    return output + PARTIAL_SUFFIX
+
+
+def open_partial(output):
+    """
+    Opens a report for writing under its .partial name, gzip compressed if it ends with .gz.
+    """
+    if str(output).endswith('.gz'):
+        return gzip.open(get_partial_file(output), 'wt', encoding='utf-8')
+    return open(get_partial_file(output), 'w', encoding='utf-8')
+
+
+def get_counts_file(nuclei_output):
+    """
+    Returns the path of the running counts of a report, being written or not,
+    e.g. "reports/counts.nuclei.20230427-143329.json" for "reports/report.nuclei.20230427-143329.jsonl"
+    """
+    nuclei_output = str(nuclei_output).removesuffix(PARTIAL_SUFFIX)
+    return Path(nuclei_output).with_name(f'counts.nuclei.{get_timestamp(nuclei_output)}.json')
+
+
+class ReportWriter:
+    """
+    Streams findings into a JSONL report, its text view and the counts sidecar,
+    along with the extra run statistics, e.g. the number of skipped targets.
+    The report and its text view only get their names once closed.
+    """
+    def __init__(self, nuclei_output, text_output, extra=None):
+        self.nuclei_output = nuclei_output
+        self.text_output = text_output
+        self.counts_file = get_counts_file(nuclei_output)
+        self.jsonl = open_partial(nuclei_output)
+        self.text = open_partial(text_output)
+        self.total = 0
+        self.severities = Counter()
+        self.protocols = Counter()
+        self.extra = extra or {}
+        self.last_update = 0
+        self.write_counts()
+
+    def write(self, record):
+        """
+        Appends a finding to the report.
+        """
+        self.jsonl.write(json.dumps(record) + '\n')
+        self.text.write(format_line(record) + '\n')
+        self.total += 1
+        self.severities[get_severity(record)] += 1
+        self.protocols[record.get('type', '')] += 1
+        if time.time() - self.last_update >= COUNTS_INTERVAL:
+            self.write_counts()
+
+    def write_line(self, line, enrich=None):
+        """
+        Appends a nuclei JSONL output line to the report, enriched by a function of the record if any.
+        Lines which are not findings are ignored.
+        """
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if not isinstance(record, dict) or 'template-id' not in record:
+            return
+        self.write(enrich(record) if enrich else record)
+
+    def write_counts(self, finished=False):
+        """
+        Flushes the report, then atomically replaces the counts sidecar.
+        """
+        for f in [self.jsonl, self.text]:
+            if not f.closed:
+                f.flush()
+        counts = {
+            'timestamp': get_timestamp(self.nuclei_output),
+            'updated': datetime.now().isoformat(timespec='seconds'),
+            'finished': finished,
+            'total': self.total,
+            'severity': dict(self.severities),
+            'protocol': dict(self.protocols),
+            **self.extra,
+        }
+        tmp_file = f'{self.counts_file}.{os.getpid()}'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(counts, f)
+        os.replace(tmp_file, self.counts_file)
+        self.last_update = time.time()
+
+    def abort(self):
+        """
+        Closes the report of a crashed scan, keeping its .partial names: it is never taken for a finished run.
+        """
+        self.write_counts()
+        self.jsonl.close()
+        self.text.close()
+
+    def close(self):
+        """
+        Closes the report and gives it its name. Without any finding, the report and its sidecar are removed.
+
+        :return: True if the report holds findings
+        """
+        self.jsonl.close()
+        self.text.close()
+        for output in [self.nuclei_output, self.text_output]:
+            partial_file = get_partial_file(output)
+            if not self.total:
+                Path(partial_file).unlink(missing_ok=True)
+            elif str(output).endswith('.xz'):
+                os.replace(partial_file, strip_compression(str(output)))
+                compress_file(strip_compression(str(output)), 'xz')
+            else:
+                os.replace(partial_file, output)
+        if self.total:
+            self.write_counts(finished=True)
+        else:
+            self.counts_file.unlink(missing_ok=True)
+        return bool(self.total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Display the running counts of a report')
+    parser.add_argument('report', help='The JSONL report, being written or not')
+    args = parser.parse_args()
+
+    with open(get_counts_file(args.report), 'r', encoding='utf-8') as f:
+        counts = json.load(f)
+    state = 'finished' if counts['finished'] else f'running, updated {counts["updated"]}'
+    print(f'{counts["total"]} findings ({state})')
+    if 'skipped' in counts:
+        print(f'{counts["skipped"]} targets skipped, not resolving')
+    if counts.get('deferred'):
+        print(f'{counts["deferred"]} targets deferred to the next run, partial report')
+    for severity in ['critical', 'high', 'medium', 'low', 'info']:
+        print(f'{severity.capitalize()} : {counts["severity"].get(severity, 0)}')
+    for protocol, count in sorted(counts['protocol'].items()):
+        print(f'{protocol} : {count}')
+
+
+if __name__ == '__main__':
+    main()
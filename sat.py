@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Single entry point of the Subdomain Analysis Toolkit.
+
+Each subcommand runs the script of the same feature, with its own options,
+e.g. "python sat.py diff --severe --days 1". Only the module of the
+subcommand is imported, and the settings are loaded once per process.
+
+The startup command measures the import time of every subcommand with
+"python -X importtime", and fails when one exceeds the budget:
+    python sat.py startup [--budget 300]
+"""
+
+import argparse
+import re
+import runpy
+import subprocess
+import sys
+
+# Debug
+# from pdb import set_trace as st
+
+# Subcommand -> (module, description)
+COMMANDS = {
+    'scan': ('nuclei', 'Perform a scan using httpx and nuclei'),
+    'stats': ('nuclei_report_stats', 'Display statistics of a nuclei report'),
+    'diff': ('diff_nuclei', 'Display the new and resolved findings'),
+    'export': ('reformat_reports', 'Export every finding of the reports as CSV'),
+    'subdomains': ('parse_subdomains', 'Display the CNAME, IP and provider of subdomains'),
+    'urls': ('get_unique_urls', 'Get the unique URLs of the web archive'),
+    'buckets': ('get_public_buckets', 'Search public buckets by keyword'),
+    'trends': ('trends', 'Time series of the findings per product, severity, protocol or category'),
+}
+STARTUP_BUDGET = 300  # in milliseconds
+IMPORTTIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$')
+
+
+def run_command(command, args):
+    """
+    Runs the module of a subcommand as a script, with the given arguments.
+    """
+    module = COMMANDS[command][0]
+    sys.argv = [f'{module}.py'] + args
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+
+
+def measure_import_time(module):
+    """
+    Measures the import time of a module in a new interpreter.
+
+    :param module: The module name, or None for the interpreter alone
+    :return: A tuple (total in ms, list of (cumulative in ms, name) of the direct imports of the module,
+             heaviest first), or None if the module cannot be imported
+    """
+    code = f'import {module}' if module else 'pass'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True)
+    if process.returncode:
+        return None
+    total = 0
+    imports = []
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if not match:
+            continue
+        cumulative, depth = int(match.group(2)) / 1000, len(match.group(3))
+        # Top-level imports are indented by a single space, their own imports by 3
+        if depth == 1:
+            total += cumulative
+        elif depth == 3:
+            imports.append((cumulative, match.group(4)))
+    return total, sorted(imports, reverse=True)
+
+
+def check_startup(budget=STARTUP_BUDGET):
+    """
+    Prints the import time of every subcommand, on top of the interpreter startup.
+
+    :return: True if every subcommand can be imported within the budget
+    """
+    baseline = measure_import_time(None)[0]
+    print(f'Interpreter: {baseline:.1f} ms')
+    within_budget = True
+    for command, (module, _) in COMMANDS.items():
+        measure = measure_import_time(module)
+        if measure is None:
+            within_budget = False
+            print(f'FAIL {command:10} cannot import {module}, missing dependency?')
+            continue
+        total, imports = measure
+        over = total - baseline > budget
+        within_budget &= not over
+        heaviest = ', '.join(f'{name} {cumulative:.1f} ms' for cumulative, name in imports[:3])
+        print(f'{"OVER" if over else "OK":4} {command:10} {total - baseline:7.1f} ms  ({heaviest})')
+    return within_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Subdomain Analysis Toolkit')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, (_, description) in COMMANDS.items():
+        # The options are parsed by the script of the subcommand
+        subparsers.add_parser(command, help=description, add_help=False)
+    startup_parser = subparsers.add_parser('startup', help='Check the import time of every subcommand')
+    startup_parser.add_argument('--budget', type=int, default=STARTUP_BUDGET,
+        help='Import time budget of a subcommand, in milliseconds')
+    args, remaining = parser.parse_known_args()
+
+    if args.command == 'startup':
+        sys.exit(0 if check_startup(args.budget) else 1)
+    run_command(args.command, remaining)
+
+
+if __name__ == '__main__':
+    main()
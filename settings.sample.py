@@ -9,6 +9,22 @@ false_positive = [
 '[dbeaver-credentials] [http] [medium] https://www.github.com/.dbeaver/credentials-config.json\n',
 ]
 
+# Template-id and host-glob rules, suppressing the findings or overriding their severity
+false_positive_rules = [
+    # {'template': 'git-config', 'host': '*.sandbox.example.com'},
+    # {'template': '*', 'host': 'honeypot.example.com'},
+    # {'template': 'openssh-detect', 'host': '*', 'severity': 'low'},
+]
+
+# Template-id prefixes ignored in the merged report, stats, CSV and diffs
+ignored_templates = [
+    'dmarc-detect', 'caa-fingerprint', 'mx-fingerprint', 'switch-protocol', 'options-method',
+    'tech-detect', 'cname-service', 'mismatched-ssl-certificate', 'ssl-dns-names',
+    'ssl-issuer', 'txt-fingerprint', 'cname-fingerprint', 'nameserver-fingerprint',
+    'apple-app-site-association', 'waf-detect', 'secui-waf-detect', 'dns-waf-detect',
+    'http-missing-security-headers', 'weak-cipher-suites', 'mx-service-detector'
+]
+
 nuclei_target_blacklist = [
     'login.microsoftonline.com',
     'example.com'
@@ -38,4 +54,69 @@ nuclei_exclude_templates = [
     'technologies/waf-detect.yaml',
 ]
 
-graywarefare_api_key = 'xxxxxxxxxxxxxxxxx'
\ No newline at end of file
+graywarefare_api_key = 'xxxxxxxxxxxxxxxxx'
+graywarefare_cache_ttl = 86400  # in seconds
+graywarefare_rate_limit = 2  # requests per second
+
+# Persistent DNS answer cache
+dns_cache_file = 'dns_cache.json.gz'
+dns_cache_min_ttl = 300  # in seconds
+dns_cache_max_ttl = 86400  # in seconds
+dns_cache_negative_ttl = 600  # in seconds
+
+# Open-port cache of portscan.py, per IP
+portscan_cache_file = 'portscan_cache.json.gz'
+portscan_cache_ttl = 86400  # in seconds
+
+# Compression of new reports and target snapshots: '', 'gz' or 'xz'
+report_compression = ''
+
+# Monitoring daemon (monitor.py)
+monitor_port = 9093
+monitor_discovery_interval = 86400  # in seconds
+monitor_full_scan_interval = 604800  # in seconds
+monitor_batch_size = 100
+
+# Scan prioritization (prioritize.py) and time budget
+critical_products = ['Github']
+prioritize_history_reports = 10
+prioritize_new_target_days = 7
+scan_batch_size = 200
+
+# Adaptive nuclei concurrency (nuclei_tuner.py)
+nuclei_adaptive = False
+nuclei_tuner_bounds = {
+    'concurrency': (10, 100),
+    'bulk_size': (10, 100),
+    'rate_limit': (100, 1500),
+}
+nuclei_tuner_increase = {'concurrency': 5, 'bulk_size': 5, 'rate_limit': 50}
+nuclei_tuner_decrease_factor = 0.5
+nuclei_tuner_max_error_rate = 0.05
+
+# Distributed scans (distributed.py)
+distributed_queue_dir = 'queue'
+distributed_unit_size = 200
+distributed_lease_ttl = 900  # in seconds
+distributed_max_attempts = 3
+
+# Trend rollups of the reports (trends.py)
+trends_db = 'trends.sqlite'
+
+# Wildcard DNS pruning of the scan targets (wildcard.py)
+wildcard_pruning = True
+wildcard_min_hosts = 3  # hosts under a zone before probing it
+wildcard_cache_ttl = 86400  # in seconds
+
+# Technology-aware template targeting (template_index.py)
+nuclei_templates_dir = '~/nuclei-templates'
+nuclei_tech_targeting = False  # run nuclei per group of hosts with the templates of their httpx technologies
+# nuclei_tech_aliases = {'iis': ['internetinformationservices']}  # normalized httpx name -> template vendor/product
+
+# Service banner fingerprints of the TCP findings (banners.py), banners.json next to the scripts by default
+# banners_file = 'banners.json'
+
+# DNS liveness pre-filter of the scan targets (liveness.py)
+liveness_filter = True
+liveness_recheck_interval = 259200  # in seconds, before querying a NXDOMAIN name again
+liveness_workers = 100
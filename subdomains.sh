@@ -29,6 +29,8 @@ amass_output="targets.amass/targets.amass.${timestamp}.txt"
 subdomain_latest_output="targets.latest.txt"
 previous_subdomains_file="/tmp/targets.latest.txt"
 TIMEOUT=2 # in minutes
+# Compression of the target snapshots once merged: "", "gz" or "xz"
+compression="${REPORT_COMPRESSION:-}"
 
 # If the latest output file exists, copy it to the temp location
 if [ -f "$subdomain_latest_output" ]; then
@@ -68,3 +70,9 @@ fi
 
 # cat "$subfinder_output" "$amass_output" "$bbot_output" "$previous_subdomains_file" | sort -u > "$subdomain_latest_output"
 cat "$subfinder_output" "$amass_output" "$previous_subdomains_file" | grep -v '^2a\.' | sort -u > "$subdomain_latest_output"
+
+# Compress the target snapshots, they are only kept for history
+case "$compression" in
+    gz) gzip -f "$subfinder_output" "$amass_output" ;;
+    xz) xz -f "$subfinder_output" "$amass_output" ;;
+esac
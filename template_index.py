@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""
+Local metadata index of the nuclei templates, and technology-aware targeting.
+
+The index holds the id, severity, protocol, tags, path, vendor and product of
+every template. It is parsed from the templates directory, without nuclei nor
+a YAML parser, and rebuilt only when the templates change.
+
+Templates with a vendor or product metadata are technology-specific, the others
+are generic. From the httpx -tech-detect output, hosts are grouped by the
+technology-specific templates matching their technologies, so that nuclei runs
+once per group with the generic templates plus the matching ones.
+
+Usage:
+    python template_index.py build
+    python template_index.py show [--tag wordpress]
+    httpx -silent -tech-detect -json -l targets.latest.txt | python template_index.py groups
+"""
+
+import argparse
+from collections import defaultdict
+import gzip
+import json
+import os
+from pathlib import Path
+import re
+import sys
+
+from config import settings
+
+# Debug
+# from pdb import set_trace as st
+
+TEMPLATES_DIR = os.path.expanduser(getattr(settings, 'nuclei_templates_dir', '~/nuclei-templates'))
+INDEX_FILE = 'template_index.json.gz'
+# Top-level keys of the template protocols, "requests" and "network" are the older names of http and tcp
+PROTOCOLS = {
+    'http': 'http', 'requests': 'http', 'tcp': 'tcp', 'network': 'tcp', 'dns': 'dns', 'ssl': 'ssl',
+    'file': 'file', 'headless': 'headless', 'code': 'code', 'javascript': 'javascript',
+    'websocket': 'websocket', 'whois': 'whois', 'workflows': 'workflow', 'flow': 'flow',
+}
+TOP_LEVEL_PATTERN = re.compile(r'^([a-z-]+):\s*(.*)$')
+INFO_PATTERN = re.compile(r'^  (severity|tags):\s*(.*)$')
+METADATA_PATTERN = re.compile(r'^    (vendor|product):\s*(.*)$')
+# Normalized httpx technology -> its other names in the template metadata, when no word run of it matches
+ALIASES = {
+    'iis': ['internetinformationservices'],
+    'microsoftsharepoint': ['sharepointserver'],
+    'confluence': ['confluenceserver', 'confluencedatacenter'],
+    'jira': ['jiraserver', 'jirasoftware'],
+    'nginx': ['nginxplus'],
+}
+ALIASES.update(getattr(settings, 'nuclei_tech_aliases', {}))
+
+
+def normalize(name):
+    """
+    Returns the comparable form of a technology, tag, vendor or product,
+    e.g. "microsoftaspnet" for "Microsoft ASP.NET:4.0", keeping only the letters and digits.
+    """
+    return re.sub(r'[^a-z0-9]', '', name.split(':')[0].lower())
+
+
+def get_keys(technology):
+    """
+    Returns the forms a httpx technology may take in the template metadata: every run of
+    its words, e.g. "apache", "httpserver" and "apachehttpserver" for "Apache HTTP Server:2.4.49"
+    (vendor apache, product http_server), "aspnet" for "Microsoft ASP.NET", and its aliases.
+    """
+    words = re.findall(r'[a-z0-9]+', technology.split(':')[0].lower())
+    keys = set(''.join(words[i:j]) for i in range(len(words)) for j in range(i + 1, len(words) + 1))
+    keys.update(ALIASES.get(normalize(technology), []))
+    return keys
+
+
+def parse_template(path):
+    """
+    Parses the metadata of a template.
+
+    :return: A dict with id, severity, protocol, tags, path, vendor and product, or None if not a template
+    """
+    template = {'id': None, 'severity': 'unknown', 'protocol': None, 'tags': [], 'path': str(path),
+                'vendor': '', 'product': ''}
+    section = None
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                match = TOP_LEVEL_PATTERN.match(line)
+                if match:
+                    section = match.group(1)
+                    if section == 'id':
+                        template['id'] = match.group(2).strip().strip('"\'')
+                    elif section in PROTOCOLS:
+                        template['protocol'] = PROTOCOLS[section]
+                        # The metadata is above the requests
+                        break
+                    continue
+                if section != 'info':
+                    continue
+                match = INFO_PATTERN.match(line) or METADATA_PATTERN.match(line)
+                if not match:
+                    continue
+                key, value = match.group(1), match.group(2).strip().strip('[]"\'')
+                if key == 'tags':
+                    template['tags'] = [tag.strip().strip('"\'') for tag in value.split(',') if tag.strip()]
+                else:
+                    template[key] = value.lower()
+    except OSError:
+        return None
+    return template if template['id'] else None
+
+
+def get_signature(templates_dir):
+    """
+    Returns the number and the latest modification time of the templates.
+    """
+    count, latest = 0, 0
+    for root, _, files in os.walk(templates_dir):
+        for name in files:
+            if name.endswith('.yaml'):
+                count += 1
+                latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return f'{count} {latest}'
+
+
+def build_index(templates_dir=TEMPLATES_DIR):
+    """
+    Parses every template of the templates directory.
+    """
+    templates = []
+    for path in sorted(Path(templates_dir).rglob('*.yaml')):
+        template = parse_template(path)
+        if template:
+            templates.append(template)
+    return templates
+
+
+def load_index(templates_dir=TEMPLATES_DIR, index_file=INDEX_FILE):
+    """
+    Loads the persisted index, rebuilding it if the templates changed.
+
+    :return: The list of templates
+    """
+    signature = get_signature(templates_dir)
+    try:
+        with gzip.open(index_file, 'rt', encoding='utf-8') as f:
+            index = json.load(f)
+        if index['templates_dir'] == templates_dir and index['signature'] == signature:
+            return index['templates']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    templates = build_index(templates_dir)
+    tmp_file = f'{index_file}.{os.getpid()}'
+    with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+        json.dump({'templates_dir': templates_dir, 'signature': signature, 'templates': templates}, f)
+    os.replace(tmp_file, index_file)
+    return templates
+
+
+def get_technologies(template):
+    """
+    Returns the normalized technologies a template is specific to, empty for a generic template.
+    """
+    technologies = set(normalize(value) for value in [template['vendor'], template['product']] if value)
+    if technologies:
+        technologies.update(normalize(tag) for tag in template['tags'])
+    return technologies
+
+
+def parse_httpx(lines):
+    """
+    Parses the httpx -tech-detect -json output.
+
+    :return: A dict of URL -> set of the keys of its technologies
+    """
+    hosts = {}
+    for line in lines:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if result.get('url'):
+            hosts[result['url']] = set(key for tech in result.get('tech') or [] for key in get_keys(tech))
+    return hosts
+
+
+def group_hosts(hosts, templates):
+    """
+    Groups the hosts by the technology-specific templates matching their technologies.
+
+    :param hosts: A dict of URL -> set of the keys of its technologies
+    :param templates: The template index
+    :return: A tuple (generic template paths, list of (specific template paths, URLs)),
+        the hosts without any specific template being in no group
+    """
+    generic = []
+    by_technology = defaultdict(list)
+    for template in templates:
+        technologies = get_technologies(template)
+        if not technologies:
+            generic.append(template['path'])
+        for technology in technologies:
+            by_technology[technology].append(template['path'])
+
+    groups = defaultdict(list)
+    for url, technologies in hosts.items():
+        specific = frozenset(path for technology in technologies for path in by_technology.get(technology, []))
+        if specific:
+            groups[specific].append(url)
+    return generic, [(sorted(specific), urls) for specific, urls in groups.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nuclei template metadata index')
+    parser.add_argument('command', choices=['build', 'show', 'groups'],
+        help='build: (re)build the index, show: list the templates, groups: group httpx -json hosts from stdin')
+    parser.add_argument('--templates', default=TEMPLATES_DIR, help='The nuclei templates directory')
+    parser.add_argument('--tag', help='Only show the templates with this tag')
+    args = parser.parse_args()
+
+    templates = load_index(args.templates)
+    if args.command == 'build':
+        print(f'{len(templates)} templates indexed in {INDEX_FILE}')
+    elif args.command == 'show':
+        for template in templates:
+            if not args.tag or args.tag in template['tags']:
+                print(f"{template['id']}\t{template['severity']}\t{template['protocol']}\t"
+                      f"{','.join(template['tags'])}\t{template['path']}")
+    else:
+        hosts = parse_httpx(sys.stdin)
+        generic, groups = group_hosts(hosts, templates)
+        print(f'{len(hosts)} hosts, {len(generic)} generic templates')
+        for paths, urls in groups:
+            print(f'{len(urls)} hosts, {len(paths)} templates: {", ".join(urls[:3])}{"..." if len(urls) > 3 else ""}')
+
+
+if __name__ == '__main__':
+    main()
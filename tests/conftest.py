@@ -0,0 +1,61 @@
+"""
+The scripts are flat modules of the repository root, and read settings.py,
+or settings.sample.py, from the working directory.
+
+The stub_cache fixture is a DNS cache answering from a StubResolver, without
+any network query.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+class StubAnswer(list):
+    """
+    A dnspython answer: its rdata as strings, and the TTL of its rrset.
+    """
+    def __init__(self, addresses, ttl=300):
+        super().__init__(addresses)
+        self.rrset = type('RRset', (), {'ttl': ttl})()
+
+
+class StubResolver:
+    """
+    Answers A queries from a map of name -> addresses or exception,
+    the names of the wildcard zones answering any label. Every query is recorded.
+    """
+    def __init__(self, records=None, wildcards=None):
+        self.records = records or {}
+        self.wildcards = wildcards or {}
+        self.queries = []
+
+    def resolve(self, name, rdtype):
+        import dns.resolver
+
+        self.queries.append((str(name), rdtype))
+        answer = self.records.get(name)
+        if answer is None:
+            zone = str(name).split('.', 1)[-1]
+            answer = self.wildcards.get(zone, dns.resolver.NXDOMAIN())
+        if isinstance(answer, Exception):
+            raise answer
+        return StubAnswer(answer)
+
+
+@pytest.fixture
+def stub_cache(tmp_path):
+    """
+    A DNS cache in the temporary directory, resolving through a StubResolver.
+    """
+    pytest.importorskip('dns.resolver')
+    from dns_cache import DnsCache
+
+    cache = DnsCache(str(tmp_path / 'dns_cache.json.gz'))
+    cache.resolver = StubResolver()
+    return cache
@@ -0,0 +1,49 @@
+"""
+Banner fingerprints of banners.py, from fixture rules.
+"""
+
+from banners import Fingerprints, Matcher
+
+RULES = {
+    'services': [
+        {'service': 'OpenSSH', 'pattern': 'OpenSSH[_-]([0-9][\\w.]*)'},
+        {'service': 'MySQL', 'pattern': '([0-9]+\\.[0-9]+\\.[0-9]+)[\\w.-]*\\W+mysql_native_password'},
+        {'service': 'MySQL', 'pattern': 'mysql(?:_native_password)?'},
+        {'service': 'SSH', 'pattern': '^SSH-'},
+    ],
+    'os': [
+        {'os': 'Ubuntu-{1}', 'pattern': 'Ubuntu-([0-9]+)ubuntu'},
+        {'os': 'Linux', 'pattern': 'Ubuntu|Debian'},
+    ],
+}
+
+
+def test_first_matching_rule_wins():
+    matcher = Matcher(RULES['services'], 'service')
+
+    # The OpenSSH and SSH rules match, the first one wins whatever the position in the banner
+    assert matcher.match('SSH-2.0-OpenSSH_8.2p1') == ('OpenSSH', 'OpenSSH_8.2p1', ('8.2p1',))
+    assert matcher.match('5.7.33-log\x00mysql_native_password') == (
+        'MySQL', '5.7.33-log\x00mysql_native_password', ('5.7.33',))
+    assert matcher.match('MYSQL') == ('MySQL', 'MYSQL', ())
+    assert matcher.match('SSH-2.0-dropbear') == ('SSH', 'SSH-', ())
+    assert matcher.match('220 FTP ready') is None
+
+
+def test_groups_of_the_matching_rule_only():
+    matcher = Matcher([{'service': 'a', 'pattern': 'a(1)(2)'}, {'service': 'b', 'pattern': 'b(3)'}], 'service')
+
+    assert matcher.match('xb3') == ('b', 'b3', ('3',))
+
+
+def test_no_rule():
+    assert Matcher([], 'service').match('SSH-2.0-OpenSSH_8.2p1') is None
+
+
+def test_fingerprint():
+    fingerprints = Fingerprints(RULES)
+
+    result = fingerprints.fingerprint('SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5')
+    assert (result.service, result.version, result.os) == ('OpenSSH', '8.2p1', 'Ubuntu-4')
+    result = fingerprints.fingerprint('220 FTP ready')
+    assert (result.service, result.version, result.os) == ('', '', 'Unknown-(220_FTP_ready)')
@@ -0,0 +1,40 @@
+"""
+Queue states of distributed.py, without running any scan.
+"""
+
+import pytest
+
+pytest.importorskip('dns.resolver')
+
+import distributed  # noqa: E402
+
+
+@pytest.fixture
+def queue_dir(tmp_path):
+    queue_dir = tmp_path / 'queue'
+    distributed.create_job(queue_dir, [f'host{i}.example.com' for i in range(4)], unit_size=2)
+    return queue_dir
+
+
+def test_unit_being_published_is_not_done(queue_dir):
+    (queue_dir / 'done' / '0000.jsonl').write_text('{}\n', encoding='utf-8')
+    (queue_dir / 'tmp' / '0001.worker.1234.jsonl').write_text('{}\n', encoding='utf-8')
+
+    assert distributed.get_progress(queue_dir) == (1, 0)
+
+
+def test_failed_unit_does_not_stop_the_worker(queue_dir, monkeypatch):
+    processed = []
+
+    def process_unit(queue_dir, leased, tuner=None, tcp_tuner=None):
+        processed.append(leased.name)
+        raise FileNotFoundError('httpx')
+
+    monkeypatch.setattr(distributed.nuclei, 'update_tools', lambda: None)
+    monkeypatch.setattr(distributed, 'process_unit', process_unit)
+
+    distributed.worker(queue_dir)
+
+    assert processed == ['0000.1.txt', '0001.1.txt']
+    assert sorted(path.name for path in (queue_dir / 'failed').iterdir()) == ['0000.1.txt', '0001.1.txt']
+    assert distributed.get_progress(queue_dir) == (0, 2)
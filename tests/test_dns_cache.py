@@ -0,0 +1,37 @@
+"""
+DnsCache shared by several threads.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+pytest.importorskip('dns.resolver')
+
+from dns_cache import DnsCache  # noqa: E402
+
+
+def test_concurrent_puts_and_saves(tmp_path):
+    cache_file = str(tmp_path / 'dns_cache.json.gz')
+    cache = DnsCache(cache_file, cache_only=True)
+    stop = threading.Event()
+
+    def save_loop():
+        while not stop.is_set():
+            cache.save()
+
+    saver = threading.Thread(target=save_loop)
+    saver.start()
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: cache.put(f'host{i}.example.com', 'A', [f'10.0.{i // 256}.{i % 256}'], 3600),
+                              range(5000)))
+    finally:
+        stop.set()
+        saver.join()
+    cache.save()
+
+    reloaded = DnsCache(cache_file, cache_only=True)
+    assert len(reloaded.entries) == 5000
+    assert reloaded.get('host4999.example.com', 'A') == ['10.0.19.135']
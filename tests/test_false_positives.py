@@ -0,0 +1,43 @@
+"""
+Filtering of text report lines by false_positives.py.
+"""
+
+import pytest
+
+import false_positives
+from false_positives import Rules, filter_lines
+
+
+@pytest.fixture(autouse=True)
+def rules(monkeypatch):
+    monkeypatch.setattr(false_positives, '_RULES', Rules(
+        ignored_templates=['tech-detect'],
+        rules=[{'template': 'git-config', 'host': '*.sandbox.example.com'},
+               {'template': 'wordpress-detect', 'host': 'blog.example.com', 'severity': 'low'}]))
+
+
+def test_kept_lines_are_unchanged():
+    lines = [
+        '[wordpress-detect:version] [http] [info] https://www.example.com ["6.1.1"] [paths="/wp"]\n',
+        '[mysql-detect] [tcp] [info] 10.0.0.1:3306 [a,b] subdomains:db.example.com\n',
+        'Not a finding\n',
+    ]
+
+    assert list(filter_lines(lines)) == [line.rstrip('\n') for line in lines]
+
+
+def test_suppressed_lines():
+    lines = [
+        '[git-config] [http] [medium] https://dev.sandbox.example.com/.git/config\n',
+        '[tech-detect:nginx] [http] [info] https://www.example.com\n',
+        '[git-config] [http] [medium] https://www.example.com/.git/config\n',
+    ]
+
+    assert list(filter_lines(lines)) == ['[git-config] [http] [medium] https://www.example.com/.git/config']
+
+
+def test_only_the_severity_is_rewritten():
+    line = '[wordpress-detect:version] [http] [info] https://blog.example.com ["6.1.1"] [paths="/wp"]'
+
+    assert list(filter_lines([line])) == [
+        '[wordpress-detect:version] [http] [low] https://blog.example.com ["6.1.1"] [paths="/wp"]']
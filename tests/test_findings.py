@@ -0,0 +1,32 @@
+"""
+Text report lines of findings.py.
+"""
+
+import pytest
+
+from findings import format_line, parse_line
+
+
+@pytest.mark.parametrize('line', [
+    '[openssh-detect] [tcp] [info] 10.0.0.1:22 ["SSH-2.0-OpenSSH_8.2p1 Ubuntu-4ubuntu0.5"] subdomains:a.example.com,b.example.com',
+    '[wordpress-detect:version] [http] [info] https://www.example.com ["6.1.1"] [paths="/wp"]',
+    '[mysql-detect] [tcp] [info] 10.0.0.1:3306 [a,b]',
+    '[tech-detect:nginx] [http] [info] https://www.example.com nginx/1.18',
+    '[git-config] [http] [medium] https://www.example.com/.git/config',
+])
+def test_round_trip(line):
+    assert format_line(parse_line(line)) == line
+
+
+def test_legacy_extracted_results():
+    record = parse_line('[mysql-detect] [tcp] [info] 10.0.0.1:3306 [a,b] subdomains:db.example.com')
+
+    assert record['extracted-results'] == ['a', 'b']
+    assert record['subdomains'] == ['db.example.com']
+
+
+def test_json_extracted_results():
+    record = parse_line('[openssh-detect] [tcp] [info] 10.0.0.1:22 ["OpenSSH_8.2p1","Ubuntu"]')
+
+    assert record['extracted-results'] == ['OpenSSH_8.2p1', 'Ubuntu']
+    assert 'text-extra' not in record
@@ -0,0 +1,161 @@
+"""
+get_public_buckets.py against a local stub of the grayhatwarfare files endpoint.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip('requests')
+
+import get_public_buckets  # noqa: E402
+from config import settings  # noqa: E402
+
+API_KEY = 'test-key'
+NOTICE = 'Warning: the results are limited. The index currently holds 123456 files'
+
+
+def make_files(keyword, count, bucket=None):
+    return [{'bucket': bucket or f'{keyword}-bucket-{i // 2}', 'url': f'https://{keyword}.s3/{i}.txt'}
+            for i in range(count)]
+
+
+class StubApi:
+    """
+    Serves pages of the files of each keyword, and records the requests.
+    """
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                stub.requests.append((time.monotonic(), params, self.headers.get('Authorization')))
+                if url.path != '/api/v2/files' or self.headers.get('Authorization') != f'Bearer {API_KEY}':
+                    self.send_error(403)
+                    return
+                files = stub.files.get(params['keywords'], [])
+                start, limit = int(params['start']), int(params['limit'])
+                body = json.dumps({
+                    'meta': {'results': len(files), 'notice': NOTICE},
+                    'files': files[start:start + limit],
+                }).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v2/files'
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    files = {
+        'acme': make_files('acme', 7) + make_files('acme', 1, bucket='shared-bucket'),
+        'widgets': make_files('widgets', 3, bucket='shared-bucket'),
+    }
+    stub = StubApi(files)
+    monkeypatch.setattr(settings, 'graywarefare_api_key', API_KEY, raising=False)
+    monkeypatch.setattr(get_public_buckets, 'API_URL', stub.url)
+    monkeypatch.setattr(get_public_buckets, 'PAGE_SIZE', 3)
+    monkeypatch.setattr(get_public_buckets, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(get_public_buckets, 'RATE_LIMITER', get_public_buckets.RateLimiter(50))
+    yield stub
+    stub.close()
+
+
+def test_pagination(api):
+    result = get_public_buckets.get_buckets_info('acme', ttl=60)
+
+    starts = sorted(int(params['start']) for _, params, _ in api.requests)
+    assert starts == [0, 3, 6]
+    assert all(params['limit'] == '3' and params['keywords'] == 'acme' for _, params, _ in api.requests)
+    # The pages are merged in offset order, whatever the order of the concurrent requests
+    assert result['files'] == api.files['acme']
+    assert result['meta']['results'] == 8
+
+
+def test_rate_limiter(api, monkeypatch):
+    rate = 10
+    monkeypatch.setattr(get_public_buckets, 'RATE_LIMITER', get_public_buckets.RateLimiter(rate))
+    monkeypatch.setattr(get_public_buckets, 'PAGE_SIZE', 1)
+
+    get_public_buckets.get_buckets_info('acme', ttl=60)
+
+    times = sorted(request[0] for request in api.requests)
+    assert len(times) == 8
+    # The concurrent page requests are spaced out, not sent in a burst
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 1 / rate * 0.8
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.9
+
+
+def test_rate_limiter_threads():
+    limiter = get_public_buckets.RateLimiter(20)
+    calls = []
+
+    def call():
+        limiter.wait()
+        calls.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    calls.sort()
+    assert calls[-1] - calls[0] >= 5 / 20 * 0.9
+
+
+def test_cache_ttl(api):
+    first = get_public_buckets.get_buckets_info('widgets', ttl=60)
+    assert len(api.requests) == 1
+    assert os.path.exists(get_public_buckets.get_cache_file('widgets'))
+
+    # Fresh cache: no request
+    assert get_public_buckets.get_buckets_info('widgets', ttl=60) == first
+    assert len(api.requests) == 1
+
+    # Expired cache: fetched again
+    cache_file = get_public_buckets.get_cache_file('widgets')
+    old = time.time() - 120
+    os.utime(cache_file, (old, old))
+    assert get_public_buckets.get_buckets_info('widgets', ttl=60) == first
+    assert len(api.requests) == 2
+    assert time.time() - os.path.getmtime(cache_file) < 60
+
+
+def test_dedupe_across_keywords(api, monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['get_public_buckets.py', 'acme', 'widgets'])
+
+    get_public_buckets.main()
+
+    lines = capsys.readouterr().out.splitlines()
+    buckets = [line.split('\t')[0] for line in lines if line.startswith('\033[92m')]
+    assert len(buckets) == len(set(buckets))
+    assert buckets.count('\033[92mshared-bucket\033[0m') == 1
+    assert '\033[92macme-bucket-3\033[0m' in buckets
+
+    results = {keyword: get_public_buckets.get_buckets_info(keyword, ttl=60) for keyword in ['acme', 'widgets']}
+    bucket_info, other_stats = get_public_buckets.parse_buckets_info(results)
+    # The first keyword and file of a bucket are kept
+    assert ['shared-bucket', 'https://acme.s3/0.txt', 'acme'] in bucket_info
+    assert other_stats['widgets'] == {'total_results': 3, 'total_files_in_index': '123456'}
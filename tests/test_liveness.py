@@ -0,0 +1,59 @@
+"""
+Liveness verdicts of liveness.py, from a stubbed resolver.
+"""
+
+import pytest
+
+dns_resolver = pytest.importorskip('dns.resolver')
+
+from liveness import filter_live, is_live  # noqa: E402
+
+
+def test_resolving_host(stub_cache):
+    stub_cache.resolver.records['www.example.com'] = ['10.0.0.1']
+
+    assert is_live('www.example.com', stub_cache)
+    assert stub_cache.get('www.example.com', 'A') == ['10.0.0.1']
+
+
+def test_nxdomain_is_dead_and_cached(stub_cache):
+    assert not is_live('old.example.com', stub_cache)
+    assert stub_cache.get('old.example.com', 'NXDOMAIN') == []
+
+    # Within the re-check interval, the name is not queried again
+    assert not is_live('old.example.com', stub_cache)
+    assert len(stub_cache.resolver.queries) == 1
+
+
+@pytest.mark.parametrize('error', [dns_resolver.NoAnswer(), dns_resolver.LifetimeTimeout(timeout=1, errors=[])])
+def test_other_failures_are_live(stub_cache, error):
+    # No A record (e.g. AAAA only), timeouts: httpx decides
+    stub_cache.resolver.records['v6.example.com'] = error
+
+    assert is_live('v6.example.com', stub_cache)
+    assert stub_cache.get('v6.example.com', 'NXDOMAIN') is None
+
+
+def test_ip_and_cached_hosts_are_not_queried(stub_cache):
+    stub_cache.put('www.example.com', 'A', ['10.0.0.1'], 3600)
+
+    assert is_live('10.0.0.1', stub_cache)
+    assert is_live('2001:db8::1', stub_cache)
+    assert is_live('www.example.com', stub_cache)
+    assert stub_cache.resolver.queries == []
+
+
+def test_cache_only_keeps_unknown_hosts(stub_cache):
+    stub_cache.cache_only = True
+
+    assert is_live('new.example.com', stub_cache)
+    assert stub_cache.resolver.queries == []
+
+
+def test_filter_live(stub_cache):
+    stub_cache.resolver.records['www.example.com'] = ['10.0.0.1']
+    targets = ['www.example.com', 'https://www.example.com:8443/login', 'old.example.com', 'https://[2001:db8::1]/',
+               '2001:db8::2']
+
+    assert filter_live(targets, stub_cache) == (
+        ['www.example.com', 'https://www.example.com:8443/login', 'https://[2001:db8::1]/', '2001:db8::2'], 1)
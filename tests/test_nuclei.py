@@ -0,0 +1,87 @@
+"""
+The run_scan orchestration of nuclei.py, with the scan stages stubbed.
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip('dns.resolver')
+
+import nuclei  # noqa: E402
+from findings import list_reports  # noqa: E402
+
+FINDING = json.dumps({'template-id': 'git-config', 'info': {'severity': 'medium'}, 'type': 'http',
+                      'host': 'https://www.example.com', 'matched-at': 'https://www.example.com/.git/config'})
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'reports').mkdir()
+    (tmp_path / 'targets.txt').write_text('www.example.com\napi.example.com\n', encoding='utf-8')
+    monkeypatch.setattr(nuclei, 'generate_ips', lambda input_file: (None, {}))
+    monkeypatch.setattr(nuclei, 'finalize_report', lambda nuclei_output, text_output: None)
+    return tmp_path
+
+
+def run_scan(**kwargs):
+    return nuclei.run_scan('targets.txt', prioritize=False, wildcard_pruning=False, liveness_filter=False, **kwargs)
+
+
+def test_crashed_scan_is_not_a_report(workdir, monkeypatch):
+    def perform_scan(input_file, output, tuner, tech_targeting, on_finding, templates):
+        on_finding(FINDING)
+        raise FileNotFoundError('httpx')
+
+    monkeypatch.setattr(nuclei, 'perform_scan', perform_scan)
+    with pytest.raises(FileNotFoundError):
+        run_scan()
+
+    assert list_reports(workdir / 'reports') == []
+    assert len(list((workdir / 'reports').glob('*.partial'))) == 2
+
+
+def test_finished_scan(workdir, monkeypatch):
+    monkeypatch.setattr(nuclei, 'perform_scan',
+                        lambda input_file, output, tuner, tech_targeting, on_finding, templates: on_finding(FINDING))
+
+    report = run_scan()
+
+    assert list_reports(workdir / 'reports') == [workdir / report]
+    assert not list((workdir / 'reports').glob('*.partial'))
+
+
+def test_stages_have_their_own_tuner(workdir, monkeypatch):
+    tuners = {}
+    monkeypatch.setattr(nuclei, 'perform_scan',
+                        lambda input_file, output, tuner, tech_targeting, on_finding, templates:
+                        tuners.setdefault('http', tuner))
+    monkeypatch.setattr(nuclei, 'generate_ips', lambda input_file: ('ips.txt', {}))
+    monkeypatch.setattr(nuclei, 'perform_tcp_scan',
+                        lambda ip_file, output, tuner, on_finding: tuners.setdefault('tcp', tuner))
+
+    run_scan(adaptive=True)
+
+    assert tuners['http'] is not tuners['tcp']
+    assert tuners['http'].state_file != tuners['tcp'].state_file
+
+
+def test_deferred_targets_are_counted(workdir, monkeypatch):
+    now = [0]
+    monkeypatch.setattr(nuclei.time, 'time', lambda: now[0])
+    monkeypatch.setattr(nuclei.settings, 'scan_batch_size', 1, raising=False)
+
+    def perform_scan(input_file, output, tuner, tech_targeting, on_finding, templates):
+        on_finding(FINDING)
+        # The first batch uses up the whole budget
+        now[0] += 60
+
+    monkeypatch.setattr(nuclei, 'perform_scan', perform_scan)
+
+    run_scan(time_budget=1)
+
+    counts = json.loads(next((workdir / 'reports').glob('counts.nuclei.*.json')).read_text(encoding='utf-8'))
+    assert counts['finished']
+    assert counts['deferred'] == 1
+    assert (workdir / 'reports' / 'deferred.nuclei.txt').read_text(encoding='utf-8').split() == ['api.example.com']
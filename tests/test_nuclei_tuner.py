@@ -0,0 +1,152 @@
+"""
+nuclei_tuner.py against a local stub of the nuclei metrics endpoint.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+import threading
+
+import pytest
+
+import nuclei_tuner
+from nuclei_tuner import Tuner
+
+BOUNDS = {'concurrency': (10, 100), 'bulk_size': (10, 100), 'rate_limit': (100, 1500)}
+INCREASE = {'concurrency': 5, 'bulk_size': 5, 'rate_limit': 50}
+INITIAL = {'concurrency': 50, 'bulk_size': 40, 'rate_limit': 500}
+
+
+class StubMetrics:
+    """
+    Serves a sequence of nuclei /metrics snapshots, the last one being repeated.
+    """
+    def __init__(self, snapshots):
+        self.snapshots = list(snapshots)
+        self.polls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                snapshot = stub.snapshots[min(stub.polls, len(stub.snapshots) - 1)]
+                stub.polls += 1
+                body = json.dumps(snapshot).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.port = self.server.server_address[1]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def get_snapshot(requests, errors, rps):
+    # nuclei exposes its counters as strings
+    return {'requests': str(requests), 'errors': str(errors), 'rps': str(rps), 'templates': '1200'}
+
+
+def run_polls(count):
+    """
+    Returns an is_running function which is True for count polls.
+    """
+    polls = iter(range(count))
+    return lambda: next(polls, None) is not None
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    monkeypatch.setattr(nuclei_tuner, 'POLL_INTERVAL', 0.01)
+    monkeypatch.setattr(nuclei_tuner, 'BOUNDS', BOUNDS)
+    monkeypatch.setattr(nuclei_tuner, 'INCREASE', INCREASE)
+    monkeypatch.setattr(nuclei_tuner, 'DECREASE_FACTOR', 0.5)
+    monkeypatch.setattr(nuclei_tuner, 'MAX_ERROR_RATE', 0.05)
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    return tmp_path / 'nuclei_tuner.json'
+
+
+def watch(snapshots, state_file, initial=INITIAL, polls=3):
+    stub = StubMetrics(snapshots)
+    try:
+        tuner = Tuner(str(state_file), initial, stub.port)
+        tuner.watch(run_polls(polls))
+    finally:
+        stub.close()
+    return tuner
+
+
+def test_additive_increase(state_file):
+    tuner = watch([get_snapshot(100, 0, 40), get_snapshot(1000, 10, 80)], state_file)
+
+    assert len(tuner.samples) == 3
+    assert tuner.samples[-1] == {'requests': 1000, 'errors': 10, 'rps': 80}
+    parameters = tuner.adjust()
+    assert parameters == {'concurrency': 55, 'bulk_size': 45, 'rate_limit': 550}
+    # Kept for the next run
+    assert json.loads(state_file.read_text()) == parameters
+    assert Tuner(str(state_file)).get_arguments()[:6] == ['-concurrency', '55', '-bulk-size', '45',
+                                                          '-rate-limit', '550']
+
+
+def test_multiplicative_decrease(state_file):
+    # Clean at first, the decision follows the cumulative counters of the last sample
+    tuner = watch([get_snapshot(100, 0, 40), get_snapshot(1000, 60, 90)], state_file)
+
+    assert tuner.adjust() == {'concurrency': 25, 'bulk_size': 20, 'rate_limit': 250}
+    assert json.loads(state_file.read_text())['rate_limit'] == 250
+
+
+def test_error_rate_threshold(state_file):
+    # At the maximum error rate, still an increase
+    tuner = watch([get_snapshot(1000, 50, 90)], state_file, polls=1)
+
+    assert tuner.adjust()['concurrency'] == 55
+
+
+def test_clamp_to_bounds(state_file):
+    high = {'concurrency': 98, 'bulk_size': 100, 'rate_limit': 1480}
+    tuner = watch([get_snapshot(1000, 0, 300)], state_file, high, polls=1)
+    assert tuner.adjust() == {'concurrency': 100, 'bulk_size': 100, 'rate_limit': 1500}
+
+    low = {'concurrency': 12, 'bulk_size': 10, 'rate_limit': 150}
+    tuner = watch([get_snapshot(1000, 500, 20)], state_file, low, polls=1)
+    # The state of the previous run takes over the initial parameters
+    assert tuner.parameters == {'concurrency': 100, 'bulk_size': 100, 'rate_limit': 1500}
+    state_file.unlink()
+    tuner = watch([get_snapshot(1000, 500, 20)], state_file, low, polls=1)
+    assert tuner.adjust() == {'concurrency': 10, 'bulk_size': 10, 'rate_limit': 100}
+
+
+def test_no_metrics_collected(state_file, capsys):
+    # Nothing listens on the port, e.g. nuclei exited before serving its metrics
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    tuner = Tuner(str(state_file), INITIAL, port)
+    tuner.watch(run_polls(2))
+
+    assert tuner.samples == []
+    assert tuner.adjust() == INITIAL
+    assert 'no metrics collected' in capsys.readouterr().out
+    assert not state_file.exists()
+
+
+def test_invalid_metrics(state_file):
+    tuner = watch(['not the metrics'], state_file, polls=2)
+
+    assert tuner.samples == []
+    assert tuner.adjust() == INITIAL
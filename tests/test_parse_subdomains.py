@@ -0,0 +1,56 @@
+"""
+CNAME chains of parse_subdomains.py, from a seeded DNS cache without any network query.
+"""
+
+import pytest
+
+pytest.importorskip('dns.resolver')
+
+from dns_cache import DnsCache  # noqa: E402
+from parse_subdomains import build_host_graph  # noqa: E402
+
+TTL = 3600
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DnsCache(str(tmp_path / 'dns_cache.json.gz'), cache_only=True)
+
+    def add(name, ip, cname=None):
+        cache.put(name, 'A', [ip], TTL)
+        if cname:
+            # As returned by the resolver, absolute
+            cache.put(name, 'CNAME', [f'{cname}.'], TTL)
+
+    cache.add = add
+    return cache
+
+
+def test_cname_chain(cache):
+    cache.add('www.example.com', '10.0.0.1', 'app.example.com')
+    cache.add('app.example.com', '10.0.0.1', 'lb.example.com')
+    cache.add('lb.example.com', '10.0.0.1', 'lb.cdn.example.net')
+    cache.add('api.example.com', '10.0.0.2')
+
+    graph = build_host_graph(['www.example.com', 'app.example.com', 'lb.example.com', 'api.example.com'], cache)
+
+    assert graph['cname'] == {'www.example.com': 'app.example.com', 'app.example.com': 'lb.example.com',
+                              'lb.example.com': 'lb.cdn.example.net'}
+    assert graph['aliases'] == {'lb.example.com': ['www.example.com', 'app.example.com']}
+    assert sorted(graph['rows']) == [
+        ['api.example.com', '', '10.0.0.2', '', ''],
+        ['lb.example.com', 'lb.cdn.example.net', '10.0.0.1', '', 'www.example.com, app.example.com'],
+    ]
+    assert graph['ip_hosts']['10.0.0.1'] == ['lb.example.com']
+
+
+def test_cname_loop(cache):
+    cache.add('a.example.com', '10.0.0.1', 'b.example.com')
+    cache.add('b.example.com', '10.0.0.1', 'a.example.com')
+    cache.add('c.example.com', '10.0.0.1', 'a.example.com')
+
+    graph = build_host_graph(['a.example.com', 'b.example.com', 'c.example.com'], cache)
+
+    # Chains which loop, including those leading into a loop, are not collapsed
+    assert sorted(row[0] for row in graph['rows']) == ['a.example.com', 'b.example.com', 'c.example.com']
+    assert graph['aliases'] == {}
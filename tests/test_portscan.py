@@ -0,0 +1,73 @@
+"""
+portscan.py with a stub naabu on the PATH.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+pytest.importorskip('dns.resolver')
+
+import portscan  # noqa: E402
+
+NAABU = '''#!/bin/sh
+case "$*" in *-up*) exit 0 ;; esac
+{body}
+'''
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'targets.txt').write_text('10.0.0.1\n10.0.0.2\n', encoding='utf-8')
+    (tmp_path / 'bin').mkdir()
+    monkeypatch.setenv('PATH', f'{tmp_path / "bin"}{os.pathsep}{os.environ["PATH"]}')
+    return tmp_path
+
+
+def set_naabu(workdir, body):
+    path = workdir / 'bin' / 'naabu'
+    path.write_text(NAABU.format(body=body), encoding='utf-8')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['portscan.py', 'targets.txt', *args])
+    portscan.main()
+
+
+def test_scan_and_cache(workdir, monkeypatch, capsys):
+    set_naabu(workdir, 'echo 10.0.0.1:22; echo 10.0.0.1:8080')
+    run(monkeypatch)
+
+    assert capsys.readouterr().out.split() == ['10.0.0.1:22', '10.0.0.1:8080']
+    cache = portscan.load_cache()
+    assert cache['10.0.0.1']['open'] == [22, 8080] and cache['10.0.0.2']['open'] == []
+
+
+def test_failed_scan_leaves_the_cache(workdir, monkeypatch, capsys):
+    set_naabu(workdir, 'echo 10.0.0.1:22')
+    run(monkeypatch)
+    capsys.readouterr()
+    cache = portscan.load_cache()
+
+    # Stale IPs, naabu failing
+    set_naabu(workdir, 'echo "[FTL] could not run" >&2; exit 1')
+    with pytest.raises(SystemExit) as exit_info:
+        run(monkeypatch, '--ttl', '-1')
+
+    assert exit_info.value.code == 1
+    assert portscan.load_cache() == cache
+    # The previous results are still printed
+    assert capsys.readouterr().out.split() == ['10.0.0.1:22']
+
+
+def test_missing_naabu(workdir, monkeypatch, capsys):
+    monkeypatch.setenv('PATH', str(workdir / 'bin'))
+    with pytest.raises(SystemExit):
+        run(monkeypatch)
+
+    assert portscan.load_cache() == {}
+    assert 'naabu failed' in capsys.readouterr().err
@@ -0,0 +1,74 @@
+"""
+Streaming of the reports by report_writer.py, under a .partial name until closed.
+"""
+
+import json
+import lzma
+from pathlib import Path
+import zlib
+
+import pytest
+
+from findings import list_reports, read_findings
+from report_writer import ReportWriter, get_counts_file, get_partial_file
+
+TIMESTAMP = '20230427-143329'
+
+
+def get_record(severity='high'):
+    return {'template-id': 'git-config', 'info': {'name': 'Git Config', 'severity': severity},
+            'type': 'http', 'host': 'https://www.example.com', 'matched-at': 'https://www.example.com/.git/config'}
+
+
+def get_outputs(directory, compression=''):
+    suffix = f'.{compression}' if compression else ''
+    return (str(directory / f'report.nuclei.{TIMESTAMP}.jsonl{suffix}'),
+            str(directory / f'report.nuclei.{TIMESTAMP}.txt{suffix}'))
+
+
+@pytest.mark.parametrize('compression', ['', 'gz', 'xz'])
+def test_partial_until_closed(tmp_path, compression):
+    nuclei_output, text_output = get_outputs(tmp_path, compression)
+    writer = ReportWriter(nuclei_output, text_output, {'skipped': 3})
+    writer.write_line(json.dumps(get_record()))
+    writer.write_line('[INF] not a finding')
+    writer.write_counts()
+
+    # A running scan is not a report yet
+    assert list_reports(tmp_path) == []
+    counts = json.loads(get_counts_file(get_partial_file(nuclei_output)).read_text())
+    assert counts['finished'] is False and counts['total'] == 1 and counts['skipped'] == 3
+    # Readable mid-scan, xz being streamed as plain text
+    data = Path(get_partial_file(nuclei_output)).read_bytes()
+    if compression == 'gz':
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data)
+    assert [json.loads(line)['template-id'] for line in data.decode('utf-8').splitlines()] == ['git-config']
+
+    assert writer.close()
+    assert [str(path) for path in list_reports(tmp_path)] == [nuclei_output]
+    assert [record['template-id'] for record in read_findings(nuclei_output)] == ['git-config']
+    assert not list(tmp_path.glob('*.partial'))
+    assert json.loads(get_counts_file(nuclei_output).read_text())['finished'] is True
+    if compression == 'xz':
+        with lzma.open(text_output, 'rt', encoding='utf-8') as f:
+            assert 'git-config' in f.read()
+
+
+def test_no_findings(tmp_path):
+    nuclei_output, text_output = get_outputs(tmp_path)
+    writer = ReportWriter(nuclei_output, text_output)
+
+    assert not writer.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_abort_keeps_the_partial_names(tmp_path):
+    nuclei_output, text_output = get_outputs(tmp_path)
+    writer = ReportWriter(nuclei_output, text_output)
+    writer.write(get_record())
+    writer.abort()
+
+    assert list_reports(tmp_path) == []
+    assert sorted(path.name for path in tmp_path.glob('*.partial')) == [
+        f'report.nuclei.{TIMESTAMP}.jsonl.partial', f'report.nuclei.{TIMESTAMP}.txt.partial']
+    assert json.loads(get_counts_file(nuclei_output).read_text())['finished'] is False
@@ -0,0 +1,109 @@
+"""
+Template metadata parsing and technology grouping of template_index.py, from fixture templates.
+"""
+
+import json
+
+import pytest
+
+from template_index import build_index, group_hosts, parse_httpx, parse_template
+
+WORDPRESS = '''id: wordpress-xmlrpc
+
+info:
+  name: WordPress xmlrpc
+  author: someone
+  severity: Medium
+  tags: wordpress,wp,"xmlrpc"
+  metadata:
+    vendor: WordPress
+    product: wordpress
+
+http:
+  - method: GET
+    path:
+      - "{{BaseURL}}/xmlrpc.php"
+'''
+GIT_CONFIG = '''id: "git-config"
+
+info:
+  name: Git config
+  severity: low
+  tags: [config, git]
+
+requests:
+  - method: GET
+    path:
+      - "{{BaseURL}}/.git/config"
+'''
+MYSQL = '''id: mysql-detect
+
+info:
+  name: MySQL detection
+  severity: info
+  tags: network,mysql
+
+network:
+  - inputs:
+      - data: "\\n"
+    host:
+      - "{{Hostname}}"
+'''
+NOT_A_TEMPLATE = '''name: a workflow list
+severity: high
+'''
+
+
+@pytest.fixture
+def templates_dir(tmp_path):
+    for name, content in [('wordpress-xmlrpc.yaml', WORDPRESS), ('git-config.yaml', GIT_CONFIG),
+                          ('network/mysql-detect.yaml', MYSQL), ('list.yaml', NOT_A_TEMPLATE)]:
+        path = tmp_path / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    return tmp_path
+
+
+def test_http_template(templates_dir):
+    template = parse_template(templates_dir / 'wordpress-xmlrpc.yaml')
+
+    assert template == {'id': 'wordpress-xmlrpc', 'severity': 'medium', 'protocol': 'http',
+                        'tags': ['wordpress', 'wp', 'xmlrpc'], 'path': str(templates_dir / 'wordpress-xmlrpc.yaml'),
+                        'vendor': 'wordpress', 'product': 'wordpress'}
+
+
+@pytest.mark.parametrize('name, protocol', [('git-config.yaml', 'http'), ('network/mysql-detect.yaml', 'tcp')])
+def test_protocol_aliases(templates_dir, name, protocol):
+    # "requests" and "network" are the older names of http and tcp
+    assert parse_template(templates_dir / name)['protocol'] == protocol
+
+
+def test_quoted_id_and_tag_list(templates_dir):
+    template = parse_template(templates_dir / 'git-config.yaml')
+
+    assert template['id'] == 'git-config'
+    assert template['tags'] == ['config', 'git']
+    assert template['vendor'] == template['product'] == ''
+
+
+def test_not_a_template(templates_dir):
+    assert parse_template(templates_dir / 'list.yaml') is None
+    assert parse_template(templates_dir / 'missing.yaml') is None
+
+
+def test_group_hosts(templates_dir):
+    templates = build_index(templates_dir)
+    hosts = parse_httpx([
+        json.dumps({'url': 'https://blog.example.com', 'tech': ['WordPress:6.1.1', 'PHP']}),
+        json.dumps({'url': 'https://news.example.com', 'tech': ['WordPress']}),
+        json.dumps({'url': 'https://www.example.com', 'tech': ['Nginx']}),
+        'not json',
+    ])
+
+    generic, groups = group_hosts(hosts, templates)
+
+    assert sorted(generic) == [str(templates_dir / 'git-config.yaml'),
+                               str(templates_dir / 'network/mysql-detect.yaml')]
+    # The hosts without any specific template run the generic ones only
+    assert groups == [([str(templates_dir / 'wordpress-xmlrpc.yaml')],
+                       ['https://blog.example.com', 'https://news.example.com'])]
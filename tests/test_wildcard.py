@@ -0,0 +1,61 @@
+"""
+Wildcard zone verdicts and target pruning of wildcard.py, from a stubbed resolver.
+"""
+
+import pytest
+
+dns_resolver = pytest.importorskip('dns.resolver')
+
+from wildcard import probe_zone, prune_targets  # noqa: E402
+
+
+def test_wildcard_zone(stub_cache):
+    stub_cache.resolver.wildcards['example.com'] = ['10.0.0.1']
+
+    assert probe_zone('example.com', stub_cache) == ['10.0.0.1']
+    assert stub_cache.get('example.com', 'WILDCARD') == ['10.0.0.1']
+
+
+@pytest.mark.parametrize('error', [dns_resolver.NXDOMAIN(), dns_resolver.NoAnswer()])
+def test_negative_answer_is_not_a_wildcard(stub_cache, error):
+    stub_cache.resolver.wildcards['example.com'] = error
+
+    assert probe_zone('example.com', stub_cache) == []
+    assert stub_cache.get('example.com', 'WILDCARD') == []
+    # The first negative answer is the verdict
+    assert len(stub_cache.resolver.queries) == 1
+
+
+def test_timeout_is_not_cached(stub_cache):
+    stub_cache.resolver.wildcards['example.com'] = dns_resolver.LifetimeTimeout(timeout=1, errors=[])
+
+    assert probe_zone('example.com', stub_cache) == []
+    assert stub_cache.get('example.com', 'WILDCARD') is None
+
+
+def test_cached_verdict(stub_cache):
+    stub_cache.put('example.com', 'WILDCARD', ['10.0.0.1'], 3600)
+
+    assert probe_zone('example.com', stub_cache) == ['10.0.0.1']
+    assert stub_cache.resolver.queries == []
+
+
+def test_prune_targets(stub_cache):
+    stub_cache.resolver.wildcards['example.com'] = ['10.0.0.1']
+    stub_cache.resolver.records.update({'www.example.com': ['10.0.0.2'], 'b.example.org': ['10.0.0.3']})
+    targets = ['bbb.example.com', 'aa.example.com', 'cc.example.com', 'www.example.com',
+               'x.example.com:8443', 'b.example.org']
+
+    pruned, collapsed = prune_targets(targets, stub_cache)
+
+    # The shortest host represents the others, the hosts with their own answer are kept
+    assert pruned == ['aa.example.com', 'www.example.com', 'x.example.com:8443', 'b.example.org']
+    assert collapsed == {'aa.example.com': ['cc.example.com', 'bbb.example.com']}
+
+
+def test_small_zones_are_not_probed(stub_cache):
+    stub_cache.resolver.wildcards['example.com'] = ['10.0.0.1']
+    targets = ['a.example.com', 'b.example.com']
+
+    assert prune_targets(targets, stub_cache) == (targets, {})
+    assert stub_cache.resolver.queries == []
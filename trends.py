@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+Trend rollups of the nuclei reports.
+
+A SQLite store keeps one row per report timestamp x product x severity x
+protocol x category, with the number of findings. Each report is rolled up
+once, when nuclei.py generates it or on the next "update", so that trends over
+any date range are read from the store instead of re-parsing the reports.
+
+Usage:
+    python trends.py update
+    python trends.py show [--from 20240101] [--to 20241231] [--by product,severity] [--period week]
+                          [--product Github] [--severity high] [--format csv|jsonl|table]
+"""
+
+import argparse
+from collections import Counter
+from datetime import datetime
+import os
+import sqlite3
+
+from config import settings
+from false_positives import load_rules
+from findings import get_asset, get_label, get_metadata, get_severity, get_timestamp, list_reports, read_findings
+from nuclei_report_stats import classify_subdomains
+from output import add_arguments, write_rows
+
+# Debug
+# from pdb import set_trace as st
+
+TRENDS_DB = getattr(settings, 'trends_db', 'trends.sqlite')
+DIMENSIONS = ['product', 'severity', 'protocol', 'category']
+PERIODS = ['report', 'day', 'week', 'month']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS reports (
+    timestamp TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    timestamp TEXT NOT NULL,
+    product TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    protocol TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (timestamp, product, severity, protocol, category)
+) WITHOUT ROWID;
+'''
+
+
+def connect(db_file=TRENDS_DB):
+    """
+    Opens the rollup store, creating it if needed.
+    """
+    connection = sqlite3.connect(db_file)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def get_product(record):
+    """
+    Returns the product of a record, as in nuclei_report_stats.py.
+    TCP findings on an IP are classified by their subdomains.
+    """
+    if record['type'] == 'tcp':
+        return classify_subdomains(','.join(record.get('subdomains', [])) or get_metadata(record))
+    return classify_subdomains(get_asset(record))
+
+
+def rollup(report):
+    """
+    Counts the findings of a report, without the false positives and the blacklisted targets.
+
+    :return: A Counter of (product, severity, protocol, category) -> number of findings
+    """
+    counts = Counter()
+    blacklist = getattr(settings, 'nuclei_target_blacklist', [])
+    for record in load_rules().filter(read_findings(report)):
+        asset = get_asset(record)
+        if any(asset.startswith(b) or '/' + b in asset for b in blacklist):
+            continue
+        counts[(get_product(record) or '', get_severity(record), record['type'], get_label(record))] += 1
+    return counts
+
+
+def update_report(connection, report):
+    """
+    Replaces the rollups of a report.
+    """
+    timestamp = get_timestamp(report)
+    counts = rollup(report)
+    with connection:
+        connection.execute('DELETE FROM rollups WHERE timestamp = ?', (timestamp,))
+        connection.executemany('INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?)',
+            ((timestamp,) + key + (count,) for key, count in counts.items()))
+        connection.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?)',
+            (timestamp, str(report), os.path.getmtime(report)))
+
+
+def update(connection, reports_dir='reports'):
+    """
+    Rolls up the reports which are new or changed since their last rollup.
+
+    :return: The number of rolled up reports
+    """
+    known = dict(((timestamp, path), mtime) for timestamp, path, mtime
+                 in connection.execute('SELECT timestamp, path, mtime FROM reports'))
+    updated = 0
+    for report in list_reports(reports_dir):
+        if known.get((get_timestamp(report), str(report))) == os.path.getmtime(report):
+            continue
+        update_report(connection, report)
+        updated += 1
+    return updated
+
+
+def update_trends(report, db_file=TRENDS_DB):
+    """
+    Rolls up a newly generated report.
+    """
+    connection = connect(db_file)
+    try:
+        update_report(connection, report)
+    finally:
+        connection.close()
+
+
+def get_period(timestamp, period):
+    """
+    Returns the period of a report timestamp, e.g. "2024-W05" for a week.
+    """
+    if period == 'report':
+        return timestamp
+    date = datetime.strptime(timestamp[:8], '%Y%m%d')
+    if period == 'day':
+        return date.strftime('%Y-%m-%d')
+    if period == 'month':
+        return date.strftime('%Y-%m')
+    year, week, _ = date.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def query(connection, start='', end='', by=('product', 'severity'), period='report', filters=None):
+    """
+    Yields the time series of the number of findings, grouped by some dimensions.
+    Within a period of several reports, the highest count of a report is kept,
+    so that repeated scans of the same targets are not summed.
+
+    :param start: Timestamp prefix of the first report, included
+    :param end: Timestamp prefix of the last report, included
+    :param by: The dimensions to group by
+    :param period: One of PERIODS
+    :param filters: A dict of dimension -> value
+    :return: Rows of [period] + dimensions + [count]
+    """
+    columns = ', '.join(by)
+    conditions = ['timestamp >= ?', 'substr(timestamp, 1, ?) <= ?']
+    parameters = [start, len(end) or 15, end or '99999999-999999']
+    for dimension, value in (filters or {}).items():
+        conditions.append(f'{dimension} = ?')
+        parameters.append(value)
+    sql = (f'SELECT timestamp, {columns}{", " if by else ""}SUM(count) FROM rollups '
+           f'WHERE {" AND ".join(conditions)} GROUP BY timestamp{", " if by else ""}{columns} ORDER BY timestamp')
+
+    current, counts = None, {}
+    for row in connection.execute(sql, parameters):
+        row_period = get_period(row[0], period)
+        if row_period != current:
+            yield from ([current] + list(key) + [count] for key, count in counts.items())
+            current, counts = row_period, {}
+        key = row[1:-1]
+        counts[key] = max(counts.get(key, 0), row[-1])
+    yield from ([current] + list(key) + [count] for key, count in counts.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trend rollups of the nuclei reports')
+    parser.add_argument('command', choices=['update', 'show'], nargs='?', default='show',
+        help='update: roll up the new reports, show: print the time series (default)')
+    parser.add_argument('--db', default=TRENDS_DB, help='The rollup store')
+    parser.add_argument('--from', dest='start', default='', help='First report timestamp prefix, e.g. 20240101')
+    parser.add_argument('--to', dest='end', default='', help='Last report timestamp prefix, included')
+    parser.add_argument('--by', default='product,severity',
+        help=f'Comma separated dimensions among {",".join(DIMENSIONS)}')
+    parser.add_argument('--period', choices=PERIODS, default='report', help='Time step of the series')
+    for dimension in DIMENSIONS:
+        parser.add_argument(f'--{dimension}', help=f'Only count this {dimension}')
+    parser.add_argument('--no-update', action='store_true', help='Do not roll up the new reports before showing')
+    add_arguments(parser, default='csv')
+    args = parser.parse_args()
+
+    by = [dimension for dimension in args.by.split(',') if dimension]
+    if any(dimension not in DIMENSIONS for dimension in by):
+        parser.error(f'--by must be among {",".join(DIMENSIONS)}')
+
+    connection = connect(args.db)
+    try:
+        if args.command == 'update' or not args.no_update:
+            updated = update(connection)
+            if args.command == 'update':
+                print(f'{updated} reports rolled up in {args.db}')
+                return
+        filters = {dimension: getattr(args, dimension) for dimension in DIMENSIONS if getattr(args, dimension)}
+        rows = query(connection, args.start, args.end, by, args.period, filters)
+        write_rows(rows, [args.period] + by + ['count'], args.format, args.limit, args.page)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Wildcard-DNS detection and pruning of scan targets.
+
+Passive sources return many names under wildcard zones, all resolving to the
+answer of "*.zone". Random labels are resolved under each parent zone: if they
+resolve, the zone is a wildcard, and the hosts resolving to the wildcard
+answer are collapsed into one representative per zone and answer. The
+verdict of each zone is kept in the DNS cache.
+
+The collapsed hosts are recorded, so that the findings of a representative
+are attributed back to them, as "subdomains".
+
+Usage:
+    python wildcard.py [targets.latest.txt] [-o targets.pruned.txt] [--collapsed collapsed.json]
+"""
+
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import json
+from pathlib import Path
+import secrets
+import dns.resolver
+
+from config import settings
+from dns_cache import DnsCache
+from findings import get_asset, get_timestamp, read_findings
+
+# Debug
+# from pdb import set_trace as st
+
+VERDICT_TTL = getattr(settings, 'wildcard_cache_ttl', 86400)  # in seconds
+MIN_HOSTS = getattr(settings, 'wildcard_min_hosts', 3)  # hosts under a zone before probing it
+PROBES = 2
+RESOLVE_WORKERS = 50
+
+
+def get_zone(host):
+    """
+    Returns the parent zone of a host, e.g. "example.com" for "www.example.com",
+    or None for an apex domain.
+    """
+    labels = host.split('.')
+    if len(labels) < 3:
+        return None
+    return '.'.join(labels[1:])
+
+
+def probe_zone(zone, cache):
+    """
+    Returns the wildcard answers of a zone, empty if it is not a wildcard.
+    Random labels are resolved outside of the cache, the verdict is cached.
+    """
+    answers = cache.get(zone, 'WILDCARD')
+    if answers is not None:
+        return answers
+    if cache.cache_only:
+        return []
+
+    answers = set()
+    for _ in range(PROBES):
+        try:
+            answer = cache.resolver.resolve(f'{secrets.token_hex(8)}.{zone}', 'A')
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            answers = set()
+            break
+        except Exception:
+            # Timeouts and server failures are not cached
+            return []
+        answers.update(str(rdata) for rdata in answer)
+    answers = sorted(answers)
+    cache.put(zone, 'WILDCARD', answers, VERDICT_TTL)
+    return answers
+
+
+def prune_targets(targets, cache, min_hosts=MIN_HOSTS):
+    """
+    Collapses the targets resolving to the wildcard answer of their zone.
+    Targets with a port or a scheme are kept as is.
+
+    :param targets: List of targets
+    :param cache: The DNS cache
+    :return: A tuple (pruned targets, dict of representative -> collapsed hosts)
+    """
+    zones = defaultdict(list)
+    for target in targets:
+        zone = get_zone(target.lower()) if ':' not in target and '/' not in target else None
+        if zone:
+            zones[zone].append(target)
+    candidates = {zone: hosts for zone, hosts in zones.items() if len(hosts) >= min_hosts}
+
+    with ThreadPoolExecutor(max_workers=RESOLVE_WORKERS) as executor:
+        verdicts = dict(zip(candidates, executor.map(lambda zone: probe_zone(zone, cache), candidates)))
+        wildcard_hosts = [host for zone, hosts in candidates.items() if verdicts[zone] for host in hosts]
+        host_answers = dict(zip(wildcard_hosts,
+                                executor.map(lambda host: cache.resolve(host, 'A'), wildcard_hosts)))
+
+    # Group the hosts matching the wildcard answer of their zone, per zone and answer
+    groups = defaultdict(list)
+    for host, answers in host_answers.items():
+        zone = get_zone(host.lower())
+        if answers and set(answers) <= set(verdicts[zone]):
+            groups[(zone, tuple(sorted(answers)))].append(host)
+
+    collapsed = {}
+    removed = set()
+    for hosts in groups.values():
+        if len(hosts) < 2:
+            continue
+        representative, *others = sorted(hosts, key=lambda host: (len(host), host))
+        collapsed[representative] = others
+        removed.update(others)
+    return [target for target in targets if target not in removed], collapsed
+
+
+def get_collapsed_file(nuclei_output):
+    """
+    Returns the path of the hosts collapsed by a run,
+    e.g. "reports/wildcard.nuclei.20230427-143329.json" for "reports/report.nuclei.20230427-143329.jsonl"
+    """
+    return Path(nuclei_output).with_name(f'wildcard.nuclei.{get_timestamp(nuclei_output)}.json')
+
+
+def write_collapsed(nuclei_output, collapsed):
+    """
+    Records the hosts collapsed by a run next to its report.
+
+    :return: The path of the collapsed file
+    """
+    collapsed_file = get_collapsed_file(nuclei_output)
+    with open(collapsed_file, 'w', encoding='utf-8') as f:
+        json.dump(collapsed, f, indent=2)
+    return collapsed_file
+
+
+def attribute_finding(record, collapsed):
+    """
+    Adds the collapsed hosts of a representative to the subdomains of its finding.
+    TCP findings on an IP are attributed through their subdomains.
+
+    :param record: A record
+    :param collapsed: A dict of representative -> collapsed hosts
+    :return: The record
+    """
+    subdomains = record.get('subdomains', [])
+    hosts = [host for representative in [get_asset(record)] + subdomains
+             for host in collapsed.get(representative, [])]
+    if hosts:
+        record['subdomains'] = list(dict.fromkeys(subdomains + hosts))
+    return record
+
+
+def attribute_findings(records, collapsed):
+    """
+    Attributes findings back to the collapsed hosts, see attribute_finding().
+
+    :param records: Iterable of records
+    :param collapsed: A dict of representative -> collapsed hosts
+    :return: Generator of records
+    """
+    for record in records:
+        yield attribute_finding(record, collapsed)
+
+
+def attribute_report(report, collapsed):
+    """
+    Attributes the findings of a temporary JSONL output back to the collapsed hosts, in place.
+    """
+    records = list(attribute_findings(read_findings(report), collapsed))
+    with open(report, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Collapse the hosts of wildcard DNS zones')
+    parser.add_argument('input_file', nargs='?', default='targets.latest.txt',
+        help='The input file containing targets')
+    parser.add_argument('-o', '--output', help='The pruned target file, stdout by default')
+    parser.add_argument('--collapsed', help='Write the representative -> collapsed hosts map to this JSON file')
+    parser.add_argument('--cache-only', action='store_true', help='Only use cached DNS answers, no network query')
+    args = parser.parse_args()
+
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        targets = [line.strip() for line in f if line.strip()]
+
+    cache = DnsCache(cache_only=args.cache_only)
+    try:
+        pruned, collapsed = prune_targets(targets, cache)
+    finally:
+        cache.save()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(pruned) + '\n')
+        print(f'{len(targets) - len(pruned)} hosts collapsed into {len(collapsed)} representatives, '
+              f'{len(pruned)} targets left in {args.output}')
+    else:
+        print('\n'.join(pruned))
+    if args.collapsed:
+        with open(args.collapsed, 'w', encoding='utf-8') as f:
+            json.dump(collapsed, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
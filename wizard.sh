@@ -10,7 +10,7 @@ echo "Generate a list of subdomains"
 bash subdomains.sh
 
 echo "Generate a list of TCP reachable domains (not 80, 443)"
-bash naabu.sh
+python3 portscan.py > naabu.latest.txt
 
 echo "Generate a nuclei report for targets.latest.txt"
 python3 nuclei.py